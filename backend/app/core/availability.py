@@ -0,0 +1,108 @@
+import base64
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.booking_model import Booking
+from app.utils.cache import TTLCache
+
+ACTIVE_STATUSES = ("pending", "confirmed")
+
+# car_id -> (first day, bitmap of booked days over CALENDAR_MAX_DAYS from it)
+calendar_cache = TTLCache(maxsize=10000, ttl=settings.CALENDAR_CACHE_TTL)
+
+
+def invalidate_calendar(car_id: int = None):
+    if car_id is None:
+        calendar_cache.clear()
+    else:
+        calendar_cache.invalidate(car_id)
+
+
+def overlapping_bookings(db: Session, car_id: int, start: datetime, end: datetime, exclude_id: int = None):
+    """Active bookings of a car that overlap [start, end)."""
+    query = db.query(Booking).filter(
+        Booking.car_id == car_id,
+        Booking.status.in_(ACTIVE_STATUSES),
+        or_(
+            and_(Booking.start_date <= start, Booking.end_date > start),
+            and_(Booking.start_date < end, Booking.end_date >= end),
+            and_(Booking.start_date >= start, Booking.end_date <= end)
+        )
+    )
+    if exclude_id is not None:
+        query = query.filter(Booking.id != exclude_id)
+    return query
+
+
+def _set_bits(bitmap: bytearray, first: int, last: int):
+    for day in range(first, last + 1):
+        bitmap[day >> 3] |= 1 << (day & 7)
+
+
+def _booked_bitmaps(db: Session, car_ids: List[int], start: date, days: int) -> Dict[int, bytearray]:
+    """One range query for all cars; bit i is set when day start+i overlaps a booking."""
+    window_start = datetime.combine(start, time.min)
+    window_end = window_start + timedelta(days=days)
+    bitmaps = {car_id: bytearray((days + 7) // 8) for car_id in car_ids}
+    rows = db.query(Booking.car_id, Booking.start_date, Booking.end_date).filter(
+        Booking.car_id.in_(car_ids),
+        Booking.status.in_(ACTIVE_STATUSES),
+        Booking.start_date < window_end,
+        Booking.end_date > window_start,
+    ).all()
+    for car_id, booking_start, booking_end in rows:
+        first = max((booking_start - window_start).days, 0)
+        # End is exclusive: a booking ending at midnight leaves that day free
+        last = min((booking_end - window_start - timedelta(microseconds=1)).days, days - 1)
+        _set_bits(bitmaps[car_id], first, last)
+    return bitmaps
+
+
+def _slice(bitmap: bytes, offset: int, days: int) -> bytearray:
+    if offset % 8 == 0:
+        return bytearray(bitmap[offset // 8:offset // 8 + (days + 7) // 8])
+    result = bytearray((days + 7) // 8)
+    for day in range(days):
+        source = offset + day
+        if bitmap[source >> 3] >> (source & 7) & 1:
+            result[day >> 3] |= 1 << (day & 7)
+    return result
+
+
+def booked_days(db: Session, car_ids: List[int], start: date, days: int) -> Dict[int, bytearray]:
+    """
+    Booked-day bitmaps for each car. Windows that start today or later are
+    cut from a per-car bitmap covering CALENDAR_MAX_DAYS ahead, which is
+    cached until a booking for the car changes.
+    """
+    today = date.today()
+    offset = (start - today).days
+    if offset < 0 or offset + days > settings.CALENDAR_MAX_DAYS:
+        return _booked_bitmaps(db, car_ids, start, days)
+
+    result, missing = {}, []
+    for car_id in car_ids:
+        cached = calendar_cache.get(car_id)
+        if cached is not None and cached[0] == today:
+            result[car_id] = _slice(cached[1], offset, days)
+        else:
+            missing.append(car_id)
+    if missing:
+        for car_id, bitmap in _booked_bitmaps(db, missing, today, settings.CALENDAR_MAX_DAYS).items():
+            # Replica rows may lag an invalidation; only cache primary reads
+            if not db.info.get("replica"):
+                calendar_cache.set(car_id, (today, bytes(bitmap)))
+            result[car_id] = _slice(bitmap, offset, days)
+    return result
+
+
+def encode_availability(booked: bytearray, days: int) -> str:
+    """Base64 of the availability bitmap: bit i (LSB first) is 1 when day i is free."""
+    available = bytearray(~byte & 0xFF for byte in booked)
+    if days % 8:
+        available[-1] &= (1 << (days % 8)) - 1
+    return base64.b64encode(bytes(available)).decode()
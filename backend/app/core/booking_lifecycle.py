@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.outbox import record_change
+from app.core.scheduler import Scheduler
+from app.models.booking_model import Booking
+
+
+def _transition(db: Session, condition, status: str) -> int:
+    """
+    Set-based UPDATE in bounded batches so no run holds long row locks.
+    The UPDATE repeats the condition rather than trusting the selected
+    ids: a row changed after the batch was read (a pending booking the
+    owner confirms meanwhile) is re-checked against its latest version and
+    left alone instead of being overwritten. Rows skipped that way make
+    `updated` undercount, so only a short batch ends the run.
+    """
+    total = 0
+    while True:
+        batch = db.query(Booking.id, Booking.car_id).filter(condition).limit(settings.BOOKING_UPDATE_BATCH_SIZE).all()
+        booking_ids = [booking_id for booking_id, _ in batch]
+        if not booking_ids:
+            return total
+        updated = db.query(Booking).filter(Booking.id.in_(booking_ids), condition).update(
+            {Booking.status: status}, synchronize_session=False
+        )
+        record_change(db, "booking", "bulk_update", status=status, booking_ids=booking_ids,
+                      car_ids=sorted({car_id for _, car_id in batch}))
+        db.commit()
+        total += updated
+        if len(booking_ids) < settings.BOOKING_UPDATE_BATCH_SIZE:
+            return total
+
+
+def expire_stale_pending(db: Session) -> dict:
+    """Pending bookings that started unconfirmed, or were never answered."""
+    now = datetime.now()
+    stale_before = now - timedelta(hours=settings.BOOKING_PENDING_TTL_HOURS)
+    expired = _transition(db, and_(
+        Booking.status == "pending",
+        or_(Booking.start_date <= now, Booking.created_at <= stale_before),
+    ), "expired")
+    return {"expired": expired}
+
+
+def complete_finished(db: Session) -> dict:
+    completed = _transition(db, and_(
+        Booking.status == "confirmed",
+        Booking.end_date <= datetime.now(),
+    ), "completed")
+    return {"completed": completed}
+
+
+booking_scheduler = Scheduler("booking-lifecycle")
+booking_scheduler.add_job("expire_pending", settings.BOOKING_LIFECYCLE_INTERVAL, expire_stale_pending)
+booking_scheduler.add_job("complete_finished", settings.BOOKING_LIFECYCLE_INTERVAL, complete_finished)
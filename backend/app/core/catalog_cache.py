@@ -0,0 +1,18 @@
+from typing import Optional
+
+from app.utils.cache import TTLCache
+
+# Facet counts + first page, keyed by the normalized filter set
+facet_cache = TTLCache(maxsize=512, ttl=300)
+
+# CarResponse by car id
+car_cache = TTLCache(maxsize=10000, ttl=300)
+
+
+def invalidate_catalog(car_id: Optional[int] = None):
+    """Drop cached catalog views after a car is created, updated or deleted."""
+    facet_cache.clear()
+    if car_id is None:
+        car_cache.clear()
+    else:
+        car_cache.invalidate(car_id)
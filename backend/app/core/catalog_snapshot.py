@@ -0,0 +1,326 @@
+import asyncio
+import bisect
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.car_model import Car
+from app.models.outbox_model import OutboxEvent
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+# Layout: header, then fixed-width columns sized to `capacity` rows (ids
+# ascending), then the type/location string dictionary. Spare capacity
+# lets new cars be appended in place; a deleted car keeps its row with
+# type code -1 until the next rewrite.
+MAGIC = b"CARSNAP1"
+HEADER = struct.Struct("<8sQQQII")  # magic, count, capacity, dictionary offset, n_types, n_locations
+HEADER_SIZE = 64
+COUNT_OFFSET = 8
+COLUMNS = (("ids", "q", 8), ("price", "d", 8), ("type_code", "i", 4), ("location_code", "i", 4))
+DELETED = -1
+
+
+class Row(NamedTuple):
+    id: int
+    price: float
+    car_type: str
+    location: str
+
+
+def _row(car_id: int, price: Optional[float], car_type: Optional[str], location: Optional[str]) -> Row:
+    # Lowercased in Python on every path so rebuilds and patches agree; a
+    # missing price is NaN, which fails max_price like NULL does in SQL
+    return Row(car_id, float("nan") if price is None else price, (car_type or "").lower(), (location or "").lower())
+
+
+def _column_offsets(capacity: int) -> dict:
+    offsets, position = {}, HEADER_SIZE
+    for name, _, size in COLUMNS:
+        offsets[name] = position
+        position += size * capacity
+    offsets["dictionary"] = position
+    return offsets
+
+
+def _write_file(path: str, rows: List[Row]):
+    """Write a fresh snapshot next to path and atomically swap it in."""
+    types = sorted({row.car_type for row in rows})
+    locations = sorted({row.location for row in rows})
+    type_codes = {value: code for code, value in enumerate(types)}
+    location_codes = {value: code for code, value in enumerate(locations)}
+    capacity = len(rows) + max(1024, len(rows) // 4)
+    offsets = _column_offsets(capacity)
+
+    strings = [value.encode() for value in types + locations]
+    string_offsets, position = [], 0
+    for encoded in strings:
+        string_offsets.append(position)
+        position += len(encoded)
+    string_offsets.append(position)
+
+    columns = {
+        "ids": [row.id for row in rows],
+        "price": [row.price for row in rows],
+        "type_code": [type_codes[row.car_type] for row in rows],
+        "location_code": [location_codes[row.location] for row in rows],
+    }
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as snapshot:
+        snapshot.write(HEADER.pack(MAGIC, len(rows), capacity, offsets["dictionary"], len(types), len(locations)))
+        for name, fmt, size in COLUMNS:
+            snapshot.seek(offsets[name])
+            snapshot.write(struct.pack(f"<{len(rows)}{fmt}", *columns[name]))
+        snapshot.seek(offsets["dictionary"])
+        snapshot.write(struct.pack(f"<{len(string_offsets)}I", *string_offsets))
+        snapshot.write(b"".join(strings))
+    os.replace(temp_path, path)
+
+
+class _Mapping:
+    """One mapped snapshot file; columns are views straight into the map."""
+
+    def __init__(self, path: str, writable: bool = False):
+        with open(path, "r+b" if writable else "rb") as snapshot:
+            self.inode = os.fstat(snapshot.fileno()).st_ino
+            self.buffer = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, _, self.capacity, dictionary_offset, n_types, n_locations = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        self.offsets = _column_offsets(self.capacity)
+
+        total = n_types + n_locations
+        string_offsets = struct.unpack_from(f"<{total + 1}I", self.buffer, dictionary_offset)
+        blob_start = dictionary_offset + 4 * (total + 1)
+        strings = [
+            self.buffer[blob_start + start:blob_start + end].decode()
+            for start, end in zip(string_offsets, string_offsets[1:])
+        ]
+        self.types, self.locations = strings[:n_types], strings[n_types:]
+        self.type_codes = {value: code for code, value in enumerate(self.types)}
+        self.location_codes = {value: code for code, value in enumerate(self.locations)}
+
+    @property
+    def count(self) -> int:
+        # Read live: appends from other workers show up without remapping
+        return struct.unpack_from("<Q", self.buffer, COUNT_OFFSET)[0]
+
+    def column(self, name: str, count: int):
+        fmt, size = {n: (f, s) for n, f, s in COLUMNS}[name]
+        offset = self.offsets[name]
+        if numpy is not None:
+            return numpy.frombuffer(self.buffer, dtype=f"<{fmt}", count=count, offset=offset)
+        return memoryview(self.buffer)[offset:offset + size * count].cast(fmt)
+
+    def put(self, name: str, index: int, value):
+        fmt, size = {n: (f, s) for n, f, s in COLUMNS}[name]
+        struct.pack_into(f"<{fmt}", self.buffer, self.offsets[name] + size * index, value)
+
+    def rows(self) -> List[Row]:
+        count = self.count
+        ids, prices = self.column("ids", count), self.column("price", count)
+        type_codes, location_codes = self.column("type_code", count), self.column("location_code", count)
+        return [
+            Row(int(ids[i]), float(prices[i]), self.types[type_codes[i]], self.locations[location_codes[i]])
+            for i in range(count) if type_codes[i] != DELETED
+        ]
+
+
+def _matching_codes(values: List[str], needle: str) -> List[int]:
+    # Same semantics as the SQL path's ilike '%needle%'
+    needle = needle.lower()
+    return [code for code, value in enumerate(values) if needle in value]
+
+
+class CatalogSnapshot:
+    """
+    Column-oriented copy of the filterable car attributes in a memory-mapped
+    file. Every worker on a node maps the same file read-only, so the page
+    cache holds a single copy however many workers there are.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._mapping: Optional[_Mapping] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    @contextmanager
+    def _lock(self, name: str = "lock", blocking: bool = True):
+        with open(f"{self.path}.{name}", "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _current(self) -> Optional[_Mapping]:
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+        if self._mapping is None or self._mapping.inode != inode:
+            # Rewrites replace the file, so a new inode means a new snapshot
+            self._mapping = _Mapping(self.path)
+        return self._mapping
+
+    def search(self, location: Optional[str], max_price: Optional[float], car_type: Optional[str]) -> Optional[List[int]]:
+        """Ids of matching cars in id order, or None when no snapshot is available."""
+        if not self.enabled:
+            return None
+        mapping = self._current()
+        if mapping is None:
+            return None
+
+        count = mapping.count
+        ids, prices = mapping.column("ids", count), mapping.column("price", count)
+        type_codes, location_codes = mapping.column("type_code", count), mapping.column("location_code", count)
+        wanted_types = set(_matching_codes(mapping.types, car_type)) if car_type else None
+        wanted_locations = set(_matching_codes(mapping.locations, location)) if location else None
+
+        if numpy is not None:
+            mask = type_codes != DELETED
+            if max_price is not None:
+                mask &= prices <= max_price
+            if wanted_types is not None:
+                mask &= numpy.isin(type_codes, list(wanted_types))
+            if wanted_locations is not None:
+                mask &= numpy.isin(location_codes, list(wanted_locations))
+            return ids[mask].tolist()
+
+        return [
+            ids[i] for i in range(count)
+            if type_codes[i] != DELETED
+            and (max_price is None or prices[i] <= max_price)
+            and (wanted_types is None or type_codes[i] in wanted_types)
+            and (wanted_locations is None or location_codes[i] in wanted_locations)
+        ]
+
+    def rebuild(self, db: Session):
+        """
+        Scan the table without holding the write lock, so car writes keep
+        patching the current file meanwhile; cars the outbox shows changing
+        since the scan began (allowing for late commits, as the feed does)
+        are then re-read under the lock.
+        """
+        since = datetime.utcnow() - timedelta(seconds=settings.OUTBOX_GAP_TIMEOUT)
+        rows = {
+            car_id: _row(car_id, price, car_type, location)
+            for car_id, price, car_type, location in db.query(
+                Car.id, Car.price_per_day, Car.car_type, Car.location
+            ).order_by(Car.id).yield_per(10000)
+        }
+        with self._lock():
+            changed = {
+                car_id for (car_id,) in db.query(OutboxEvent.entity_id).filter(
+                    OutboxEvent.created_at >= since, OutboxEvent.entity == "car", OutboxEvent.entity_id.isnot(None)
+                )
+            }
+            for car_id in changed:
+                rows.pop(car_id, None)
+                car = db.query(Car.price_per_day, Car.car_type, Car.location).filter(Car.id == car_id).first()
+                if car:
+                    rows[car_id] = _row(car_id, *car)
+            _write_file(self.path, [rows[car_id] for car_id in sorted(rows)])
+        logger.info("Catalog snapshot rebuilt with %d cars", len(rows))
+
+    def car_changed(self, db: Session, car_id: int):
+        """Apply a committed car write; failures only leave the snapshot stale."""
+        if not self.enabled or not os.path.exists(self.path):
+            return
+        try:
+            self._apply_change(db, car_id)
+        except Exception:
+            logger.exception("Catalog snapshot update for car %s failed", car_id)
+
+    def _apply_change(self, db: Session, car_id: int):
+        """
+        Patched in place when the row and its dictionary values already
+        exist, appended in place when there is spare capacity, otherwise
+        rewritten from the snapshot itself (never a full table scan).
+        """
+        car = db.query(Car.price_per_day, Car.car_type, Car.location).filter(Car.id == car_id).first()
+        row = _row(car_id, *car) if car else None
+
+        with self._lock():
+            mapping = _Mapping(self.path, writable=True)
+            count = mapping.count
+            ids = mapping.column("ids", count)
+            index = bisect.bisect_left(ids, car_id)
+            found = index < count and ids[index] == car_id
+            del ids
+
+            if row is None:
+                if found:
+                    mapping.put("type_code", index, DELETED)
+                return
+
+            type_code = mapping.type_codes.get(row.car_type)
+            location_code = mapping.location_codes.get(row.location)
+            if type_code is not None and location_code is not None:
+                if found:
+                    mapping.put("price", index, row.price)
+                    mapping.put("type_code", index, type_code)
+                    mapping.put("location_code", index, location_code)
+                    return
+                if index == count and count < mapping.capacity:
+                    mapping.put("ids", count, row.id)
+                    mapping.put("price", count, row.price)
+                    mapping.put("type_code", count, type_code)
+                    mapping.put("location_code", count, location_code)
+                    # Publish the row only once it is fully written
+                    struct.pack_into("<Q", mapping.buffer, COUNT_OFFSET, count + 1)
+                    return
+
+            rows = [existing for existing in mapping.rows() if existing.id != car_id]
+            bisect.insort(rows, row)
+            _write_file(self.path, rows)
+
+    def _refresh_if_stale(self):
+        try:
+            age = time.time() - os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            age = None
+        if age is not None and age < settings.CATALOG_SNAPSHOT_REBUILD_INTERVAL:
+            return
+        # One worker per node rebuilds; the others pick up the new file
+        with self._lock("rebuild.lock", blocking=False) as acquired:
+            if acquired:
+                db = SessionLocal()
+                try:
+                    self.rebuild(db)
+                finally:
+                    db.close()
+
+    async def run(self):
+        while True:
+            try:
+                await run_in_threadpool(self._refresh_if_stale)
+            except Exception:
+                logger.exception("Catalog snapshot rebuild failed")
+            await asyncio.sleep(min(60, settings.CATALOG_SNAPSHOT_REBUILD_INTERVAL))
+
+
+catalog_snapshot = CatalogSnapshot(settings.CATALOG_SNAPSHOT_PATH)
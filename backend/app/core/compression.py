@@ -0,0 +1,187 @@
+import time
+import zlib
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Static media is already compressed; recompressing only burns CPU
+SKIP_PATH_PREFIXES = ("/uploads/", "/car_uploads/", "/uploaded_images/", "/storage/")
+SKIP_CONTENT_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "application/octet-stream")
+
+
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        flush = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._compressor.compress(data) + self._compressor.flush(flush)
+
+
+class _BrotliEncoder:
+    name = "br"
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        output = self._compressor.process(data)
+        return output + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class _ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        output = self._compressor.compress(data)
+        if final:
+            return output + self._compressor.flush()
+        return output + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+def _available_encoders() -> List[type]:
+    # Server preference order, used when the client weights encodings equally
+    encoders = []
+    if brotli is not None:
+        encoders.append(_BrotliEncoder)
+    if zstandard is not None:
+        encoders.append(_ZstdEncoder)
+    encoders.append(_GzipEncoder)
+    return encoders
+
+
+def choose_encoder(accept_encoding: str) -> Optional[type]:
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip()] = quality
+
+    best, best_weight = None, 0.0
+    for encoder in _available_encoders():
+        weight = weights.get(encoder.name, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoder, weight
+    return best
+
+
+def _encode(encoder, body: bytes, final: bool) -> bytes:
+    started = time.perf_counter()
+    compressed = encoder.compress(body, final)
+    metrics.increment(f"compression.{encoder.name}.cpu_ms", (time.perf_counter() - started) * 1000)
+    metrics.increment(f"compression.{encoder.name}.bytes_in", len(body))
+    metrics.increment(f"compression.{encoder.name}.bytes_out", len(compressed))
+    return compressed
+
+
+def _header(headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses of COMPRESSION_MIN_SIZE bytes or more with the best
+    encoding the client accepts. Streamed responses are compressed chunk by
+    chunk and flushed, so clients still see each chunk as it is produced.
+    Bytes in/out and CPU time per encoding are recorded in /metrics for
+    tuning the threshold and levels.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        accept_encoding = _header(scope.get("headers", []), b"accept-encoding")
+        encoder_class = choose_encoder(accept_encoding.decode("latin-1")) if accept_encoding else None
+        if encoder_class is None or path.startswith(SKIP_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "encoder": None, "passthrough": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+                if (
+                    message["status"] < 200 or message["status"] in (204, 304)
+                    or _header(headers, b"content-encoding") is not None
+                    or _header(headers, b"content-range") is not None
+                    or content_type.startswith(SKIP_CONTENT_TYPES)
+                ):
+                    state["passthrough"] = True
+                    await send(message)
+                else:
+                    state["start"] = message
+                return
+
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            start = state["start"]
+            if start is not None:
+                state["start"] = None
+                headers = [
+                    (key, value) for key, value in start.get("headers", [])
+                    if key.lower() not in (b"content-length", b"vary")
+                ]
+                vary = _header(start.get("headers", []), b"vary")
+                headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+
+                if not more_body and len(body) < settings.COMPRESSION_MIN_SIZE:
+                    headers.append((b"content-length", str(len(body)).encode()))
+                    state["passthrough"] = True
+                    await send({**start, "headers": headers})
+                    await send(message)
+                    return
+
+                state["encoder"] = encoder_class()
+                headers.append((b"content-encoding", encoder_class.name.encode()))
+                if not more_body:
+                    compressed = _encode(state["encoder"], body, final=True)
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start, "headers": headers})
+
+            compressed = _encode(state["encoder"], body, final=not more_body)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -3,12 +3,91 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# The backend directory; upload folders are served from and written under it
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 class Settings:
     DATABASE_URL = os.getenv("DATABASE_URL")
+    # Optional read replica for read-only routes
+    DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+    READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
     SECRET_KEY = os.getenv("SECRET_KEY")
     ALLOWED_ORIGINS = [
         "http://localhost:5173",
          "http://127.0.0.1:5173"
     ]
+    DEBUG = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+    N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+    # "db" or "memory" (in-process sorted prefix index, single node only)
+    USER_SEARCH_BACKEND = os.getenv("USER_SEARCH_BACKEND", "db")
+    USER_SEARCH_FUZZY = os.getenv("USER_SEARCH_FUZZY", "false").lower() in ("1", "true", "yes")
+    USER_SEARCH_CACHE_TTL = float(os.getenv("USER_SEARCH_CACHE_TTL", "30"))
+    WS_REPLAY_BATCH_SIZE = int(os.getenv("WS_REPLAY_BATCH_SIZE", "100"))
+    WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "25"))
+    WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "60"))
+    WS_MAX_CONNECTIONS_PER_USER = int(os.getenv("WS_MAX_CONNECTIONS_PER_USER", "5"))
+    WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "10000"))
+    PRESENCE_FLUSH_INTERVAL = float(os.getenv("PRESENCE_FLUSH_INTERVAL", "2"))
+    PRESENCE_WORKER_TTL = float(os.getenv("PRESENCE_WORKER_TTL", "30"))
+    # Upper bounds of the price_per_day facet buckets; the last bucket is open-ended
+    PRICE_FACET_BOUNDS = [float(b) for b in os.getenv("PRICE_FACET_BOUNDS", "10000,20000,30000,50000").split(",")]
+    POPULARITY_REFRESH_INTERVAL = float(os.getenv("POPULARITY_REFRESH_INTERVAL", "300"))
+    POPULARITY_HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", "7"))
+    POPULARITY_RECENT_DAYS = int(os.getenv("POPULARITY_RECENT_DAYS", "30"))
+    SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+    SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "60"))
+    BOOKING_LIFECYCLE_INTERVAL = float(os.getenv("BOOKING_LIFECYCLE_INTERVAL", "300"))
+    BOOKING_PENDING_TTL_HOURS = float(os.getenv("BOOKING_PENDING_TTL_HOURS", "48"))
+    BOOKING_UPDATE_BATCH_SIZE = int(os.getenv("BOOKING_UPDATE_BATCH_SIZE", "1000"))
+    # Archived messages leave reconnect replay and message search; see app.core.message_archive
+    MESSAGE_ARCHIVE_ENABLED = os.getenv("MESSAGE_ARCHIVE_ENABLED", "false").lower() in ("1", "true", "yes")
+    MESSAGE_ARCHIVE_AFTER_DAYS = float(os.getenv("MESSAGE_ARCHIVE_AFTER_DAYS", "180"))
+    MESSAGE_ARCHIVE_INTERVAL = float(os.getenv("MESSAGE_ARCHIVE_INTERVAL", "3600"))
+    MESSAGE_ARCHIVE_BATCH_SIZE = int(os.getenv("MESSAGE_ARCHIVE_BATCH_SIZE", "5000"))
+    MESSAGE_SEARCH_CONFIG = os.getenv("MESSAGE_SEARCH_CONFIG", "simple")
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+    STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", BASE_DIR)
+    STORAGE_PUBLIC_URL = os.getenv("STORAGE_PUBLIC_URL", "https://qazaqrental.com/api")
+    STORAGE_UPLOAD_URL_TTL = int(os.getenv("STORAGE_UPLOAD_URL_TTL", "900"))
+    STORAGE_MAX_UPLOAD_BYTES = int(os.getenv("STORAGE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+    S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+    S3_BUCKET = os.getenv("S3_BUCKET")
+    S3_REGION = os.getenv("S3_REGION", "us-east-1")
+    S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY")
+    S3_SECRET_KEY = os.getenv("S3_SECRET_KEY")
+    # Public base for object URLs, e.g. a CDN in front of the bucket
+    S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL")
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+    # Node-local file path; unset disables the snapshot
+    CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH")
+    CATALOG_SNAPSHOT_REBUILD_INTERVAL = float(os.getenv("CATALOG_SNAPSHOT_REBUILD_INTERVAL", "600"))
+    CATALOG_SNAPSHOT_MAX_RESULTS = int(os.getenv("CATALOG_SNAPSHOT_MAX_RESULTS", "5000"))
+    CALENDAR_MAX_DAYS = int(os.getenv("CALENDAR_MAX_DAYS", "366"))
+    CALENDAR_MAX_CARS = int(os.getenv("CALENDAR_MAX_CARS", "100"))
+    CALENDAR_CACHE_TTL = float(os.getenv("CALENDAR_CACHE_TTL", "300"))
+    PRICING_HORIZON_DAYS = int(os.getenv("PRICING_HORIZON_DAYS", "366"))
+    PRICING_CACHE_TTL = float(os.getenv("PRICING_CACHE_TTL", "3600"))
+    # Longest stay that can be quoted or booked; each day is priced individually
+    PRICING_MAX_DAYS = int(os.getenv("PRICING_MAX_DAYS", "366"))
+    # min_days:percent pairs applied when an owner has no duration rules
+    PRICING_DEFAULT_DURATION_TIERS = os.getenv("PRICING_DEFAULT_DURATION_TIERS", "7:15")
+    IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+    # An in-progress key older than this is assumed abandoned by a dead worker
+    IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+    OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+    # How long a missing id may still be an uncommitted transaction before it is skipped
+    OUTBOX_GAP_TIMEOUT = float(os.getenv("OUTBOX_GAP_TIMEOUT", "10"))
+    OUTBOX_RETENTION_HOURS = float(os.getenv("OUTBOX_RETENTION_HOURS", "168"))
+    # "local" publishes to the in-process stand-in broker; empty disables publishing
+    OUTBOX_BROKER = os.getenv("OUTBOX_BROKER", "local")
+    OUTBOX_BROKER_PATH = os.getenv("OUTBOX_BROKER_PATH")
+    OUTBOX_BROKER_INTERVAL = float(os.getenv("OUTBOX_BROKER_INTERVAL", "5"))
 
 settings = Settings()
@@ -0,0 +1,75 @@
+from sqlalchemy.orm import Session
+
+from app.core.database import dialect_insert
+from app.models.conversation_model import Conversation
+from app.models.message_model import Message
+
+PREVIEW_LENGTH = 200
+
+
+def conversation_messages(db: Session, email_a: str, email_b: str):
+    """Messages between two users in either direction; served by ix_messages_pair_id."""
+    return db.query(Message).filter(
+        ((Message.sender_email == email_a) & (Message.receiver_email == email_b))
+        | ((Message.sender_email == email_b) & (Message.receiver_email == email_a))
+    )
+
+
+def record_message(db: Session, message: Message):
+    """
+    Upsert both inbox rows for a freshly flushed message. Runs in the
+    caller's transaction; the caller commits.
+    """
+    preview = message.text[:PREVIEW_LENGTH]
+    sides = (
+        (message.sender_email, message.receiver_email, 0),
+        (message.receiver_email, message.sender_email, 1),
+    )
+    for owner_email, partner_email, unread_increment in sides:
+        stmt = dialect_insert(db, Conversation).values(
+            owner_email=owner_email,
+            partner_email=partner_email,
+            last_message_id=message.id,
+            last_message_text=preview,
+            last_message_at=message.timestamp,
+            last_sender_email=message.sender_email,
+            unread_count=unread_increment,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["owner_email", "partner_email"],
+            set_={
+                "last_message_id": stmt.excluded.last_message_id,
+                "last_message_text": stmt.excluded.last_message_text,
+                "last_message_at": stmt.excluded.last_message_at,
+                "last_sender_email": stmt.excluded.last_sender_email,
+                "unread_count": Conversation.unread_count + unread_increment,
+            },
+        )
+        db.execute(stmt)
+        if message.sender_email == message.receiver_email:
+            break
+
+
+def mark_read(db: Session, owner_email: str, partner_email: str) -> int:
+    return db.query(Conversation).filter(
+        Conversation.owner_email == owner_email,
+        Conversation.partner_email == partner_email,
+    ).update({Conversation.unread_count: 0}, synchronize_session=False)
+
+
+def backfill_conversations(db: Session, batch_size: int = 1000):
+    """
+    One-off rebuild of inbox rows from existing message history.
+    Unread counts start at zero for backfilled conversations.
+    """
+    last_id = 0
+    while True:
+        batch = db.query(Message).filter(Message.id > last_id).order_by(Message.id).limit(batch_size).all()
+        if not batch:
+            break
+        for message in batch:
+            record_message(db, message)
+        last_id = batch[-1].id
+        db.commit()
+    db.query(Conversation).update({Conversation.unread_count: 0}, synchronize_session=False)
+    db.commit()
@@ -1,11 +1,23 @@
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import sessionmaker, Session
 from app.core.config import settings
+from app.core.profiler import install_profiler, install_session_profiler
 
 from app.core.base import Base  
 
 engine = create_engine(settings.DATABASE_URL)
+install_profiler(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+install_session_profiler(SessionLocal)
+
+replica_engine = create_engine(settings.DATABASE_REPLICA_URL) if settings.DATABASE_REPLICA_URL else None
+ReplicaSessionLocal = None
+if replica_engine is not None:
+    install_profiler(replica_engine)
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    install_session_profiler(ReplicaSessionLocal)
+
 
 def get_db():
     db = SessionLocal()
@@ -13,3 +25,21 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def dialect_insert(db: Session, model):
+    """INSERT construct supporting on_conflict_do_update for the bound dialect."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def prefix_match(expression, prefix: str, dialect: str):
+    """
+    Index-friendly `expression LIKE 'prefix%'`. PostgreSQL needs a
+    text_pattern_ops index; SQLite only indexes LIKE under NOCASE, so use a range.
+    """
+    if dialect == "postgresql":
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return expression.like(f"{escaped}%", escape="\\")
+    return (expression >= prefix) & (expression < prefix + "\uffff")
@@ -0,0 +1,118 @@
+"""
+Routes read-only endpoints to the replica engine, falling back to the
+primary for a short window after the same client wrote (read-your-writes).
+
+Stickiness is tracked per client key (bearer token or `email`/`userEmail`
+query parameter) in-process, and with a cookie so it also holds when the
+next request lands on another worker. Anonymous clients, which often
+share one proxy address, are sticky through the cookie alone.
+"""
+import time
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+from typing import Optional
+from urllib.parse import parse_qs
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.database import SessionLocal, ReplicaSessionLocal
+from app.utils.cache import TTLCache
+
+STICKY_COOKIE = "db_primary_until"
+_CLIENT_KEY_PARAMS = ("email", "userEmail", "user_email", "sender_email")
+
+_request_state: ContextVar[Optional[dict]] = ContextVar("db_request_state", default=None)
+_recent_writers = TTLCache(maxsize=100000, ttl=settings.READ_YOUR_WRITES_SECONDS)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _after_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _do_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _after_commit(session):
+    if session.info.pop("wrote", False):
+        state = _request_state.get()
+        if state is not None:
+            state["wrote"] = True
+            if state["client_key"]:
+                _recent_writers.set(state["client_key"], True)
+
+
+def _client_key(scope) -> Optional[str]:
+    headers = dict(scope.get("headers", []))
+    authorization = headers.get(b"authorization")
+    if authorization:
+        return authorization.decode("latin-1")
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    for name in _CLIENT_KEY_PARAMS:
+        if query.get(name):
+            return f"{name}:{query[name][0]}"
+    return None
+
+
+def _sticky_cookie_active(scope) -> bool:
+    raw = dict(scope.get("headers", [])).get(b"cookie")
+    if not raw:
+        return False
+    morsel = SimpleCookie(raw.decode("latin-1")).get(STICKY_COOKIE)
+    try:
+        return morsel is not None and float(morsel.value) > time.time()
+    except ValueError:
+        return False
+
+
+def prefers_primary() -> bool:
+    state = _request_state.get()
+    if state is None:
+        return False
+    return state["sticky"] or (state["client_key"] is not None and state["client_key"] in _recent_writers)
+
+
+def get_read_db():
+    """Session for read-only routes: the replica unless the client just wrote."""
+    if ReplicaSessionLocal is None or prefers_primary():
+        db = SessionLocal()
+    else:
+        db = ReplicaSessionLocal()
+        db.info["replica"] = True
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = {"client_key": _client_key(scope), "sticky": _sticky_cookie_active(scope), "wrote": False}
+        token = _request_state.set(state)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state["wrote"] and ReplicaSessionLocal is not None:
+                until = time.time() + settings.READ_YOUR_WRITES_SECONDS
+                cookie = (
+                    f"{STICKY_COOKIE}={until:.0f}; Max-Age={settings.READ_YOUR_WRITES_SECONDS:.0f}; "
+                    "Path=/; SameSite=Lax; HttpOnly"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_state.reset(token)
@@ -0,0 +1,43 @@
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.database import dialect_insert
+from app.models.delivery_cursor_model import DeliveryCursor
+from app.models.message_model import Message
+
+
+def get_cursor(db: Session, user_email: str, device_id: str) -> Optional[int]:
+    cursor = db.query(DeliveryCursor.last_acked_id).filter(
+        DeliveryCursor.user_email == user_email,
+        DeliveryCursor.device_id == device_id,
+    ).first()
+    return cursor[0] if cursor else None
+
+
+def fetch_undelivered(db: Session, user_email: str, after_id: int, limit: int) -> List[Message]:
+    """One range scan on (receiver_email, id). Archived messages are not replayed."""
+    return db.query(Message).filter(
+        Message.receiver_email == user_email,
+        Message.id > after_id,
+    ).order_by(Message.id).limit(limit).all()
+
+
+def advance_cursor(db: Session, user_email: str, device_id: str, message_id: int):
+    """Move the device cursor forward; acknowledgements never move it back."""
+    stmt = dialect_insert(db, DeliveryCursor).values(
+        user_email=user_email,
+        device_id=device_id,
+        last_acked_id=message_id,
+    )
+    # Scalar max() is spelled greatest() on PostgreSQL
+    greatest = func.max if db.get_bind().dialect.name == "sqlite" else func.greatest
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_email", "device_id"],
+        set_={
+            "last_acked_id": greatest(DeliveryCursor.last_acked_id, stmt.excluded.last_acked_id),
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
@@ -0,0 +1,260 @@
+"""
+Idempotency-Key support for retried writes. A completed response is
+stored under (scope, key) in an in-process LRU and in the database, and
+replayed for retries. Concurrent duplicates wait for the first request:
+on the same worker through a shared future, across workers by polling
+its in-progress row.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.scheduler import Scheduler
+from app.models.idempotency_model import IdempotencyKey
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+HEADER = b"idempotency-key"
+IDEMPOTENT_ROUTES = {"/car/cars", "/chat/send", "/favorites", "/favorites/batch", "/bookings"}
+CLAIMED, DONE, BUSY, MISMATCH = "claimed", "done", "busy", "mismatch"
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: int
+    headers: list
+    body: bytes
+
+
+_responses = TTLCache(maxsize=10000, ttl=settings.IDEMPOTENCY_TTL_HOURS * 3600)
+_in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+def _stored(row: IdempotencyKey) -> StoredResponse:
+    headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in json.loads(row.response_headers or "[]")]
+    return StoredResponse(row.fingerprint, row.status_code, headers, row.response_body or b"")
+
+
+def _claim(scope: str, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+    db = SessionLocal()
+    try:
+        row = db.query(IdempotencyKey).filter(IdempotencyKey.scope == scope, IdempotencyKey.key == key).first()
+        if row is None:
+            try:
+                db.add(IdempotencyKey(scope=scope, key=key, fingerprint=fingerprint))
+                db.commit()
+                return CLAIMED, None
+            except IntegrityError:
+                db.rollback()
+                return BUSY, None
+
+        if row.fingerprint != fingerprint:
+            return MISMATCH, None
+        if row.status_code is not None:
+            return DONE, _stored(row)
+
+        # The worker that claimed the key died mid-request; take it over
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        if row.created_at < stale_before:
+            taken = db.query(IdempotencyKey).filter(
+                IdempotencyKey.id == row.id, IdempotencyKey.created_at == row.created_at
+            ).update({IdempotencyKey.created_at: datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+            if taken:
+                return CLAIMED, None
+        return BUSY, None
+    finally:
+        db.close()
+
+
+def _complete(scope: str, key: str, response: StoredResponse):
+    db = SessionLocal()
+    try:
+        headers = json.dumps([(k.decode("latin-1"), v.decode("latin-1")) for k, v in response.headers])
+        db.query(IdempotencyKey).filter(IdempotencyKey.scope == scope, IdempotencyKey.key == key).update({
+            IdempotencyKey.status_code: response.status_code,
+            IdempotencyKey.response_headers: headers,
+            IdempotencyKey.response_body: response.body,
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _release(scope: str, key: str):
+    """Forget a failed attempt so the client's retry runs again."""
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.scope == scope, IdempotencyKey.key == key, IdempotencyKey.status_code.is_(None)
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def purge_expired_keys(db) -> dict:
+    cutoff = datetime.utcnow() - timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+    purged = db.query(IdempotencyKey).filter(IdempotencyKey.created_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return {"purged": purged}
+
+
+idempotency_scheduler = Scheduler("idempotency")
+idempotency_scheduler.add_job("purge_expired_keys", 3600, purge_expired_keys)
+
+
+def _fingerprint(content_type: bytes, body: bytes) -> str:
+    media_type, _, params = content_type.partition(b";")
+    if media_type.strip() == b"multipart/form-data" and b"boundary=" in params:
+        # Retries rebuild the form with a fresh random boundary
+        boundary = params.split(b"boundary=", 1)[1].split(b";")[0].strip(b' "')
+        body = body.replace(boundary, b"")
+    return hashlib.sha256(media_type.strip() + b"\n" + body).hexdigest()
+
+
+async def _send_json(send, status_code: int, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _replay(send, response: StoredResponse):
+    metrics.increment("idempotency.replayed")
+    await send({
+        "type": "http.response.start",
+        "status": response.status_code,
+        "headers": response.headers + [(b"idempotent-replayed", b"true")],
+    })
+    await send({"type": "http.response.body", "body": response.body})
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers", []))
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        if HEADER not in headers or path.rstrip("/") not in IDEMPOTENT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+
+        key = headers[HEADER].decode("latin-1").strip()
+        if not key or len(key) > 255:
+            await _send_json(send, 400, "Idempotency-Key must be 1 to 255 characters")
+            return
+
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+
+        # Keys are per endpoint and caller; reusing one for a different payload is an error
+        request_scope = hashlib.sha256(b"\n".join([
+            path.rstrip("/").encode(), scope.get("query_string", b""), headers.get(b"authorization", b""),
+        ])).hexdigest()
+        fingerprint = _fingerprint(headers.get(b"content-type", b""), body)
+        cache_key = (request_scope, key)
+
+        while True:
+            stored = _responses.get(cache_key)
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    await _send_json(send, 422, "Idempotency-Key was already used with a different request")
+                else:
+                    await _replay(send, stored)
+                return
+            pending = _in_flight.get(cache_key)
+            if pending is None:
+                break
+            metrics.increment("idempotency.coalesced")
+            await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        _in_flight[cache_key] = future
+        try:
+            await self._handle(cache_key, fingerprint, body, scope, receive, send)
+        finally:
+            _in_flight.pop(cache_key, None)
+            future.set_result(None)
+
+    async def _handle(self, cache_key, fingerprint, body, scope, receive, send):
+        request_scope, key = cache_key
+        waited = 0.0
+        while True:
+            outcome, stored = await run_in_threadpool(_claim, request_scope, key, fingerprint)
+            if outcome == DONE:
+                _responses.set(cache_key, stored)
+                await _replay(send, stored)
+                return
+            if outcome == MISMATCH:
+                await _send_json(send, 422, "Idempotency-Key was already used with a different request")
+                return
+            if outcome == CLAIMED:
+                break
+            # Another worker is running this request; wait for its result
+            if waited >= settings.IDEMPOTENCY_WAIT_SECONDS:
+                await _send_json(send, 409, "A request with this Idempotency-Key is still in progress")
+                return
+            await asyncio.sleep(0.2)
+            waited += 0.2
+
+        replayed = False
+
+        async def replay_receive():
+            # Hand the buffered body over once, then wait for disconnect as usual
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        response = {"status": 500, "headers": [], "body": []}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        except BaseException:
+            await run_in_threadpool(_release, request_scope, key)
+            raise
+
+        if response["status"] >= 500:
+            await run_in_threadpool(_release, request_scope, key)
+            return
+        stored = StoredResponse(fingerprint, response["status"], response["headers"], b"".join(response["body"]))
+        try:
+            await run_in_threadpool(_complete, request_scope, key, stored)
+        except Exception:
+            logger.exception("Storing idempotent response failed")
+        _responses.set(cache_key, stored)
@@ -0,0 +1,124 @@
+import json
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.outbox import record_change
+from app.core.scheduler import Scheduler
+from app.models.message_archive_model import MessageArchiveSegment
+from app.models.message_model import Message
+from app.utils.cache import TTLCache
+
+# Segments never change once written, so decoded ones can be kept around
+_segment_cache = TTLCache(maxsize=1024, ttl=600)
+
+
+def conversation_key(email_a: str, email_b: str) -> str:
+    return "|".join(sorted((email_a, email_b)))
+
+
+def _encode(messages: List[Message]) -> bytes:
+    rows = [[m.id, m.sender_email, m.receiver_email, m.text, m.timestamp.isoformat()] for m in messages]
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode(), 6)
+
+
+def _decode(segment: MessageArchiveSegment) -> List[dict]:
+    messages = _segment_cache.get(segment.id)
+    if messages is None:
+        messages = [
+            {
+                "id": message_id,
+                "sender_email": sender_email,
+                "receiver_email": receiver_email,
+                "text": text,
+                "timestamp": datetime.fromisoformat(timestamp),
+            }
+            for message_id, sender_email, receiver_email, text, timestamp
+            in json.loads(zlib.decompress(segment.payload))
+        ]
+        _segment_cache.set(segment.id, messages)
+    return messages
+
+
+def archive_messages(db: Session) -> dict:
+    """
+    Move messages older than MESSAGE_ARCHIVE_AFTER_DAYS into per-conversation,
+    per-month segments. Each batch writes its segments and deletes the hot
+    rows in one transaction, oldest ids first, so segment id ranges of a
+    conversation never overlap.
+
+    Only conversation history reads the archive. Reconnect replay
+    (fetch_undelivered) and /chat/search-messages query the hot table, so
+    a device offline longer than MESSAGE_ARCHIVE_AFTER_DAYS misses the
+    archived messages, and search no longer finds them.
+    """
+    cutoff = datetime.now() - timedelta(days=settings.MESSAGE_ARCHIVE_AFTER_DAYS)
+    archived = segments = 0
+    while True:
+        batch = db.query(Message).filter(Message.timestamp < cutoff).order_by(Message.id).limit(
+            settings.MESSAGE_ARCHIVE_BATCH_SIZE
+        ).all()
+        if not batch:
+            break
+
+        groups = defaultdict(list)
+        for message in batch:
+            key = conversation_key(message.sender_email, message.receiver_email)
+            groups[(key, message.timestamp.strftime("%Y-%m"))].append(message)
+        for (key, period), messages in groups.items():
+            db.add(MessageArchiveSegment(
+                conversation_key=key,
+                period=period,
+                first_id=messages[0].id,
+                last_id=messages[-1].id,
+                first_at=min(m.timestamp for m in messages),
+                last_at=max(m.timestamp for m in messages),
+                message_count=len(messages),
+                payload=_encode(messages),
+            ))
+        db.query(Message).filter(Message.id.in_([m.id for m in batch])).delete(synchronize_session=False)
+        record_change(db, "message", "archive", first_id=batch[0].id, last_id=batch[-1].id, count=len(batch))
+        db.commit()
+        db.expunge_all()
+
+        archived += len(batch)
+        segments += len(groups)
+        if len(batch) < settings.MESSAGE_ARCHIVE_BATCH_SIZE:
+            break
+    return {"archived": archived, "segments": segments}
+
+
+def archived_page(db: Session, email_a: str, email_b: str, before_id: Optional[int], limit: int) -> List[dict]:
+    """Newest archived messages of a conversation below before_id, oldest first."""
+    query = db.query(MessageArchiveSegment).filter(
+        MessageArchiveSegment.conversation_key == conversation_key(email_a, email_b)
+    )
+    if before_id is not None:
+        query = query.filter(MessageArchiveSegment.first_id < before_id)
+
+    page = []
+    # Segments are read lazily, newest first, until the page is full
+    for segment in query.order_by(MessageArchiveSegment.last_id.desc()).yield_per(8):
+        messages = _decode(segment)
+        if before_id is not None:
+            messages = [m for m in messages if m["id"] < before_id]
+        page = messages[-(limit - len(page)):] + page
+        if len(page) >= limit:
+            break
+    return page
+
+
+def archived_history(db: Session, email_a: str, email_b: str) -> List[dict]:
+    """Every archived message of a conversation, oldest first."""
+    segments = db.query(MessageArchiveSegment).filter(
+        MessageArchiveSegment.conversation_key == conversation_key(email_a, email_b)
+    ).order_by(MessageArchiveSegment.first_id)
+    return [message for segment in segments.yield_per(8) for message in _decode(segment)]
+
+
+archive_scheduler = Scheduler("message-archive")
+archive_scheduler.add_job("archive_messages", settings.MESSAGE_ARCHIVE_INTERVAL, archive_messages)
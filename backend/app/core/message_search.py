@@ -0,0 +1,96 @@
+import logging
+from typing import List, Tuple
+
+from sqlalchemy import and_, column, func, literal_column, or_, select, table, text
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.models.message_model import Message
+
+logger = logging.getLogger(__name__)
+
+# SQLite FTS5 external-content index over messages.text, kept current by triggers
+_fts = table("messages_fts", column("rowid"), column("rank"))
+
+_SQLITE_SETUP = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(text, content='messages', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN "
+    "INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF text ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text); END",
+]
+
+
+def _ts_config():
+    # Inlined rather than bound so the planner can match the expression index
+    return literal_column(f"'{settings.MESSAGE_SEARCH_CONFIG}'::regconfig")
+
+
+def _pg_vector():
+    return func.to_tsvector(_ts_config(), Message.text)
+
+
+def _fts5_query(query: str) -> str:
+    # Quote every term so user input is never parsed as FTS5 syntax
+    return " ".join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+
+
+def search_messages(db: Session, user_email: str, query: str, limit: int, offset: int) -> List[Tuple[Message, float]]:
+    """Messages sent or received by user_email matching query, best first."""
+    dialect = db.get_bind().dialect.name
+    own = or_(Message.sender_email == user_email, Message.receiver_email == user_email)
+
+    if dialect == "postgresql":
+        tsquery = func.plainto_tsquery(_ts_config(), query)
+        rank = func.ts_rank(_pg_vector(), tsquery)
+        rows = db.query(Message, rank).filter(own, _pg_vector().op("@@")(tsquery)).order_by(
+            rank.desc(), Message.id.desc()
+        )
+    elif dialect == "sqlite":
+        rows = db.query(Message, -_fts.c.rank).join(_fts, _fts.c.rowid == Message.id).filter(
+            own, literal_column("messages_fts").op("MATCH")(_fts5_query(query))
+        ).order_by(_fts.c.rank, Message.id.desc())
+    else:
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rows = db.query(Message, literal_column("0.0")).filter(
+            own, Message.text.ilike(f"%{escaped}%", escape="\\")
+        ).order_by(Message.id.desc())
+
+    return [(message, float(rank or 0)) for message, rank in rows.offset(offset).limit(limit).all()]
+
+
+def context_ids(db: Session, message_ids: List[int]) -> dict:
+    """Previous and next message id in the same conversation, for each message."""
+    if not message_ids:
+        return {}
+    other = aliased(Message)
+    same_conversation = or_(
+        and_(other.sender_email == Message.sender_email, other.receiver_email == Message.receiver_email),
+        and_(other.sender_email == Message.receiver_email, other.receiver_email == Message.sender_email),
+    )
+    previous_id = select(func.max(other.id)).where(same_conversation, other.id < Message.id).scalar_subquery()
+    next_id = select(func.min(other.id)).where(same_conversation, other.id > Message.id).scalar_subquery()
+    rows = db.query(Message.id, previous_id, next_id).filter(Message.id.in_(message_ids)).all()
+    return {message_id: (before, after) for message_id, before, after in rows}
+
+
+def setup_message_search(engine):
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_messages_text_fts ON messages "
+                f"USING gin (to_tsvector('{settings.MESSAGE_SEARCH_CONFIG}'::regconfig, text))"
+            ))
+    elif engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+            )).first()
+            for statement in _SQLITE_SETUP:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+                logger.info("Built message search index")
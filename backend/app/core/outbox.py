@@ -0,0 +1,317 @@
+"""
+Transactional outbox. Every flush that touches a car, booking, favorite
+or message adds an outbox_events row in the same transaction, so the
+feed never misses a committed write or reports a rolled-back one.
+
+Each worker tails the table and hands events to in-process subscribers
+(cache invalidation and the like), which keeps every worker's caches in
+step with writes made on any other worker. The scheduler leader also
+forwards the feed to the broker backend from a durable cursor, so
+external consumers can resume or replay from any id still retained.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.availability import invalidate_calendar
+from app.core.catalog_cache import invalidate_catalog
+from app.core.config import settings
+from app.core.database import SessionLocal, dialect_insert
+from app.core.metrics import metrics
+from app.core.pricing import invalidate_pricing
+from app.core.scheduler import Scheduler
+from app.models.booking_model import Booking
+from app.models.car_model import Car
+from app.models.favorite_model import Favorite
+from app.models.message_model import Message
+from app.models.outbox_model import OutboxCursor, OutboxEvent
+from app.models.pricing_rule_model import PricingRule
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeEvent(NamedTuple):
+    id: int
+    entity: str
+    entity_id: Optional[int]
+    op: str
+    payload: dict
+    created_at: datetime
+
+
+def _payload(instance) -> dict:
+    if isinstance(instance, Car):
+        return {"owner_email": instance.owner_email}
+    if isinstance(instance, Booking):
+        return {"car_id": instance.car_id, "user_id": instance.user_id, "status": instance.status}
+    if isinstance(instance, Favorite):
+        return {"car_id": instance.car_id, "user_id": instance.user_id}
+    if isinstance(instance, Message):
+        return {"sender_email": instance.sender_email, "receiver_email": instance.receiver_email}
+    if isinstance(instance, PricingRule):
+        return {"owner_email": instance.owner_email, "car_id": instance.car_id}
+    return {}
+
+
+TRACKED = {Car: "car", Booking: "booking", Favorite: "favorite", Message: "message", PricingRule: "pricing_rule"}
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _write_outbox(session, flush_context):
+    rows = []
+    for instances, op in ((session.new, "insert"), (session.dirty, "update"), (session.deleted, "delete")):
+        for instance in instances:
+            entity = TRACKED.get(type(instance))
+            if entity is None or (op == "update" and not session.is_modified(instance, include_collections=False)):
+                continue
+            rows.append({
+                "entity": entity,
+                "entity_id": instance.id,
+                "op": op,
+                "payload": json.dumps(_payload(instance)),
+                "created_at": datetime.utcnow(),
+            })
+    if rows:
+        session.connection().execute(OutboxEvent.__table__.insert(), rows)
+
+
+def record_change(db: Session, entity: str, op: str, entity_id: Optional[int] = None, **payload):
+    """Outbox entry for bulk statements that bypass the unit of work; commit with them."""
+    db.execute(OutboxEvent.__table__.insert().values(
+        entity=entity, entity_id=entity_id, op=op, payload=json.dumps(payload), created_at=datetime.utcnow()
+    ))
+
+
+def _to_event(row: OutboxEvent) -> ChangeEvent:
+    return ChangeEvent(row.id, row.entity, row.entity_id, row.op, json.loads(row.payload or "{}"), row.created_at)
+
+
+def read_events(db: Session, after_id: int, limit: int) -> List[ChangeEvent]:
+    """Replay: events after a position, in feed order."""
+    rows = db.query(OutboxEvent).filter(OutboxEvent.id > after_id).order_by(OutboxEvent.id).limit(limit).all()
+    return [_to_event(row) for row in rows]
+
+
+class FeedPosition:
+    """
+    Tracks how far a consumer has read. An id can commit after a larger
+    one, so a gap in the ids is waited on for OUTBOX_GAP_TIMEOUT before
+    it is assumed to be a rolled-back transaction and skipped. Every gap
+    in a batch is timed from when it was first seen, so gaps behind the
+    one being waited on age meanwhile instead of each adding a timeout.
+    """
+
+    def __init__(self, last_id: int, name: str):
+        self.last_id = last_id
+        self.name = name
+        # (first missing id, last missing id, first seen) for each known gap
+        self._gaps: List[Tuple[int, int, float]] = []
+
+    def _track_gaps(self, events: List[ChangeEvent], now: float) -> Dict[int, float]:
+        """When each gap in the batch was first seen, keyed by the id that follows it."""
+        seen_at, gaps, expected = {}, [], self.last_id + 1
+        for change in events:
+            if change.id > expected:
+                # A gap that partly filled in keeps the age of the gap it came from
+                since = min((t for lo, hi, t in self._gaps if lo <= change.id - 1 and hi >= expected), default=now)
+                gaps.append((expected, change.id - 1, since))
+                seen_at[change.id] = since
+            expected = change.id + 1
+        self._gaps = gaps
+        return seen_at
+
+    def take(self, events: List[ChangeEvent]) -> List[ChangeEvent]:
+        now = time.monotonic()
+        seen_at = self._track_gaps(events, now)
+        taken, skipped, stalled = [], 0, None
+        for change in events:
+            if change.id in seen_at:
+                if now - seen_at[change.id] < settings.OUTBOX_GAP_TIMEOUT:
+                    stalled = now - seen_at[change.id]
+                    break
+                skipped += change.id - self.last_id - 1
+            self.last_id = change.id
+            taken.append(change)
+        self._gaps = [gap for gap in self._gaps if gap[0] > self.last_id]
+
+        metrics.gauge(f"outbox.{self.name}.stalled_seconds", stalled or 0.0)
+        if stalled is not None:
+            metrics.increment(f"outbox.{self.name}.stalls")
+        if skipped:
+            metrics.increment(f"outbox.{self.name}.skipped_ids", skipped)
+            logger.warning("Outbox %s skipped %d ids assumed rolled back, now at %d", self.name, skipped, self.last_id)
+        return taken
+
+
+class LocalBroker:
+    """
+    Stand-in for an external broker: keeps recent events in memory and,
+    when OUTBOX_BROKER_PATH is set, appends them to a JSON-lines file.
+    """
+
+    def __init__(self, path: Optional[str] = None, keep: int = 10000):
+        self.path = path
+        self.events = deque(maxlen=keep)
+
+    def publish(self, events: List[ChangeEvent]):
+        self.events.extend(events)
+        if self.path:
+            with open(self.path, "a") as log:
+                for change in events:
+                    log.write(json.dumps({**change._asdict(), "created_at": change.created_at.isoformat()}) + "\n")
+
+
+def _log_failure(change: ChangeEvent, future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Outbox subscriber failed for event %s", change.id, exc_info=future.exception())
+
+
+def _create_broker():
+    if settings.OUTBOX_BROKER == "local":
+        return LocalBroker(settings.OUTBOX_BROKER_PATH)
+    return None
+
+
+class OutboxDispatcher:
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable[[ChangeEvent], None]]] = defaultdict(list)
+        self._position: Optional[FeedPosition] = None
+        self._broker_position: Optional[FeedPosition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.broker = _create_broker()
+
+    def subscribe(self, entity: str, handler: Callable[[ChangeEvent], None]):
+        """
+        Call handler for every event of an entity ("*" for all), on every
+        worker. Plain handlers run on the polling thread; coroutine handlers
+        (e.g. WebSocket pushes) are scheduled on the event loop, unawaited.
+        """
+        self._subscribers[entity].append(handler)
+
+    def replay(self, db: Session, after_id: int, handler: Callable[[ChangeEvent], None]) -> int:
+        """Feed every retained event after after_id to handler, e.g. to rebuild a derived view."""
+        replayed = 0
+        while True:
+            changes = read_events(db, after_id, settings.OUTBOX_BATCH_SIZE)
+            for change in changes:
+                handler(change)
+            replayed += len(changes)
+            if len(changes) < settings.OUTBOX_BATCH_SIZE:
+                return replayed
+            after_id = changes[-1].id
+
+    def _deliver(self, change: ChangeEvent):
+        for handler in self._subscribers.get(change.entity, []) + self._subscribers.get("*", []):
+            try:
+                if asyncio.iscoroutinefunction(handler):
+                    if self._loop is not None:
+                        future = asyncio.run_coroutine_threadsafe(handler(change), self._loop)
+                        future.add_done_callback(partial(_log_failure, change))
+                else:
+                    handler(change)
+            except Exception:
+                logger.exception("Outbox subscriber failed for event %s", change.id)
+
+    def poll(self, db: Session) -> int:
+        if self._position is None:
+            # Subscribers only care about changes from now on
+            self._position = FeedPosition(db.query(func.max(OutboxEvent.id)).scalar() or 0, "subscribers")
+            return 0
+        changes = self._position.take(read_events(db, self._position.last_id, settings.OUTBOX_BATCH_SIZE))
+        for change in changes:
+            self._deliver(change)
+        metrics.increment("outbox.delivered", len(changes))
+        return len(changes)
+
+    def _poll_in_session(self) -> int:
+        db = SessionLocal()
+        try:
+            return self.poll(db)
+        finally:
+            db.close()
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        while True:
+            try:
+                delivered = await run_in_threadpool(self._poll_in_session)
+            except Exception:
+                delivered = 0
+                logger.exception("Outbox poll failed")
+            if delivered < settings.OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(settings.OUTBOX_POLL_INTERVAL)
+
+    def publish_to_broker(self, db: Session) -> dict:
+        """Forward the feed to the broker from the durable broker cursor."""
+        if self.broker is None:
+            return {}
+        cursor_id = db.query(OutboxCursor.last_id).filter(OutboxCursor.name == "broker").scalar() or 0
+        # Kept across runs so gap waits carry over; reset if another leader moved the cursor
+        if self._broker_position is None or self._broker_position.last_id != cursor_id:
+            self._broker_position = FeedPosition(cursor_id, "broker")
+        position = self._broker_position
+        published = 0
+        while True:
+            changes = position.take(read_events(db, position.last_id, settings.OUTBOX_BATCH_SIZE))
+            if not changes:
+                break
+            self.broker.publish(changes)
+            stmt = dialect_insert(db, OutboxCursor).values(name="broker", last_id=position.last_id)
+            db.execute(stmt.on_conflict_do_update(index_elements=["name"], set_={"last_id": position.last_id}))
+            db.commit()
+            published += len(changes)
+        metrics.gauge("outbox.broker_position", position.last_id)
+        return {"published": published}
+
+
+outbox = OutboxDispatcher()
+
+
+def purge_outbox(db: Session) -> dict:
+    """Drop events past retention that the broker has already taken."""
+    cutoff = datetime.utcnow() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    query = db.query(OutboxEvent).filter(OutboxEvent.created_at < cutoff)
+    if outbox.broker is not None:
+        broker_position = db.query(OutboxCursor.last_id).filter(OutboxCursor.name == "broker").scalar() or 0
+        query = query.filter(OutboxEvent.id <= broker_position)
+    purged = query.delete(synchronize_session=False)
+    db.commit()
+    return {"purged": purged}
+
+
+outbox_scheduler = Scheduler("outbox")
+outbox_scheduler.add_job("publish_to_broker", settings.OUTBOX_BROKER_INTERVAL, outbox.publish_to_broker)
+outbox_scheduler.add_job("purge_outbox", 3600, purge_outbox)
+
+
+def _car_changed(change: ChangeEvent):
+    invalidate_catalog(change.entity_id)
+    invalidate_pricing([change.entity_id] if change.entity_id is not None else None)
+
+
+def _booking_changed(change: ChangeEvent):
+    if change.entity_id is not None:
+        invalidate_calendar(change.payload.get("car_id"))
+        return
+    for car_id in change.payload.get("car_ids", []):
+        invalidate_calendar(car_id)
+
+
+def _pricing_rule_changed(change: ChangeEvent):
+    # Owner-wide rules apply to cars this worker cannot list without a query
+    car_id = change.payload.get("car_id")
+    invalidate_pricing([car_id] if car_id is not None else None)
+
+
+outbox.subscribe("car", _car_changed)
+outbox.subscribe("booking", _booking_changed)
+outbox.subscribe("pricing_rule", _pricing_rule_changed)
@@ -0,0 +1,188 @@
+import asyncio
+import bisect
+import heapq
+import logging
+import math
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import SessionLocal, dialect_insert
+from app.core.scheduler import Scheduler
+from app.models.booking_model import Booking
+from app.models.car_model import Car
+from app.models.car_stats_model import CarStats
+from app.utils.gazetteer import canonical_city
+
+logger = logging.getLogger(__name__)
+
+FAVORITE_WEIGHT = 1.0
+BOOKING_WEIGHT = 3.0
+INDEX_DEPTH = 50
+
+# Scores are sum(weight * growth(t_event)), stored as its natural log so
+# the growth term stays linear in time instead of overflowing a float.
+# Subtracting log_growth(now) gives the decayed score's log, and since that
+# term is shared by every car, ranking by the stored value equals ranking
+# by the decayed one.
+SCORE_EPOCH = datetime(2025, 1, 1)
+
+
+def _log_growth(now: Optional[datetime] = None) -> float:
+    now = now or datetime.utcnow()
+    days = (now - SCORE_EPOCH).total_seconds() / 86400
+    return days / settings.POPULARITY_HALF_LIFE_DAYS * math.log(2)
+
+
+def decayed_score(log_score: Optional[float], now: Optional[datetime] = None) -> float:
+    return 0.0 if log_score is None else math.exp(log_score - _log_growth(now))
+
+
+def _log_add(db: Session, column, log_increment: float):
+    """log(exp(column) + exp(log_increment)) without leaving log space."""
+    # Scalar max() is spelled greatest() on PostgreSQL
+    greatest = func.max if db.get_bind().dialect.name == "sqlite" else func.greatest
+    return greatest(column, log_increment) + func.ln(1 + func.exp(-func.abs(column - log_increment)))
+
+
+def _bump(db: Session, car_ids: List[int], favorites: int = 0, bookings: int = 0, weight: float = 0.0):
+    """One upsert applying the same change to every car in car_ids."""
+    log_increment = math.log(weight) + _log_growth() if weight > 0 else None
+    stmt = dialect_insert(db, CarStats).values([
+        {
+            "car_id": car_id,
+            "favorites_count": max(favorites, 0),
+            "bookings_count": bookings,
+            "recent_bookings_count": bookings,
+            "log_score": log_increment,
+        }
+        # Sorted so concurrent batches lock rows in the same order
+        for car_id in sorted(set(car_ids))
+    ])
+    set_ = {
+        "favorites_count": CarStats.favorites_count + favorites,
+        "bookings_count": CarStats.bookings_count + bookings,
+        "recent_bookings_count": CarStats.recent_bookings_count + bookings,
+    }
+    if log_increment is not None:
+        set_["log_score"] = func.coalesce(_log_add(db, CarStats.log_score, log_increment), log_increment)
+    db.execute(stmt.on_conflict_do_update(index_elements=["car_id"], set_=set_))
+
+
+def record_favorites(db: Session, car_ids: List[int], added: bool = True):
+    """
+    Count favorite changes in the caller's transaction. Removing a favorite
+    only lowers the count; past interest keeps decaying out of the score.
+    """
+    if not car_ids:
+        return
+    if added:
+        _bump(db, car_ids, favorites=1, weight=FAVORITE_WEIGHT)
+    else:
+        _bump(db, car_ids, favorites=-1)
+
+
+def record_favorite(db: Session, car_id: int, added: bool = True):
+    record_favorites(db, [car_id], added)
+
+
+def record_booking(db: Session, car_id: int):
+    _bump(db, [car_id], bookings=1, weight=BOOKING_WEIGHT)
+
+
+def price_band(price: float) -> int:
+    return bisect.bisect_right(settings.PRICE_FACET_BOUNDS, price)
+
+
+def location_key(location: Optional[str]) -> str:
+    return canonical_city(location) or (location or "").strip().lower()
+
+
+def similarity_key(car_type: str, location: str, price: float) -> Tuple[str, str, int]:
+    return ((car_type or "").strip().lower(), location_key(location), price_band(price))
+
+
+class PopularityIndex:
+    """
+    Precomputed top-N car ids per location and per (type, location, price band),
+    rebuilt in the background so requests never rank the catalog themselves.
+    Lookups return nothing until run() has built it once, just after startup.
+    """
+
+    def __init__(self):
+        self._top: Dict[Optional[str], List[int]] = {}
+        self._similar: Dict[Tuple[str, str, int], List[int]] = {}
+        self._lock = threading.Lock()
+        self.built_at: Optional[datetime] = None
+
+    def refresh(self, db: Session):
+        """Rebuild this worker's in-memory index; it writes nothing."""
+        top = defaultdict(list)
+        similar = defaultdict(list)
+        rows = db.query(
+            Car.id, Car.location, Car.car_type, Car.price_per_day, CarStats.log_score
+        ).outerjoin(CarStats, CarStats.car_id == Car.id).yield_per(5000)
+        for car_id, location, car_type, price, log_score in rows:
+            if log_score is not None:
+                top[location_key(location)].append((log_score, car_id))
+                top[None].append((log_score, car_id))
+            similar[similarity_key(car_type, location, price)].append(
+                (-math.inf if log_score is None else log_score, car_id)
+            )
+
+        def rank(entries):
+            return [car_id for _, car_id in heapq.nlargest(INDEX_DEPTH, entries)]
+
+        top = {key: rank(entries) for key, entries in top.items()}
+        similar = {key: rank(entries) for key, entries in similar.items()}
+        with self._lock:
+            self._top, self._similar = top, similar
+            self.built_at = datetime.utcnow()
+
+    def popular(self, location: Optional[str] = None, limit: int = 10) -> List[int]:
+        key = location_key(location) if location else None
+        return self._top.get(key, [])[:limit]
+
+    def similar(self, car: Car, limit: int = 10) -> List[int]:
+        ids = self._similar.get(similarity_key(car.car_type, car.location, car.price_per_day), [])
+        return [car_id for car_id in ids if car_id != car.id][:limit]
+
+    def _refresh_in_session(self):
+        db = SessionLocal()
+        try:
+            self.refresh(db)
+        finally:
+            db.close()
+
+    async def run(self):
+        while True:
+            try:
+                await run_in_threadpool(self._refresh_in_session)
+            except Exception:
+                logger.exception("Popularity index refresh failed")
+            await asyncio.sleep(settings.POPULARITY_REFRESH_INTERVAL)
+
+
+popularity_index = PopularityIndex()
+
+
+def recount_recent_bookings(db: Session) -> dict:
+    """A full pass over car_stats, so it runs once per interval on the scheduler leader only."""
+    cutoff = datetime.utcnow() - timedelta(days=settings.POPULARITY_RECENT_DAYS)
+    recent = select(func.count(Booking.id)).where(
+        Booking.car_id == CarStats.car_id,
+        Booking.created_at >= cutoff,
+    ).scalar_subquery()
+    updated = db.query(CarStats).update({CarStats.recent_bookings_count: recent}, synchronize_session=False)
+    db.commit()
+    return {"updated": updated}
+
+
+popularity_scheduler = Scheduler("popularity")
+popularity_scheduler.add_job("recount_recent_bookings", settings.POPULARITY_REFRESH_INTERVAL, recount_recent_bookings)
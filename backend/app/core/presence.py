@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import SessionLocal, dialect_insert
+from app.core.websocket_manager import ConnectionManager
+from app.core.worker import worker_id
+from app.models.conversation_model import Conversation
+from app.models.presence_model import PresenceWorker, UserPresence
+
+logger = logging.getLogger(__name__)
+
+def _live_workers(db: Session):
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.PRESENCE_WORKER_TTL)
+    return db.query(PresenceWorker.worker_id).filter(PresenceWorker.heartbeat_at >= cutoff)
+
+
+def online_states(db: Session, emails: Iterable[str]) -> Dict[str, bool]:
+    """Online flag for each email across all live workers, in one grouped query."""
+    emails = list(set(emails))
+    if not emails:
+        return {}
+    rows = db.query(UserPresence.user_email, func.sum(UserPresence.connections)).filter(
+        UserPresence.user_email.in_(emails),
+        UserPresence.worker_id.in_(_live_workers(db)),
+    ).group_by(UserPresence.user_email).all()
+    online = {email for email, connections in rows if connections}
+    return {email: email in online for email in emails}
+
+
+class PresenceService:
+    """
+    Publishes this worker's connection counts to the database and pushes
+    coalesced online/offline diffs to connected users, but only to those
+    who have a conversation with the user whose state changed.
+    """
+
+    def __init__(self, manager: ConnectionManager):
+        self.manager = manager
+        # Last state pushed to clients; offline users are simply absent
+        self._known_online: Set[str] = set()
+        self._last_poll = datetime.utcnow()
+        self._last_heartbeat = datetime.min
+
+    def _sync(self, db: Session, counts: Dict[str, int], local_users: Set[str]) -> Dict[str, List[tuple]]:
+        now = datetime.utcnow()
+
+        for email, connections in counts.items():
+            stmt = dialect_insert(db, UserPresence).values(
+                user_email=email, worker_id=worker_id(), connections=connections, updated_at=now
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["user_email", "worker_id"],
+                set_={"connections": stmt.excluded.connections, "updated_at": stmt.excluded.updated_at},
+            ))
+
+        if now - self._last_heartbeat >= timedelta(seconds=settings.PRESENCE_WORKER_TTL / 3):
+            stmt = dialect_insert(db, PresenceWorker).values(worker_id=worker_id(), heartbeat_at=now)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["worker_id"], set_={"heartbeat_at": stmt.excluded.heartbeat_at}
+            ))
+            self._last_heartbeat = now
+            changed = self._reap_dead_workers(db)
+        else:
+            changed = set()
+        db.commit()
+
+        # Overlap the window a little to tolerate clock skew between workers
+        since = self._last_poll - timedelta(seconds=settings.PRESENCE_FLUSH_INTERVAL)
+        self._last_poll = now
+        changed.update(email for (email,) in db.query(UserPresence.user_email).filter(
+            UserPresence.updated_at > since
+        ).distinct())
+        if not changed:
+            return {}
+
+        diffs = {}
+        for email, online in online_states(db, changed).items():
+            if online != (email in self._known_online):
+                diffs[email] = online
+                if online:
+                    self._known_online.add(email)
+                else:
+                    self._known_online.discard(email)
+        if not diffs or not local_users:
+            return {}
+
+        # Who, among users connected to this worker, talks to the changed users?
+        batches = defaultdict(list)
+        rows = db.query(Conversation.owner_email, Conversation.partner_email).filter(
+            Conversation.partner_email.in_(list(diffs)),
+            Conversation.owner_email.in_(list(local_users)),
+        ).all()
+        for owner_email, partner_email in rows:
+            batches[owner_email].append((partner_email, diffs[partner_email]))
+        return batches
+
+    def _reap_dead_workers(self, db: Session) -> Set[str]:
+        dead = db.query(PresenceWorker.worker_id).filter(~PresenceWorker.worker_id.in_(_live_workers(db)))
+        emails = {email for (email,) in db.query(UserPresence.user_email).filter(
+            UserPresence.worker_id.in_(dead)
+        ).distinct()}
+        db.query(UserPresence).filter(UserPresence.worker_id.in_(dead)).delete(synchronize_session=False)
+        db.query(PresenceWorker).filter(
+            ~PresenceWorker.worker_id.in_(_live_workers(db))
+        ).delete(synchronize_session=False)
+        return emails
+
+    def _sync_in_session(self, counts, local_users):
+        db = SessionLocal()
+        try:
+            return self._sync(db, counts, local_users)
+        finally:
+            db.close()
+
+    async def tick(self):
+        changed, self.manager.changed = self.manager.changed, set()
+        counts = {email: len(self.manager.active_connections.get(email, [])) for email in changed}
+        local_users = set(self.manager.active_connections)
+
+        try:
+            batches = await run_in_threadpool(self._sync_in_session, counts, local_users)
+        except Exception:
+            self.manager.changed |= changed
+            raise
+        for recipient, changes in batches.items():
+            await self.manager.send_json(
+                {"type": "presence", "changes": dict(changes)}, recipient
+            )
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(settings.PRESENCE_FLUSH_INTERVAL)
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Presence sync failed")
+
+    def shutdown(self, db: Session):
+        db.query(UserPresence).filter(UserPresence.worker_id == worker_id()).delete(synchronize_session=False)
+        db.query(PresenceWorker).filter(PresenceWorker.worker_id == worker_id()).delete(synchronize_session=False)
+        db.commit()
@@ -0,0 +1,137 @@
+from array import array
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.car_model import Car
+from app.models.pricing_rule_model import PricingRule
+from app.utils.cache import TTLCache
+
+RULE_KINDS = ("season", "weekend", "duration")
+
+
+class Quote(NamedTuple):
+    days: int
+    subtotal: float
+    discount_percentage: float
+    total_price: float
+    daily_rates: List[float]
+
+
+def _default_tiers() -> List[Tuple[int, float]]:
+    # "7:15" -> 15% off bookings of 7 days or more, used when no duration rules exist
+    tiers = []
+    for tier in settings.PRICING_DEFAULT_DURATION_TIERS.split(","):
+        if tier.strip():
+            min_days, discount = tier.split(":")
+            tiers.append((int(min_days), float(discount)))
+    return tiers
+
+
+class CompiledPricing:
+    """
+    A car's rules resolved into day rates for PRICING_HORIZON_DAYS from
+    `origin`, so quoting a stay is a slice sum. Days outside the window
+    fall back to evaluating the rules.
+    """
+
+    def __init__(self, base_rate: float, rules: List[PricingRule], origin: date):
+        # Car rules replace owner rules of the same kind; later rules win ties
+        by_kind = defaultdict(list)
+        for rule in sorted(rules, key=lambda r: r.id):
+            by_kind[rule.kind].append(rule)
+        for kind, kind_rules in by_kind.items():
+            if any(r.car_id is not None for r in kind_rules):
+                by_kind[kind] = [r for r in kind_rules if r.car_id is not None]
+
+        self.base_rate = base_rate
+        self.origin = origin
+        self._seasons = [(r.start_date, r.end_date, r.multiplier) for r in reversed(by_kind["season"])]
+        self._weekend = by_kind["weekend"][-1].multiplier if by_kind["weekend"] else 1.0
+        tiers = [(r.min_days, r.discount_percentage) for r in by_kind["duration"]] or _default_tiers()
+        self._tiers = sorted(tiers, reverse=True)
+        self._rates = array("d", (
+            self._evaluate(origin + timedelta(days=offset)) for offset in range(settings.PRICING_HORIZON_DAYS)
+        ))
+
+    def _evaluate(self, day: date) -> float:
+        rate = self.base_rate
+        for start, end, multiplier in self._seasons:
+            if start <= day <= end:
+                rate *= multiplier
+                break
+        if day.weekday() >= 5:
+            rate *= self._weekend
+        return round(rate, 2)
+
+    def daily_rates(self, start: date, days: int) -> List[float]:
+        offset = (start - self.origin).days
+        if offset >= 0 and offset + days <= len(self._rates):
+            return self._rates[offset:offset + days].tolist()
+        return [self._evaluate(start + timedelta(days=i)) for i in range(days)]
+
+    def discount(self, days: int) -> float:
+        for min_days, percentage in self._tiers:
+            if days >= min_days:
+                return percentage
+        return 0.0
+
+    def quote(self, start: date, days: int) -> Quote:
+        rates = self.daily_rates(start, days)
+        subtotal = round(sum(rates), 2)
+        discount = self.discount(days)
+        return Quote(days, subtotal, discount, round(subtotal * (1 - discount / 100), 2), rates)
+
+
+# car_id -> CompiledPricing
+_pricing_cache = TTLCache(maxsize=10000, ttl=settings.PRICING_CACHE_TTL)
+
+
+def invalidate_pricing(car_ids: Optional[List[int]] = None):
+    if car_ids is None:
+        _pricing_cache.clear()
+        return
+    for car_id in car_ids:
+        _pricing_cache.invalidate(car_id)
+
+
+def pricing_for(db: Session, cars: List[Car]) -> Dict[int, CompiledPricing]:
+    """Compiled pricing per car; cache misses load their rules in one query."""
+    today = date.today()
+    result, missing = {}, []
+    for car in cars:
+        cached = _pricing_cache.get(car.id)
+        if cached is not None and cached.origin == today and cached.base_rate == car.price_per_day:
+            result[car.id] = cached
+        else:
+            missing.append(car)
+    if not missing:
+        return result
+
+    rules = db.query(PricingRule).filter(or_(
+        PricingRule.car_id.in_([car.id for car in missing]),
+        and_(PricingRule.car_id.is_(None), PricingRule.owner_email.in_({car.owner_email for car in missing})),
+    )).all()
+    for car in missing:
+        applicable = [
+            rule for rule in rules
+            if rule.car_id == car.id or (rule.car_id is None and rule.owner_email == car.owner_email)
+        ]
+        compiled = CompiledPricing(car.price_per_day, applicable, today)
+        # Replica rows may lag an invalidation; only cache primary reads
+        if not db.info.get("replica"):
+            _pricing_cache.set(car.id, compiled)
+        result[car.id] = compiled
+    return result
+
+
+def get_pricing(db: Session, car: Car) -> CompiledPricing:
+    return pricing_for(db, [car])[car.id]
+
+
+def booking_days(start, end) -> int:
+    return (end - start).days or 1
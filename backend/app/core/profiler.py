@@ -0,0 +1,219 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalize a SQL statement so that queries differing only in
+    literal values or IN-list length compare equal.
+    """
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    shape = _IN_LIST_RE.sub("IN (?)", shape)
+    return _LITERAL_RE.sub("?", shape)
+
+
+class QueryStats:
+    def __init__(self, route: Optional[str] = None):
+        self.route = route
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes: Counter = Counter()
+        self.checkouts = 0
+        self.checkout_wait = 0.0
+        self.hold_time = 0.0
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total_time += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    @property
+    def total_time_ms(self) -> float:
+        return self.total_time * 1000
+
+    @property
+    def checkout_wait_ms(self) -> float:
+        return self.checkout_wait * 1000
+
+    @property
+    def hold_time_ms(self) -> float:
+        return self.hold_time * 1000
+
+    @property
+    def n_plus_one_suspects(self) -> Dict[str, int]:
+        return {
+            shape: count
+            for shape, count in self.shapes.items()
+            if count >= settings.N_PLUS_ONE_THRESHOLD
+        }
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# Observers see statements from every thread, so they are shared, under a lock
+_observers: List[QueryStats] = []
+_observers_lock = threading.Lock()
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries(route: Optional[str] = None):
+    """
+    Collect statement counts and DB time for everything executed
+    inside the block (including sync endpoints run in the threadpool).
+    """
+    stats = QueryStats(route)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int, allow_n_plus_one: bool = False):
+    """
+    Test helper: fail if the block runs more than `limit` statements
+    or repeats one statement shape often enough to look like an N+1.
+    Statements from any thread are counted, so it works around a TestClient.
+
+        with assert_max_queries(2):
+            client.get("/favorites/", params={"userEmail": "a@b.c"})
+    """
+    stats = QueryStats()
+    with _observers_lock:
+        _observers.append(stats)
+    try:
+        yield stats
+    finally:
+        with _observers_lock:
+            _observers.remove(stats)
+
+    if stats.count > limit:
+        raise AssertionError(
+            f"Expected at most {limit} queries, got {stats.count}:\n"
+            + "\n".join(f"  {count}x {shape}" for shape, count in stats.shapes.items())
+        )
+    suspects = stats.n_plus_one_suspects
+    if suspects and not allow_n_plus_one:
+        raise AssertionError(
+            "Possible N+1 queries:\n"
+            + "\n".join(f"  {count}x {shape}" for shape, count in suspects.items())
+        )
+
+
+def install_profiler(engine):
+    """Attach timing listeners to an engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start_time"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, duration)
+        if _observers:
+            with _observers_lock:
+                for observer in _observers:
+                    observer.record(statement, duration)
+
+        if duration * 1000 >= settings.SLOW_QUERY_MS:
+            logger.warning(
+                "Slow query (%.1f ms) on %s: %s",
+                duration * 1000,
+                stats.route if stats and stats.route else "-",
+                _WHITESPACE_RE.sub(" ", statement).strip(),
+            )
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        stats = _current_stats.get()
+        if checked_out_at is not None and stats is not None:
+            stats.hold_time += time.perf_counter() - checked_out_at
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start_time"):
+            conn.info["query_start_time"].pop()
+
+
+def install_session_profiler(session_factory):
+    """
+    Time from a session starting its transaction to having a pooled
+    connection, i.e. how long work waited on pool capacity.
+    """
+
+    @event.listens_for(session_factory, "after_transaction_create")
+    def _after_transaction_create(session, transaction):
+        if transaction.parent is None:
+            session.info["transaction_started_at"] = time.perf_counter()
+
+    @event.listens_for(session_factory, "after_begin")
+    def _after_begin(session, transaction, connection):
+        started_at = session.info.pop("transaction_started_at", None)
+        stats = _current_stats.get()
+        if started_at is not None and stats is not None:
+            stats.checkouts += 1
+            stats.checkout_wait += time.perf_counter() - started_at
+
+
+class QueryProfilerMiddleware:
+    """
+    Tracks DB statements per HTTP request, logs N+1 suspects and,
+    in debug mode, reports the numbers in X-DB-* response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = f"{scope['method']} {scope['path']}"
+        with track_queries(route) as stats:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start" and settings.DEBUG:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-query-count", str(stats.count).encode()))
+                    headers.append((b"x-db-time-ms", f"{stats.total_time_ms:.2f}".encode()))
+                    headers.append((b"x-db-n-plus-one", str(len(stats.n_plus_one_suspects)).encode()))
+                    headers.append((b"x-db-checkouts", str(stats.checkouts).encode()))
+                    headers.append((b"x-db-checkout-wait-ms", f"{stats.checkout_wait_ms:.2f}".encode()))
+                    headers.append((b"x-db-hold-ms", f"{stats.hold_time_ms:.2f}".encode()))
+                    message["headers"] = headers
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        for shape, count in stats.n_plus_one_suspects.items():
+            logger.warning("Possible N+1 on %s: %dx %s", route, count, shape)
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.worker import worker_id
+from app.models.scheduler_lease_model import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+
+def acquire_lease(db: Session, name: str, seconds: float) -> bool:
+    """Take or renew the named lease; True if this worker holds it afterwards."""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=seconds)
+    renewed = db.query(SchedulerLease).filter(
+        SchedulerLease.name == name,
+        or_(SchedulerLease.holder == worker_id(), SchedulerLease.expires_at < now),
+    ).update({SchedulerLease.holder: worker_id(), SchedulerLease.expires_at: expires_at}, synchronize_session=False)
+    if not renewed:
+        try:
+            db.add(SchedulerLease(name=name, holder=worker_id(), expires_at=expires_at))
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            return False
+    db.commit()
+    return True
+
+
+class Job:
+    def __init__(self, name: str, interval: float, func: Callable[[Session], dict]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.next_run = 0.0
+
+
+class Scheduler:
+    """
+    In-process periodic jobs. Every worker runs the loop, but only the
+    holder of the scheduler's lease executes jobs, so each job runs once
+    per interval across the deployment. The lease is renewed in the
+    background while jobs run, however long they take.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.jobs: List[Job] = []
+
+    def add_job(self, name: str, interval: float, func: Callable[[Session], dict]):
+        self.jobs.append(Job(name, interval, func))
+
+    def _keep_lease(self, stop: threading.Event):
+        """Renews the lease while jobs run, so a slow job cannot outlive it."""
+        db = SessionLocal()
+        try:
+            while not stop.wait(settings.SCHEDULER_LEASE_SECONDS / 3):
+                try:
+                    held = acquire_lease(db, self.name, settings.SCHEDULER_LEASE_SECONDS)
+                except Exception:
+                    db.rollback()
+                    logger.exception("Scheduler %s could not renew its lease", self.name)
+                    continue
+                if not held:
+                    metrics.increment(f"scheduler.{self.name}.lease_lost")
+                    logger.warning("Scheduler %s lost its lease during a run", self.name)
+                    return
+        finally:
+            db.close()
+
+    def run_pending(self):
+        db = SessionLocal()
+        stop = threading.Event()
+        keeper = threading.Thread(target=self._keep_lease, args=(stop,), daemon=True)
+        try:
+            if not acquire_lease(db, self.name, settings.SCHEDULER_LEASE_SECONDS):
+                return
+            keeper.start()
+            for job in self.jobs:
+                if job.next_run > time.monotonic():
+                    continue
+                # A lost lease means another worker may already be running jobs
+                if not acquire_lease(db, self.name, settings.SCHEDULER_LEASE_SECONDS):
+                    return
+                job.next_run = time.monotonic() + job.interval
+                started = time.perf_counter()
+                try:
+                    counts = job.func(db) or {}
+                except Exception:
+                    db.rollback()
+                    metrics.increment(f"scheduler.{job.name}.failures")
+                    logger.exception("Scheduled job %s failed", job.name)
+                    continue
+                metrics.increment(f"scheduler.{job.name}.runs")
+                metrics.gauge(f"scheduler.{job.name}.duration_ms", (time.perf_counter() - started) * 1000)
+                for key, value in counts.items():
+                    metrics.increment(f"scheduler.{job.name}.{key}", value)
+                logger.info("Scheduled job %s finished: %s", job.name, counts)
+        finally:
+            stop.set()
+            if keeper.is_alive():
+                keeper.join()
+            db.close()
+
+    async def run(self):
+        # Renew the lease well before it expires
+        tick = min([settings.SCHEDULER_LEASE_SECONDS / 3] + [job.interval for job in self.jobs])
+        while True:
+            try:
+                await run_in_threadpool(self.run_pending)
+            except Exception:
+                logger.exception("Scheduler %s tick failed", self.name)
+            await asyncio.sleep(tick)
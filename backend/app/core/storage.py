@@ -0,0 +1,211 @@
+import hashlib
+import hmac
+import mimetypes
+import os
+import posixpath
+import shutil
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from typing import BinaryIO, NamedTuple, Optional
+from urllib.parse import quote, urlparse
+
+from app.core.config import settings
+
+
+class ObjectInfo(NamedTuple):
+    size: int
+    content_type: Optional[str]
+
+
+def normalize_key(key: str) -> Optional[str]:
+    """The key in canonical form, or None if it would escape the storage root."""
+    normalized = posixpath.normpath(key.lstrip("/"))
+    if normalized.startswith("..") or normalized in (".", ""):
+        return None
+    return normalized
+
+
+class LocalStorage:
+    """
+    Files under a local directory, served by the StaticFiles mounts.
+    Presigned uploads go to the API's own signed PUT endpoint, which
+    stands in for an object store on single-node deployments.
+    """
+
+    def __init__(self, root: str, public_url: str):
+        self.root = root
+        self.public_url = public_url.rstrip("/")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def _signature(self, key: str, expires: int, content_type: str) -> str:
+        message = f"{key}\n{expires}\n{content_type}".encode()
+        return hmac.new((settings.SECRET_KEY or "").encode(), message, hashlib.sha256).hexdigest()
+
+    def presign_upload(self, key: str, content_type: str, expires_in: int) -> str:
+        expires = int(time.time()) + expires_in
+        signature = self._signature(key, expires, content_type)
+        return f"{self.public_url}/storage/{quote(key)}?expires={expires}&signature={signature}"
+
+    def verify_upload(self, key: str, expires: int, signature: str, content_type: str) -> bool:
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(key, expires, content_type), signature)
+
+    def open_for_write(self, key: str) -> str:
+        """Temporary path to write to; commit_write moves it into place."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.part"
+
+    def commit_write(self, key: str):
+        path = self._path(key)
+        os.replace(f"{path}.part", path)
+
+    def move(self, key: str, new_key: str):
+        new_path = self._path(new_key)
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        os.replace(self._path(key), new_path)
+
+    def save(self, key: str, fileobj: BinaryIO, content_type: Optional[str] = None):
+        temp_path = self.open_for_write(key)
+        with open(temp_path, "wb") as buffer:
+            shutil.copyfileobj(fileobj, buffer)
+        self.commit_write(key)
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        path = self._path(key)
+        if not os.path.isfile(path):
+            return None
+        return ObjectInfo(os.path.getsize(path), mimetypes.guess_type(path)[0])
+
+    def delete(self, key: str):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def url_for(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+
+class S3Storage:
+    """
+    S3-compatible bucket (AWS, MinIO, ...) addressed path-style. Every
+    request is authorized with a SigV4 query-string signature, so no SDK
+    is needed and clients can upload with the same presigned URLs.
+    """
+
+    def __init__(self, endpoint_url: str, bucket: str, region: str,
+                 access_key: str, secret_key: str, public_url: Optional[str] = None):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.public_url = (public_url or f"{self.endpoint_url}/{bucket}").rstrip("/")
+
+    def _signing_key(self, date: str) -> bytes:
+        key = f"AWS4{self.secret_key}".encode()
+        for part in (date, self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        return key
+
+    def _presign(self, method: str, key: str, expires_in: int, content_type: Optional[str] = None,
+                 extra_headers: Optional[dict] = None) -> str:
+        now = datetime.utcnow()
+        amz_date, date = now.strftime("%Y%m%dT%H%M%SZ"), now.strftime("%Y%m%d")
+        host = urlparse(self.endpoint_url).netloc
+        path = quote(f"/{self.bucket}/{key}", safe="/-_.~")
+
+        headers = {"host": host, **{name.lower(): value for name, value in (extra_headers or {}).items()}}
+        if content_type:
+            headers["content-type"] = content_type
+        signed_headers = ";".join(sorted(headers))
+        params = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{date}/{self.region}/s3/aws4_request",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires_in),
+            "X-Amz-SignedHeaders": signed_headers,
+        }
+        query = "&".join(
+            f"{quote(name, safe='-_.~')}={quote(value, safe='-_.~')}" for name, value in sorted(params.items())
+        )
+        canonical_request = "\n".join([
+            method, path, query,
+            "".join(f"{name}:{headers[name]}\n" for name in sorted(headers)),
+            signed_headers, "UNSIGNED-PAYLOAD",
+        ])
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, f"{date}/{self.region}/s3/aws4_request",
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ])
+        signature = hmac.new(self._signing_key(date), string_to_sign.encode(), hashlib.sha256).hexdigest()
+        return f"{self.endpoint_url}{path}?{query}&X-Amz-Signature={signature}"
+
+    def presign_upload(self, key: str, content_type: str, expires_in: int) -> str:
+        return self._presign("PUT", key, expires_in, content_type)
+
+    def _request(self, method: str, key: str, data=None, content_type: Optional[str] = None,
+                 extra_headers: Optional[dict] = None):
+        request = urllib.request.Request(
+            self._presign(method, key, 60, content_type, extra_headers), data=data, method=method
+        )
+        if content_type:
+            request.add_header("Content-Type", content_type)
+        for name, value in (extra_headers or {}).items():
+            request.add_header(name, value)
+        return urllib.request.urlopen(request, timeout=30)
+
+    def save(self, key: str, fileobj: BinaryIO, content_type: Optional[str] = None):
+        content_type = content_type or mimetypes.guess_type(key)[0] or "application/octet-stream"
+        self._request("PUT", key, data=fileobj.read(), content_type=content_type).close()
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            with self._request("HEAD", key) as response:
+                return ObjectInfo(int(response.headers.get("Content-Length", 0)), response.headers.get("Content-Type"))
+        except urllib.error.HTTPError as error:
+            if error.code in (403, 404):
+                return None
+            raise
+
+    def delete(self, key: str):
+        self._request("DELETE", key).close()
+
+    def move(self, key: str, new_key: str):
+        # Server-side copy keeps the stored Content-Type
+        source = quote(f"/{self.bucket}/{key}", safe="/-_.~")
+        self._request("PUT", new_key, data=b"", extra_headers={"x-amz-copy-source": source}).close()
+        self.delete(key)
+
+    def url_for(self, key: str) -> str:
+        return f"{self.public_url}/{quote(key)}"
+
+
+def key_for_url(url: Optional[str]) -> Optional[str]:
+    """Storage key behind a stored image URL, if the object is ours."""
+    if not url:
+        return None
+    prefix = storage.public_url + "/"
+    if url.startswith(prefix):
+        return url[len(prefix):]
+    if not urlparse(url).scheme:
+        # Older profile images were stored as paths relative to the API
+        return normalize_key(url)
+    return None
+
+
+def _create_storage():
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            settings.S3_ENDPOINT_URL, settings.S3_BUCKET, settings.S3_REGION,
+            settings.S3_ACCESS_KEY, settings.S3_SECRET_KEY, settings.S3_PUBLIC_URL,
+        )
+    return LocalStorage(settings.STORAGE_LOCAL_ROOT, settings.STORAGE_PUBLIC_URL)
+
+
+storage = _create_storage()
@@ -0,0 +1,206 @@
+import bisect
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, func, or_, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import prefix_match
+from app.models.user_model import User
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Ranking buckets: exact username/email, username prefix, email prefix, fuzzy.
+RANK_EXACT, RANK_USERNAME_PREFIX, RANK_EMAIL_PREFIX, RANK_FUZZY = range(4)
+
+SearchHit = Tuple[str, str]  # (username, email)
+
+
+def normalize_query(query: str) -> str:
+    return query.strip().lower()
+
+
+def rank_hit(query: str, username: str, email: str) -> int:
+    username, email = (username or "").lower(), (email or "").lower()
+    if query in (username, email):
+        return RANK_EXACT
+    if username.startswith(query):
+        return RANK_USERNAME_PREFIX
+    if email.startswith(query):
+        return RANK_EMAIL_PREFIX
+    return RANK_FUZZY
+
+
+def _sort_hits(query: str, hits: List[SearchHit]) -> List[SearchHit]:
+    return sorted(hits, key=lambda hit: (rank_hit(query, *hit), (hit[0] or "").lower()))
+
+
+class PrefixIndex:
+    """
+    In-memory sorted-prefix index over lowercased usernames and emails.
+    Only suitable for single-node deployments: other workers will not
+    see users registered through this process until they reload.
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._entries: List[Tuple[str, str, str]] = []
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self, db: Session):
+        rows = db.query(User.username, User.email).all()
+        entries = []
+        for username, email in rows:
+            entries.extend(self._entries_for(username, email))
+        entries.sort()
+        with self._lock:
+            self._entries = entries
+            self._keys = [entry[0] for entry in entries]
+            self.loaded = True
+        logger.info("User search index loaded with %d users", len(rows))
+
+    @staticmethod
+    def _entries_for(username: Optional[str], email: Optional[str]):
+        for key in {(username or "").lower(), (email or "").lower()}:
+            if key:
+                yield (key, username or "", email)
+
+    def add(self, username: str, email: str):
+        with self._lock:
+            for entry in self._entries_for(username, email):
+                position = bisect.bisect_left(self._entries, entry)
+                if position < len(self._entries) and self._entries[position] == entry:
+                    continue
+                self._entries.insert(position, entry)
+                self._keys.insert(position, entry[0])
+
+    def remove(self, username: str, email: str):
+        with self._lock:
+            for entry in self._entries_for(username, email):
+                position = bisect.bisect_left(self._entries, entry)
+                if position < len(self._entries) and self._entries[position] == entry:
+                    del self._entries[position]
+                    del self._keys[position]
+
+    def search(self, query: str, limit: int) -> List[SearchHit]:
+        with self._lock:
+            start = bisect.bisect_left(self._keys, query)
+            end = bisect.bisect_left(self._keys, query + "\uffff")
+            hits = {}
+            # Matches are contiguous in key order; cap the scan for very short prefixes.
+            for key, username, email in self._entries[start:min(end, start + limit * 20)]:
+                hits[email] = (username, email)
+        return _sort_hits(query, list(hits.values()))[:limit]
+
+
+prefix_index = PrefixIndex()
+
+# Keyed by normalized query; a value is (hits, complete). A complete result
+# holds every match, so longer queries typed after it can be answered from it.
+_result_cache = TTLCache(maxsize=4096, ttl=settings.USER_SEARCH_CACHE_TTL)
+
+
+def _prefix_filter(column, prefix: str, dialect: str):
+    return prefix_match(func.lower(column), prefix, dialect)
+
+
+def prefix_query(db: Session, query: str, limit: int):
+    """Ranked username/email prefix matches, served by the lower() expression indexes."""
+    dialect = db.get_bind().dialect.name
+    rank = case(
+        (or_(func.lower(User.username) == query, func.lower(User.email) == query), RANK_EXACT),
+        (_prefix_filter(User.username, query, dialect), RANK_USERNAME_PREFIX),
+        else_=RANK_EMAIL_PREFIX,
+    )
+    return db.query(User.username, User.email).filter(
+        _prefix_filter(User.username, query, dialect) | _prefix_filter(User.email, query, dialect)
+    ).order_by(rank, User.username).limit(limit)
+
+
+def _search_db(db: Session, query: str, limit: int) -> List[SearchHit]:
+    rows = prefix_query(db, query, limit).all()
+    hits = [(username, email) for username, email in rows]
+
+    if settings.USER_SEARCH_FUZZY and len(hits) < limit:
+        # Substring fallback; backed by pg_trgm GIN indexes on PostgreSQL.
+        seen = {email for _, email in hits}
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"%{escaped}%"
+        extra = db.query(User.username, User.email).filter(
+            User.username.ilike(pattern, escape="\\") | User.email.ilike(pattern, escape="\\")
+        ).limit(limit + len(hits)).all()
+        hits.extend((u, e) for u, e in extra if e not in seen)
+        hits = _sort_hits(query, hits)[:limit]
+    return hits
+
+
+def _from_cached_prefix(query: str, limit: int) -> Optional[List[SearchHit]]:
+    for length in range(len(query) - 1, 0, -1):
+        cached = _result_cache.get(query[:length])
+        if cached is None:
+            continue
+        hits, complete = cached
+        if not complete:
+            return None
+        if settings.USER_SEARCH_FUZZY:
+            matches = [h for h in hits if query in (h[0] or "").lower() or query in (h[1] or "").lower()]
+        else:
+            matches = [h for h in hits if rank_hit(query, *h) != RANK_FUZZY]
+        return _sort_hits(query, matches)[:limit]
+    return None
+
+
+def search_users(db: Session, query: str, limit: int = 10) -> List[SearchHit]:
+    """
+    Autocomplete search ranking exact matches, then username prefixes,
+    then email prefixes (then substring matches if fuzzy search is on).
+    """
+    query = normalize_query(query)
+    if not query:
+        return []
+
+    cached = _result_cache.get(query)
+    if cached is not None:
+        return cached[0][:limit]
+
+    hits = _from_cached_prefix(query, limit)
+    if hits is None:
+        if settings.USER_SEARCH_BACKEND == "memory" and prefix_index.loaded:
+            hits = prefix_index.search(query, limit)
+        else:
+            hits = _search_db(db, query, limit)
+
+    _result_cache.set(query, (hits, len(hits) < limit))
+    return hits
+
+
+def user_changed(old_username: Optional[str], old_email: Optional[str],
+                 username: Optional[str], email: Optional[str]):
+    """Keep the in-memory index and result cache in sync with user writes."""
+    if prefix_index.loaded:
+        if old_email:
+            prefix_index.remove(old_username, old_email)
+        if email:
+            prefix_index.add(username, email)
+    _result_cache.clear()
+
+
+def setup_user_search(engine, db: Session):
+    if settings.USER_SEARCH_BACKEND == "memory":
+        prefix_index.load(db)
+
+    if settings.USER_SEARCH_FUZZY and engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_users_username_trgm "
+                "ON users USING gin (username gin_trgm_ops)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_users_email_trgm "
+                "ON users USING gin (email gin_trgm_ops)"
+            ))
@@ -1,31 +1,113 @@
 from fastapi import WebSocket
-from typing import Dict, List
+from typing import Dict, List, Set
+import asyncio
 import json
+import logging
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Close codes: 1001 going away, 1013 try again later
+CLOSE_GOING_AWAY = 1001
+CLOSE_TRY_AGAIN_LATER = 1013
 
 class ConnectionManager:
     def __init__(self):
        
         self.active_connections: Dict[str, List[WebSocket]] = {}
+        self.last_seen: Dict[WebSocket, float] = {}
+        # Users whose connection count changed since the presence service last looked
+        self.changed: Set[str] = set()
 
-    async def connect(self, websocket: WebSocket, user_email: str):
+    @property
+    def connection_count(self) -> int:
+        return len(self.last_seen)
+
+    async def connect(self, websocket: WebSocket, user_email: str) -> bool:
+        """
+        Accept a socket, evicting the user's oldest one past the per-user cap.
+        Returns False (socket closed) when the process-wide cap is reached.
+        """
         await websocket.accept()
+        if self.connection_count >= settings.WS_MAX_CONNECTIONS:
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+            return False
+
         if user_email not in self.active_connections:
             self.active_connections[user_email] = []
-        self.active_connections[user_email].append(websocket)
+        connections = self.active_connections[user_email]
+        while len(connections) >= settings.WS_MAX_CONNECTIONS_PER_USER:
+            await self._close(connections[0], user_email, CLOSE_GOING_AWAY)
+
+        connections.append(websocket)
+        self.last_seen[websocket] = time.monotonic()
+        self.changed.add(user_email)
+        return True
 
     def disconnect(self, websocket: WebSocket, user_email: str):
+        if self.last_seen.pop(websocket, None) is not None:
+            self.changed.add(user_email)
         if user_email in self.active_connections:
             if websocket in self.active_connections[user_email]:
                 self.active_connections[user_email].remove(websocket)
             if not self.active_connections[user_email]:
                 del self.active_connections[user_email]
 
+    def touch(self, websocket: WebSocket):
+        """Record inbound activity (any frame, including pongs)."""
+        if websocket in self.last_seen:
+            self.last_seen[websocket] = time.monotonic()
+
+    async def _close(self, websocket: WebSocket, user_email: str, code: int):
+        self.disconnect(websocket, user_email)
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def _send(self, websocket: WebSocket, user_email: str, payload: str) -> bool:
+        try:
+            await websocket.send_text(payload)
+            return True
+        except Exception:
+            # Half-open socket: drop it instead of retrying on every fan-out
+            self.disconnect(websocket, user_email)
+            return False
+
     async def send_personal_message(self, message: dict, recipient_email: str):
         if recipient_email in self.active_connections:
-            for connection in self.active_connections[recipient_email]:
-                await connection.send_text(json.dumps({
-                    "message": message
-                }))
+            payload = json.dumps({
+                "message": message
+            })
+            for connection in list(self.active_connections[recipient_email]):
+                await self._send(connection, recipient_email, payload)
+
+    async def heartbeat(self):
+        """
+        Ping every socket each WS_HEARTBEAT_INTERVAL and reap the ones that
+        sent nothing (not even a pong) for WS_IDLE_TIMEOUT.
+        """
+        ping = json.dumps({"type": "ping"})
+        while True:
+            await asyncio.sleep(settings.WS_HEARTBEAT_INTERVAL)
+            deadline = time.monotonic() - settings.WS_IDLE_TIMEOUT
+            reaped = 0
+            for user_email, connections in list(self.active_connections.items()):
+                for connection in list(connections):
+                    if self.last_seen.get(connection, 0) < deadline:
+                        await self._close(connection, user_email, CLOSE_GOING_AWAY)
+                        reaped += 1
+                    elif not await self._send(connection, user_email, ping):
+                        reaped += 1
+            if reaped:
+                logger.info("Reaped %d idle WebSocket connections, %d remain", reaped, self.connection_count)
+
+    async def send_json(self, payload: dict, recipient_email: str):
+        text = json.dumps(payload)
+        for connection in list(self.active_connections.get(recipient_email, [])):
+            await self._send(connection, recipient_email, text)
 
     def get_connected_users(self):
-        return list(self.active_connections.keys())
\ No newline at end of file
+        return list(self.active_connections.keys())
@@ -0,0 +1,12 @@
+import os
+import socket
+import uuid
+
+# A restarted container reuses its hostname and often its pid; without
+# this, rows a crashed process left behind would look like the new one's
+_BOOT = uuid.uuid4().hex[:8]
+
+
+def worker_id() -> str:
+    """Identifies this API process among the workers sharing the database."""
+    return f"{socket.gethostname()}:{os.getpid()}:{_BOOT}"
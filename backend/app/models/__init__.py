@@ -1,3 +1,14 @@
 from app.models.user_model import User
 from app.models.message_model import Message
 from app.models.car_model import Car
+from app.models.favorite_model import Favorite
+from app.models.conversation_model import Conversation
+from app.models.delivery_cursor_model import DeliveryCursor
+from app.models.presence_model import PresenceWorker, UserPresence
+from app.models.booking_model import Booking
+from app.models.car_stats_model import CarStats
+from app.models.scheduler_lease_model import SchedulerLease
+from app.models.message_archive_model import MessageArchiveSegment
+from app.models.pricing_rule_model import PricingRule
+from app.models.idempotency_model import IdempotencyKey
+from app.models.outbox_model import OutboxEvent, OutboxCursor
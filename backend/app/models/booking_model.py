@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
-from core.database import Base
+from app.core.base import Base
 
 class Booking(Base):
     __tablename__ = "bookings"
@@ -27,4 +27,12 @@ class Booking(Base):
 
     
     car = relationship("Car", back_populates="bookings")
-    user = relationship("User", back_populates="bookings")
\ No newline at end of file
+    user = relationship("User", back_populates="bookings")
+
+    __table_args__ = (
+        # Overlap checks and calendars look up a car's active bookings by date
+        Index("ix_bookings_car_status_start_date", "car_id", "status", "start_date"),
+        # Lifecycle scheduler scans
+        Index("ix_bookings_status_start_date", "status", "start_date"),
+        Index("ix_bookings_status_end_date", "status", "end_date"),
+    )
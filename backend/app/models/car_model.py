@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.core.base import Base
 from sqlalchemy.orm import relationship
@@ -14,6 +14,17 @@ class Car(Base):
     car_type = Column(String, nullable=False)
     description = Column(String, nullable=True)
     image_url = Column(String, nullable=True)
+    # Derived from `location` via the local gazetteer
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geohash = Column(String(12), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    favorited_by = relationship("Favorite", back_populates="favorited_car", cascade="all, delete-orphan")
\ No newline at end of file
+    favorited_by = relationship("Favorite", back_populates="favorited_car", cascade="all, delete-orphan")
+    bookings = relationship("Booking", back_populates="car", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_cars_geohash", "geohash", postgresql_ops={"geohash": "text_pattern_ops"}),
+        # max_price searches
+        Index("ix_cars_price_per_day", "price_per_day"),
+    )
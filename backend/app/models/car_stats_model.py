@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey
+from app.core.base import Base
+
+
+class CarStats(Base):
+    """
+    Incrementally maintained popularity counters. `log_score` is the log
+    of a time-decayed sum stored relative to a fixed epoch (see
+    app.core.popularity), so increments need no read-modify-write; it is
+    null until a car gets its first weighted event.
+    """
+    __tablename__ = "car_stats"
+
+    car_id = Column(Integer, ForeignKey("cars.id", ondelete="CASCADE"), primary_key=True)
+    favorites_count = Column(Integer, nullable=False, default=0)
+    bookings_count = Column(Integer, nullable=False, default=0)
+    recent_bookings_count = Column(Integer, nullable=False, default=0)
+    log_score = Column(Float, nullable=True)
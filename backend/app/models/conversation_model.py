@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, UniqueConstraint
+from app.core.base import Base
+
+
+class Conversation(Base):
+    """
+    Denormalized inbox row: one per (owner, partner) pair, so each side
+    keeps its own unread counter and the inbox is a single index range scan.
+    """
+    __tablename__ = "conversations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_email = Column(String, ForeignKey("users.email"), nullable=False)
+    partner_email = Column(String, ForeignKey("users.email"), nullable=False)
+    last_message_id = Column(Integer, ForeignKey("messages.id", ondelete="SET NULL"), nullable=True)
+    last_message_text = Column(String, nullable=True)
+    last_message_at = Column(DateTime, nullable=False)
+    last_sender_email = Column(String, nullable=True)
+    unread_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("owner_email", "partner_email", name="uq_conversations_owner_partner"),
+        Index("ix_conversations_owner_activity", "owner_email", "last_message_at", "id"),
+    )
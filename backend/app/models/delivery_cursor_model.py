@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint, func
+from app.core.base import Base
+
+
+class DeliveryCursor(Base):
+    """Highest message id a user's device has acknowledged over /ws/chat."""
+    __tablename__ = "delivery_cursors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_email = Column(String, ForeignKey("users.email"), nullable=False)
+    device_id = Column(String, nullable=False)
+    last_acked_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_email", "device_id", name="uq_delivery_cursors_user_device"),
+    )
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.base import Base  
 
@@ -14,4 +14,9 @@ class Favorite(Base):
 
  
     favorited_car = relationship("Car", back_populates="favorited_by")
-    user = relationship("User", back_populates="favorites")
\ No newline at end of file
+    user = relationship("User", back_populates="favorites")
+
+    __table_args__ = (
+        # Also serves per-user favorite lookups
+        UniqueConstraint("user_id", "car_id", name="uq_favorites_user_car"),
+    )
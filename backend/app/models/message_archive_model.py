@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, Index
+from app.core.base import Base
+
+
+class MessageArchiveSegment(Base):
+    """
+    A compressed run of archived messages from one conversation and one
+    month. The non-payload columns are the index used to find the segment
+    covering a history page.
+    """
+    __tablename__ = "message_archive_segments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_key = Column(String, nullable=False)
+    period = Column(String, nullable=False)  # YYYY-MM of the messages
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    first_at = Column(DateTime, nullable=False)
+    last_at = Column(DateTime, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        Index("ix_message_archive_conversation_last_id", "conversation_key", "last_id"),
+        Index("ix_message_archive_period", "period"),
+    )
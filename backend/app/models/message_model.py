@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -14,3 +14,11 @@ class Message(Base):
     sender = relationship("User", foreign_keys=[sender_email])
     receiver = relationship("User", foreign_keys=[receiver_email])
 
+    __table_args__ = (
+        # Per-recipient delivery log for reconnect replay
+        Index("ix_messages_receiver_id", "receiver_email", "id"),
+        # Conversation history pages walk back by id
+        Index("ix_messages_pair_id", "sender_email", "receiver_email", "id"),
+        # Archival deletes old ids; never hand them out again
+        {"sqlite_autoincrement": True},
+    )
@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from app.core.base import Base
+
+
+class OutboxEvent(Base):
+    """
+    Change event written in the same transaction as the row it describes;
+    ids give the feed its order. entity_id is null for bulk changes.
+    """
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=True)
+    op = Column(String, nullable=False)
+    payload = Column(Text, nullable=False, default="{}")
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    # Ids are the feed position; never reuse them after a purge
+    __table_args__ = ({"sqlite_autoincrement": True},)
+
+
+class OutboxCursor(Base):
+    """Durable position of a feed consumer, e.g. the broker publisher."""
+    __tablename__ = "outbox_cursors"
+
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
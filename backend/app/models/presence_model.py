@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index, UniqueConstraint
+from app.core.base import Base
+
+
+class PresenceWorker(Base):
+    """API worker that currently owns WebSocket connections."""
+    __tablename__ = "presence_workers"
+
+    worker_id = Column(String, primary_key=True)
+    heartbeat_at = Column(DateTime, nullable=False)
+
+
+class UserPresence(Base):
+    """Open /ws/chat connections per user per worker."""
+    __tablename__ = "user_presence"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_email = Column(String, nullable=False)
+    worker_id = Column(String, nullable=False)
+    connections = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_email", "worker_id", name="uq_user_presence_user_worker"),
+        Index("ix_user_presence_updated_at", "updated_at"),
+    )
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.core.base import Base
+
+
+class PricingRule(Base):
+    """
+    Owner-defined price adjustment. Applies to all of the owner's cars, or
+    only to `car_id` when set; car rules replace owner rules of the same kind.
+
+    kind "season":   multiplier for days between start_date and end_date (inclusive)
+    kind "weekend":  multiplier for Saturdays and Sundays
+    kind "duration": discount_percentage off bookings of at least min_days
+    """
+    __tablename__ = "pricing_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_email = Column(String, ForeignKey("users.email"), nullable=False)
+    car_id = Column(Integer, ForeignKey("cars.id", ondelete="CASCADE"), nullable=True)
+    kind = Column(String, nullable=False)
+    start_date = Column(Date, nullable=True)
+    end_date = Column(Date, nullable=True)
+    multiplier = Column(Float, nullable=True)
+    min_days = Column(Integer, nullable=True)
+    discount_percentage = Column(Float, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_pricing_rules_owner_car", "owner_email", "car_id"),
+        Index("ix_pricing_rules_car", "car_id"),
+    )
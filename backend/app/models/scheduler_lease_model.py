@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, DateTime
+from app.core.base import Base
+
+
+class SchedulerLease(Base):
+    """Leader lease so only one worker runs a given scheduler at a time."""
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, Index, func
 from app.core.base import Base  
 from sqlalchemy.orm import relationship
 class User(Base):
@@ -12,4 +12,19 @@ class User(Base):
     profile_image = Column(String, nullable=True)
 
 
-    favorites = relationship("Favorite", back_populates="user", cascade="all, delete-orphan")
\ No newline at end of file
+    favorites = relationship("Favorite", back_populates="user", cascade="all, delete-orphan")
+    bookings = relationship("Booking", back_populates="user", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Prefix search for /chat/search-users
+        Index(
+            "ix_users_username_lower",
+            func.lower(username).label("username_lower"),
+            postgresql_ops={"username_lower": "text_pattern_ops"},
+        ),
+        Index(
+            "ix_users_email_lower",
+            func.lower(email).label("email_lower"),
+            postgresql_ops={"email_lower": "text_pattern_ops"},
+        ),
+    )
@@ -4,6 +4,7 @@ from app.core.database import get_db
 from app.models.user_model import User
 from app.schemas.user_schema import UserCreate, UserLogin, TokenResponse
 from app.utils.security import hash_password, verify_password, create_access_token
+from app.core.user_search import user_changed
 
 router = APIRouter()
 
@@ -18,6 +19,7 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    user_changed(None, None, new_user.username, new_user.email)
 
     token = create_access_token({"sub": new_user.email})
     return {"access_token": token, "token_type": "bearer", "username": new_user.username}
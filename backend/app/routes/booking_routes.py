@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
 
-from schemas.booking_schema import BookingCreate, BookingResponse, BookingUpdate
-from schemas.car_schema import CarResponse
-from core.database import get_db
-from  models.booking_model import Booking
-from models.car_model import Car
-from models.user_model import User
-from utils.security import get_current_user
+from app.schemas.booking_schema import BookingCreate, BookingResponse, BookingUpdate, CarCalendar
+from app.schemas.car_schema import CarResponse
+from app.core.database import get_db
+from app.core.db_routing import get_read_db
+from app.models.booking_model import Booking
+from app.models.car_model import Car
+from app.models.user_model import User
+from app.utils.security import get_current_user
+from app.core.popularity import record_booking
+from app.core.availability import booked_days, encode_availability, invalidate_calendar, overlapping_bookings
+from app.core.pricing import booking_days, get_pricing, pricing_for
+from app.core.config import settings
 
 router = APIRouter(prefix="/bookings", tags=["bookings"])
 
@@ -46,15 +50,14 @@ async def create_booking(
         )
     
    
-    existing_bookings = db.query(Booking).filter(
-        Booking.car_id == booking.car_id,
-        Booking.status.in_(["pending", "confirmed"]),
-        or_(
-            and_(Booking.start_date <= start_date, Booking.end_date > start_date),
-            and_(Booking.start_date < end_date, Booking.end_date >= end_date),
-            and_(Booking.start_date >= start_date, Booking.end_date <= end_date)
+    days = booking_days(start_date, end_date)
+    if days > settings.PRICING_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Bookings are limited to {settings.PRICING_MAX_DAYS} days"
         )
-    ).all()
+
+    existing_bookings = overlapping_bookings(db, booking.car_id, start_date, end_date).all()
     
     if existing_bookings:
         raise HTTPException(
@@ -63,18 +66,7 @@ async def create_booking(
         )
     
     
-    delta = end_date - start_date
-    days = delta.days or 1  
-    
-    base_price = car.price_per_day * days
-    
-
-    if days >= 7:
-        discount = 0.15
-        total_price = base_price * (1 - discount)
-    else:
-        discount = 0
-        total_price = base_price
+    quote = get_pricing(db, car).quote(start_date.date(), days)
     
     new_booking = Booking(
         car_id=booking.car_id,
@@ -83,15 +75,17 @@ async def create_booking(
         end_date=end_date,
         total_days=days,
         price_per_day=car.price_per_day,
-        discount_percentage=discount * 100,
-        total_price=total_price,
+        discount_percentage=quote.discount_percentage,
+        total_price=quote.total_price,
         payment_method=booking.payment_method,
         status="pending"
     )
     
     db.add(new_booking)
+    record_booking(db, booking.car_id)
     db.commit()
     db.refresh(new_booking)
+    invalidate_calendar(booking.car_id)
     
     return new_booking
 
@@ -110,6 +104,55 @@ async def get_user_bookings(
     bookings = query.order_by(Booking.created_at.desc()).all()
     return bookings
 
+@router.get("/calendar", response_model=List[CarCalendar])
+async def get_availability_calendar(
+    car_ids: str = Query(..., description="Comma-separated car ids"),
+    start: Optional[date] = None,
+    days: int = Query(90, ge=1),
+    prices: bool = False,
+    db: Session = Depends(get_read_db)
+):
+    """Per-day availability bitmap (and optionally daily price) for one or many cars"""
+    try:
+        ids = list(dict.fromkeys(int(i) for i in car_ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="car_ids must be comma-separated integers"
+        )
+    if not ids or len(ids) > settings.CALENDAR_MAX_CARS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {settings.CALENDAR_MAX_CARS} car ids per request"
+        )
+    if days > settings.CALENDAR_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.CALENDAR_MAX_DAYS} days per request"
+        )
+
+    cars = {car.id: car for car in db.query(Car).filter(Car.id.in_(ids)).all()}
+    missing = [car_id for car_id in ids if car_id not in cars]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Cars not found: {', '.join(str(i) for i in missing)}"
+        )
+
+    start = start or date.today()
+    booked = booked_days(db, ids, start, days)
+    pricing = pricing_for(db, list(cars.values())) if prices else {}
+    return [
+        CarCalendar(
+            car_id=car_id,
+            start=start,
+            days=days,
+            available=encode_availability(booked[car_id], days),
+            prices=pricing[car_id].daily_rates(start, days) if prices else None,
+        )
+        for car_id in ids
+    ]
+
 @router.get("/{booking_id}", response_model=BookingResponse)
 async def get_booking(
     booking_id: int,
@@ -126,7 +169,7 @@ async def get_booking(
         )
     
    
-    if booking.user_id != current_user.id and booking.car.owner_id != current_user.id:
+    if booking.user_id != current_user.id and booking.car.owner_email != current_user.email:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to access this booking"
@@ -151,11 +194,11 @@ async def update_booking(
         )
     
  
-    if booking_update.status and booking.car.owner_id == current_user.id:
-        if booking.status == "completed" or booking.status == "cancelled":
+    if booking_update.status and booking.car.owner_email == current_user.email:
+        if booking.status in ("completed", "cancelled", "expired"):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Cannot update a completed or cancelled booking"
+                detail="Cannot update a completed, cancelled or expired booking"
             )
         
         booking.status = booking_update.status
@@ -184,15 +227,15 @@ async def update_booking(
             )
         
       
-        existing_bookings = db.query(Booking).filter(
-            Booking.car_id == booking.car_id,
-            Booking.id != booking_id,
-            Booking.status.in_(["pending", "confirmed"]),
-            or_(
-                and_(Booking.start_date <= start_date, Booking.end_date > start_date),
-                and_(Booking.start_date < end_date, Booking.end_date >= end_date),
-                and_(Booking.start_date >= start_date, Booking.end_date <= end_date)
+        days = booking_days(start_date, end_date)
+        if days > settings.PRICING_MAX_DAYS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Bookings are limited to {settings.PRICING_MAX_DAYS} days"
             )
+
+        existing_bookings = overlapping_bookings(
+            db, booking.car_id, start_date, end_date, exclude_id=booking_id
         ).all()
         
         if existing_bookings:
@@ -205,21 +248,11 @@ async def update_booking(
         booking.end_date = end_date
         
     
-        delta = end_date - start_date
-        days = delta.days or 1
-        
-        base_price = booking.price_per_day * days
-        
-        if days >= 7:
-            discount = 0.15
-            total_price = base_price * (1 - discount)
-        else:
-            discount = 0
-            total_price = base_price
+        quote = get_pricing(db, booking.car).quote(start_date.date(), days)
         
         booking.total_days = days
-        booking.discount_percentage = discount * 100
-        booking.total_price = total_price
+        booking.discount_percentage = quote.discount_percentage
+        booking.total_price = quote.total_price
     
     if booking_update.payment_method and booking.user_id == current_user.id:
         if booking.status != "pending":
@@ -232,6 +265,7 @@ async def update_booking(
     
     db.commit()
     db.refresh(booking)
+    invalidate_calendar(booking.car_id)
     
     return booking
 
@@ -250,7 +284,7 @@ async def cancel_booking(
             detail="Booking not found"
         )
  
-    if booking.user_id != current_user.id and booking.car.owner_id != current_user.id:
+    if booking.user_id != current_user.id and booking.car.owner_email != current_user.email:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to cancel this booking"
@@ -270,6 +304,7 @@ async def cancel_booking(
     
     booking.status = "cancelled"
     db.commit()
+    invalidate_calendar(booking.car_id)
     
     return None
 
@@ -278,7 +313,7 @@ async def check_car_availability(
     car_id: int,
     start_date: str,
     end_date: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Check if a car is available for specific dates"""
     car = db.query(Car).filter(Car.id == car_id).first()
@@ -299,15 +334,7 @@ async def check_car_availability(
         )
     
 
-    bookings = db.query(Booking).filter(
-        Booking.car_id == car_id,
-        Booking.status.in_(["pending", "confirmed"]),
-        or_(
-            and_(Booking.start_date <= start, Booking.end_date > start),
-            and_(Booking.start_date < end, Booking.end_date >= end),
-            and_(Booking.start_date >= start, Booking.end_date <= end)
-        )
-    ).all()
+    bookings = overlapping_bookings(db, car_id, start, end).all()
     
  
     unavailable_periods = [
@@ -328,7 +355,7 @@ async def get_booking_requests(
 ):
     """Get all booking requests for cars owned by the current user"""
 
-    owned_cars = db.query(Car.id).filter(Car.owner_id == current_user.id).all()
+    owned_cars = db.query(Car.id).filter(Car.owner_email == current_user.email).all()
     car_ids = [car.id for car in owned_cars]
     
     if not car_ids:
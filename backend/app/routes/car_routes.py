@@ -1,16 +1,98 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
-import os
-from app.core.database import get_db
+from sqlalchemy import or_, case, func
+from collections import Counter
+from typing import List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.core.database import get_db, prefix_match
+from app.core.db_routing import get_read_db
 from app.models.user_model import User
 from app.models.car_model import Car
-from app.schemas.car_schema import CarCreate, CarResponse
+from app.core.config import settings
+from app.core.catalog_cache import facet_cache, car_cache, invalidate_catalog
+from app.core.catalog_snapshot import catalog_snapshot
+from app.core.pricing import invalidate_pricing
+from app.core.popularity import popularity_index
+from app.core.storage import key_for_url, storage
+from app.schemas.car_schema import (
+    CarCreate, CarResponse, CarNearbyResponse, CarFacetsResponse, FacetBucket, PriceFacetBucket,
+    CarIdsRequest, CarBatchResponse
+)
+from app.schemas.upload_schema import UploadRequest, UploadTicket, UploadComplete
 from app.utils.converters import car_to_response
+from app.utils.geo import apply_coordinates, covering_cells, haversine_km
+from app.utils.security import get_current_user
+from app.utils.uploads import ALLOWED_IMAGE_TYPES, new_object_key, issue_upload, finish_upload, replace_image
 
 router = APIRouter()
 
-BASE_URL ='https://qazaqrental.com/api'
+MAX_IDS_PER_REQUEST = 500
+
+
+def fetch_cars(db: Session, car_ids: List[int]) -> Tuple[List[CarResponse], List[int]]:
+    """
+    Cars for the given ids in request order, served from the car cache where
+    possible and otherwise with one IN query. Returns (cars, missing_ids).
+    """
+    car_ids = list(dict.fromkeys(car_ids))
+    found = {}
+    for car_id in car_ids:
+        cached = car_cache.get(car_id)
+        if cached is not None:
+            found[car_id] = cached
+
+    to_load = [car_id for car_id in car_ids if car_id not in found]
+    if to_load:
+        for car in db.query(Car).filter(Car.id.in_(to_load)).all():
+            found[car.id] = car_to_response(car)
+            # Replica rows may lag an invalidation; only cache primary reads
+            if not db.info.get("replica"):
+                car_cache.set(car.id, found[car.id])
+
+    cars = [found[car_id] for car_id in car_ids if car_id in found]
+    missing = [car_id for car_id in car_ids if car_id not in found]
+    return cars, missing
+
+
+CAR_FIELDS = tuple(CarResponse.__fields__)
+
+FIELDS_DESCRIPTION = "Comma-separated subset of car fields to return, e.g. id,name,price_per_day,image_url"
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Requested car fields, id always first; None means the full CarResponse."""
+    if fields is None:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in CAR_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown car fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(["id"] + requested))
+
+
+def car_columns(fields: List[str]):
+    return [getattr(Car, field) for field in fields]
+
+
+def sparse_response(rows, fields: List[str]) -> JSONResponse:
+    """Serialize column tuples as objects carrying only the requested keys."""
+    return JSONResponse(jsonable_encoder([dict(zip(fields, row)) for row in rows]))
+
+
+def sparse_from_responses(cars: List[CarResponse], fields: List[str]) -> JSONResponse:
+    return sparse_response([[getattr(car, field) for field in fields] for car in cars], fields)
+
+
+def parse_ids(ids: str) -> List[int]:
+    try:
+        parsed = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if len(parsed) > MAX_IDS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IDS_PER_REQUEST} ids per request")
+    return parsed
 
 
 @router.post("/cars", response_model=CarResponse)
@@ -28,6 +110,8 @@ async def create_car(
     owner = db.query(User).filter(User.email == email).first()
     if not owner:
         raise HTTPException(status_code=404, detail="Owner not found")
+    if file and file.content_type not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(status_code=400, detail="Unsupported image type")
 
     
     new_car = Car(
@@ -38,21 +122,20 @@ async def create_car(
         car_type=car_type,
         description=description or ""
     )
+    apply_coordinates(new_car)
     db.add(new_car)
     db.commit()
     db.refresh(new_car)
     
     
     if file:
-        os.makedirs("car_uploads", exist_ok=True)
-        file_path = f"car_uploads/car_{new_car.id}_{file.filename}"
-        
-        with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
-        
-        new_car.image_url = f"{BASE_URL}/{file_path}"
+        key = new_object_key(car_image_prefix(new_car.id), file.content_type)
+        await run_in_threadpool(storage.save, key, file.file, file.content_type)
+        new_car.image_url = storage.url_for(key)
         db.commit()
     
+    invalidate_catalog(new_car.id)
+    await run_in_threadpool(catalog_snapshot.car_changed, db, new_car.id)
     return car_to_response(new_car)
 
 
@@ -62,47 +145,240 @@ async def upload_car_image(car_id: int, file: UploadFile = File(...), db: Sessio
     if not car:
         raise HTTPException(status_code=404, detail="Car not found")
 
-    os.makedirs("car_uploads", exist_ok=True)
+    key = new_object_key(car_image_prefix(car_id), file.content_type)
+    await run_in_threadpool(storage.save, key, file.file, file.content_type)
+    car.image_url = replace_image(car.image_url, key)
+    db.commit()
+    invalidate_catalog(car_id)
+
+    return {"message": "Image uploaded successfully", "image_url": car.image_url}
+
+
+def car_image_prefix(car_id: int) -> str:
+    return f"car_uploads/car_{car_id}"
+
+
+def get_owned_car(db: Session, car_id: int, email: str) -> Car:
+    car = db.query(Car).filter(Car.id == car_id).first()
+    if not car:
+        raise HTTPException(status_code=404, detail="Car not found")
+    if car.owner_email != email:
+        raise HTTPException(status_code=403, detail="Not authorized to edit this car")
+    return car
+
+
+@router.post("/cars/{car_id}/image-upload", response_model=UploadTicket)
+def start_car_image_upload(
+    car_id: int,
+    request: UploadRequest,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Presigned URL for uploading the car image straight to storage; call
+    the complete endpoint with the returned key once the upload is done.
+    """
+    get_owned_car(db, car_id, user.email)
+    return issue_upload(car_image_prefix(car_id), request)
 
-    file_path = f"car_uploads/car_{car_id}_{file.filename}"
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
 
-    car.image_url = f"{BASE_URL}/{file_path}"
+@router.post("/cars/{car_id}/image-upload/complete", response_model=CarResponse)
+def complete_car_image_upload(
+    car_id: int,
+    upload: UploadComplete,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    car = get_owned_car(db, car_id, user.email)
+    key = finish_upload(car_image_prefix(car_id), upload.key)
+
+    car.image_url = replace_image(car.image_url, key)
     db.commit()
+    invalidate_catalog(car_id)
 
-    return {"message": "Image uploaded successfully", "image_url": car.image_url}
+    return car_to_response(car)
 
 
 @router.get("/cars", response_model=List[CarResponse])
-def get_all_cars(db: Session = Depends(get_db)):
+def get_all_cars(
+    response: Response,
+    ids: Optional[str] = Query(None, description="Comma-separated ids; missing ones are listed in X-Missing-Car-Ids"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_read_db)
+):
+    selected = parse_fields(fields)
+    if ids is not None:
+        cars, missing = fetch_cars(db, parse_ids(ids))
+        if selected:
+            response = sparse_from_responses(cars, selected)
+        if missing:
+            response.headers["X-Missing-Car-Ids"] = ",".join(str(i) for i in missing)
+        return response if selected else cars
+
+    if selected:
+        return sparse_response(db.query(*car_columns(selected)).all(), selected)
+
     cars = db.query(Car).all()
     return [car_to_response(c) for c in cars]
 
 
-@router.get("/cars/search", response_model=List[CarResponse])
-def search_cars(
-    db: Session = Depends(get_db),
-    location: Optional[str] = None,
-    max_price: Optional[float] = None,
-    car_type: Optional[str] = None
-):
-    query = db.query(Car)
+@router.post("/cars/batch", response_model=CarBatchResponse)
+def get_cars_batch(request: CarIdsRequest, db: Session = Depends(get_db)):
+    """
+    Multi-get for long id lists
+    """
+    if len(request.ids) > MAX_IDS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IDS_PER_REQUEST} ids per request")
+    cars, missing = fetch_cars(db, request.ids)
+    return CarBatchResponse(cars=cars, missing=missing)
+
 
+def apply_car_filters(query, location: Optional[str], max_price: Optional[float], car_type: Optional[str]):
     if location:
         query = query.filter(Car.location.ilike(f"%{location}%"))
     if max_price is not None:
         query = query.filter(Car.price_per_day <= max_price)
     if car_type:
         query = query.filter(Car.car_type.ilike(f"%{car_type}%"))
+    return query
+
+
+@router.get("/cars/search", response_model=List[CarResponse])
+def search_cars(
+    db: Session = Depends(get_read_db),
+    location: Optional[str] = None,
+    max_price: Optional[float] = None,
+    car_type: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
+):
+    selected = parse_fields(fields)
+    # Filter on the shared snapshot when it is loaded and the match set is modest
+    ids = catalog_snapshot.search(location, max_price, car_type)
+    if ids is not None and len(ids) <= settings.CATALOG_SNAPSHOT_MAX_RESULTS:
+        if selected:
+            rows = db.query(*car_columns(selected)).filter(Car.id.in_(ids)).order_by(Car.id).all() if ids else []
+            return sparse_response(rows, selected)
+        cars, _ = fetch_cars(db, ids)
+        return cars
+
+    if selected:
+        query = apply_car_filters(db.query(*car_columns(selected)), location, max_price, car_type)
+        return sparse_response(query.all(), selected)
+
+    query = apply_car_filters(db.query(Car), location, max_price, car_type)
 
     return [car_to_response(c) for c in query.all()]
 
+@router.get("/cars/facets", response_model=CarFacetsResponse)
+def get_car_facets(
+    db: Session = Depends(get_db),
+    location: Optional[str] = None,
+    max_price: Optional[float] = None,
+    car_type: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Counts per car_type, location and price bucket for the current
+    filters, plus the first page of matching cars
+    """
+    location = location.strip().lower() if location and location.strip() else None
+    car_type = car_type.strip().lower() if car_type and car_type.strip() else None
+    cache_key = (location, max_price, car_type, limit)
+    cached = facet_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    bounds = settings.PRICE_FACET_BOUNDS
+    bucket = case(
+        *[(Car.price_per_day < bound, index) for index, bound in enumerate(bounds)],
+        else_=len(bounds)
+    ).label("price_bucket")
+
+    # One grouped scan; each facet is a rollup of the (type, location, bucket) groups
+    groups = apply_car_filters(
+        db.query(Car.car_type, Car.location, bucket, func.count(Car.id)),
+        location, max_price, car_type
+    ).group_by(Car.car_type, Car.location, bucket).all()
+
+    type_counts, location_counts, bucket_counts = Counter(), Counter(), Counter()
+    for group_type, group_location, group_bucket, count in groups:
+        type_counts[group_type] += count
+        location_counts[group_location] += count
+        bucket_counts[group_bucket] += count
+
+    edges = [None] + bounds + [None]
+    results = apply_car_filters(db.query(Car), location, max_price, car_type).order_by(Car.id).limit(limit).all()
+    response = CarFacetsResponse(
+        total=sum(type_counts.values()),
+        car_type=[FacetBucket(value=v, count=n) for v, n in type_counts.most_common()],
+        location=[FacetBucket(value=v, count=n) for v, n in location_counts.most_common()],
+        price=[
+            PriceFacetBucket(min=edges[i], max=edges[i + 1], count=bucket_counts.get(i, 0))
+            for i in range(len(bounds) + 1)
+        ],
+        results=[car_to_response(c) for c in results],
+    )
+    facet_cache.set(cache_key, response)
+    return response
+
+@router.get("/cars/popular", response_model=List[CarResponse])
+def get_popular_cars(
+    location: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Most favorited/booked cars (time-decayed), optionally within one city
+    """
+    cars, _ = fetch_cars(db, popularity_index.popular(location, limit))
+    return cars
+
+@router.get("/cars/nearby", response_model=List[CarNearbyResponse])
+def search_cars_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10, gt=0, le=500),
+    limit: int = Query(20, ge=1, le=100),
+    max_price: Optional[float] = None,
+    car_type: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Nearest cars within a radius, closest first
+    """
+    dialect = db.get_bind().dialect.name
+    cells = covering_cells(lat, lon, radius_km)
+    query = db.query(Car).filter(
+        or_(*[prefix_match(Car.geohash, cell, dialect) for cell in cells])
+    )
+    query = apply_car_filters(query, None, max_price, car_type)
+
+    candidates = []
+    for car in query.all():
+        distance = haversine_km(lat, lon, car.latitude, car.longitude)
+        if distance <= radius_km:
+            candidates.append((distance, car))
+    candidates.sort(key=lambda item: (item[0], item[1].id))
+
+    return [
+        CarNearbyResponse(**car_to_response(car).dict(), distance_km=round(distance, 3))
+        for distance, car in candidates[:limit]
+    ]
+
 @router.get("/user-cars", response_model=List[CarResponse])
-def get_user_cars(email: str, db: Session = Depends(get_db)):
+def get_user_cars(
+    email: str,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_read_db)
+):
     """
     Get all cars owned by a specific user based on their email
     """
+    selected = parse_fields(fields)
+    if selected:
+        rows = db.query(*car_columns(selected)).filter(Car.owner_email == email).all()
+        return sparse_response(rows, selected)
+
     cars = db.query(Car).filter(Car.owner_email == email).all()
     return [car_to_response(c) for c in cars]
 
@@ -135,8 +411,9 @@ async def update_car(
         car.name = name
     if price_per_day is not None:
         car.price_per_day = price_per_day
-    if location is not None:
+    if location is not None and location != car.location:
         car.location = location
+        apply_coordinates(car)
     if car_type is not None:
         car.car_type = car_type
     if description is not None:
@@ -144,30 +421,55 @@ async def update_car(
     
    
     if file:
-        os.makedirs("car_uploads", exist_ok=True)
-        file_path = f"car_uploads/car_{car_id}_{file.filename}"
-        
-        with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
-        
-        car.image_url = f"{BASE_URL}/{file_path}"
+        key = new_object_key(car_image_prefix(car_id), file.content_type)
+        await run_in_threadpool(storage.save, key, file.file, file.content_type)
+        car.image_url = replace_image(car.image_url, key)
     
     db.commit()
     db.refresh(car)
+    invalidate_catalog(car_id)
+    invalidate_pricing([car_id])
+    await run_in_threadpool(catalog_snapshot.car_changed, db, car_id)
     
     return car_to_response(car)
 
 
 @router.get("/cars/{car_id}", response_model=CarResponse)
-def get_car_by_id(car_id: int, db: Session = Depends(get_db)):
+def get_car_by_id(
+    car_id: int,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db)
+):
     """
     Get a specific car by its ID
     """
+    selected = parse_fields(fields)
+    if selected and car_cache.get(car_id) is None:
+        row = db.query(*car_columns(selected)).filter(Car.id == car_id).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Car not found")
+        return JSONResponse(jsonable_encoder(dict(zip(selected, row))))
+
+    cars, _ = fetch_cars(db, [car_id])
+    if not cars:
+        raise HTTPException(status_code=404, detail="Car not found")
+    if selected:
+        return JSONResponse(jsonable_encoder({field: getattr(cars[0], field) for field in selected}))
+    
+    return cars[0]
+
+
+@router.get("/cars/{car_id}/similar", response_model=List[CarResponse])
+def get_similar_cars(car_id: int, limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
+    """
+    Popular cars of the same type, city and price band
+    """
     car = db.query(Car).filter(Car.id == car_id).first()
     if not car:
         raise HTTPException(status_code=404, detail="Car not found")
-    
-    return car_to_response(car)
+
+    cars, _ = fetch_cars(db, popularity_index.similar(car, limit))
+    return cars
 
 
 @router.delete("/cars/{car_id}")
@@ -183,12 +485,13 @@ def delete_car(car_id: int, email: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=403, detail="Not authorized to delete this car")
     
    
-    if car.image_url and car.image_url.startswith(BASE_URL):
-        image_path = car.image_url.replace(BASE_URL + "/", "")
-        if os.path.exists(image_path):
-            os.remove(image_path)
+    image_key = key_for_url(car.image_url)
+    if image_key:
+        storage.delete(image_key)
     
     db.delete(car)
     db.commit()
+    invalidate_catalog(car_id)
+    catalog_snapshot.car_changed(db, car_id)
     
     return {"message": "Car deleted successfully"}
\ No newline at end of file
@@ -1,10 +1,21 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import tuple_
+from typing import List, Optional
 from app.core.database import get_db
+from app.core.db_routing import get_read_db
 from app.models.user_model import User
 from app.models.message_model import Message
-from app.schemas.message_schema import UserSearchResponse, MessageResponse, MessageCreate
+from app.models.conversation_model import Conversation
+from app.schemas.message_schema import (
+    UserSearchResponse, MessageResponse, MessageCreate, MessageSearchHit, ConversationResponse, PresenceRequest, PresenceResponse
+)
+from app.core import user_search
+from app.core.conversations import conversation_messages, record_message, mark_read
+from app.core.message_archive import archived_history, archived_page
+from app.core.message_search import search_messages, context_ids
+from app.core.presence import online_states
+from app.routes.chat_websocket import manager
 from datetime import datetime
 
 router = APIRouter()
@@ -13,28 +24,69 @@ router = APIRouter()
 def get_messages(
     sender_email: str, 
     receiver_username: str, 
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    before_id: Optional[int] = None,
+    db: Session = Depends(get_read_db)
 ):
-   
+    """
+    Conversation history, oldest first. Without a limit this returns the
+    whole history, archived messages included; with one, pass the oldest
+    id received as before_id to page back, reading into the archive once
+    the hot table runs out.
+    """
     receiver = db.query(User).filter(User.username == receiver_username).first()
     if not receiver:
         raise HTTPException(status_code=404, detail="Receiver not found")
     
     receiver_email = receiver.email
     
-  
-    messages = db.query(Message).filter(
-        (
-            (Message.sender_email == sender_email) & 
-            (Message.receiver_email == receiver_email)
-        ) | (
-            (Message.sender_email == receiver_email) & 
-            (Message.receiver_email == sender_email)
-        )
-    ).order_by(Message.timestamp).all()
+    query = conversation_messages(db, sender_email, receiver_email)
+    if limit is None and before_id is None:
+        # Archived messages are all older than anything still in the hot table
+        archived = [MessageResponse(**m) for m in archived_history(db, sender_email, receiver_email)]
+        return archived + query.order_by(Message.timestamp).all()
+
+    limit = limit or 50
+    if before_id is not None:
+        query = query.filter(Message.id < before_id)
+    messages = query.order_by(Message.id.desc()).limit(limit).all()
+    messages.reverse()
+
+    if len(messages) < limit:
+        oldest = messages[0].id if messages else before_id
+        older = archived_page(db, sender_email, receiver_email, oldest, limit - len(messages))
+        messages = [MessageResponse(**m) for m in older] + messages
     
     return messages
 
+@router.get("/search-messages/{user_email}", response_model=List[MessageSearchHit])
+def search_user_messages(
+    user_email: str,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0, le=1000),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Full-text search over the user's own conversations, best matches first.
+    previous_id/next_id point at the neighbouring messages for context.
+    Archived messages are not searched.
+    """
+    q = q.strip()
+    if not q:
+        return []
+    hits = search_messages(db, user_email, q, limit, offset)
+    context = context_ids(db, [message.id for message, _ in hits])
+
+    return [
+        MessageSearchHit(
+            message=MessageResponse.from_orm(message),
+            rank=rank,
+            previous_id=context[message.id][0],
+            next_id=context[message.id][1],
+        ) for message, rank in hits
+    ]
+
 @router.post("/send", response_model=MessageResponse)
 def send_message(message: MessageCreate, db: Session = Depends(get_db)):
     
@@ -50,23 +102,91 @@ def send_message(message: MessageCreate, db: Session = Depends(get_db)):
         timestamp=datetime.now()
     )
     db.add(new_message)
+    db.flush()
+    record_message(db, new_message)
     db.commit()
     db.refresh(new_message)
     
     return new_message
 
+@router.get("/inbox/{user_email}", response_model=List[ConversationResponse])
+def get_inbox(
+    user_email: str,
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Conversations ordered by last activity. Pass the last row's
+    last_message_at/id as before/before_id to get the next page.
+    """
+    query = db.query(Conversation, User.username).outerjoin(
+        User, User.email == Conversation.partner_email
+    ).filter(Conversation.owner_email == user_email)
+
+    if before is not None:
+        if before_id is not None:
+            query = query.filter(
+                tuple_(Conversation.last_message_at, Conversation.id) < tuple_(before, before_id)
+            )
+        else:
+            query = query.filter(Conversation.last_message_at < before)
+
+    rows = query.order_by(
+        Conversation.last_message_at.desc(), Conversation.id.desc()
+    ).limit(limit).all()
+
+    return [
+        ConversationResponse(
+            id=conversation.id,
+            partner_email=conversation.partner_email,
+            partner_username=partner_username,
+            last_message_id=conversation.last_message_id,
+            last_message_text=conversation.last_message_text,
+            last_message_at=conversation.last_message_at,
+            last_sender_email=conversation.last_sender_email,
+            unread_count=conversation.unread_count,
+        ) for conversation, partner_username in rows
+    ]
+
+@router.post("/inbox/{user_email}/read/{partner_username}")
+def mark_conversation_read(user_email: str, partner_username: str, db: Session = Depends(get_db)):
+    partner = db.query(User).filter(User.username == partner_username).first()
+    if not partner:
+        raise HTTPException(status_code=404, detail="Receiver not found")
+
+    if not mark_read(db, user_email, partner.email):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    db.commit()
+
+    return {"detail": "Conversation marked as read"}
+
+@router.post("/presence", response_model=PresenceResponse)
+def get_presence(request: PresenceRequest, db: Session = Depends(get_db)):
+    """
+    Online status for many users in one call
+    """
+    if len(request.emails) > 500:
+        raise HTTPException(status_code=400, detail="At most 500 emails per request")
+
+    local = set(manager.active_connections)
+    remote = [email for email in request.emails if email not in local]
+    presence = online_states(db, remote)
+    presence.update({email: True for email in request.emails if email in local})
+
+    return PresenceResponse(presence=presence)
+
 @router.get("/search-users", response_model=List[UserSearchResponse])
 def search_users(query: str = Query(..., min_length=1), db: Session = Depends(get_db)):
     """
-    Search for users by username or email
+    Search for users by username or email prefix, exact matches first
     """
-    users = db.query(User).filter(
-        (User.username.ilike(f"%{query}%")) | (User.email.ilike(f"%{query}%"))
-    ).limit(10).all()
+    hits = user_search.search_users(db, query, limit=10)
     
     return [
         UserSearchResponse(
-            username=user.username,
-            email=user.email,
-        ) for user in users
+            username=username,
+            email=email,
+        ) for username, email in hits
     ]
\ No newline at end of file
@@ -1,35 +1,120 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.database import SessionLocal
 from app.core.websocket_manager import ConnectionManager
+from app.core.presence import PresenceService
 from app.models.user_model import User
 from app.models.message_model import Message
+from app.core.conversations import record_message
+from app.core.delivery import get_cursor, fetch_undelivered, advance_cursor
+from app.core.config import settings
+from app.core.outbox import ChangeEvent, outbox
+from app.utils.cache import TTLCache
+from app.utils.converters import message_to_dict
+from starlette.concurrency import run_in_threadpool
 import json
 from datetime import datetime
 
 router = APIRouter()
 manager = ConnectionManager()
+presence = PresenceService(manager)
+# Messages this worker's sockets already pushed; the change feed skips them
+pushed_locally = TTLCache(maxsize=10000, ttl=300)
+
+
+def _load_message(message_id: int) -> Optional[dict]:
+    with SessionLocal() as db:
+        message = db.get(Message, message_id)
+        return message_to_dict(message) if message else None
+
+
+async def push_new_message(change: ChangeEvent):
+    """
+    Live delivery for messages written on another worker or over REST:
+    every worker pushes new messages to the recipient sockets it holds.
+    """
+    receiver_email = change.payload.get("receiver_email")
+    if change.op != "insert" or receiver_email not in manager.active_connections:
+        return
+    if pushed_locally.get(change.entity_id):
+        return
+    message = await run_in_threadpool(_load_message, change.entity_id)
+    if message is not None:
+        await manager.send_personal_message(message, receiver_email)
+
+
+outbox.subscribe("message", push_new_message)
+
+
+async def replay_missed_messages(websocket: WebSocket, user_email: str, after_id: int):
+    """Send messages received after `after_id` in batches of small range queries."""
+    batch_size = settings.WS_REPLAY_BATCH_SIZE
+    while True:
+        # The connection goes back to the pool before the (possibly slow) send
+        with SessionLocal() as db:
+            batch = [message_to_dict(m) for m in fetch_undelivered(db, user_email, after_id, batch_size + 1)]
+        has_more = len(batch) > batch_size
+        batch = batch[:batch_size]
+        if batch:
+            after_id = batch[-1]["id"]
+        await websocket.send_text(json.dumps({
+            "type": "replay",
+            "messages": batch,
+            "has_more": has_more
+        }))
+        if not has_more:
+            break
+    await websocket.send_text(json.dumps({
+        "type": "replay_complete",
+        "last_id": after_id
+    }))
+
 
 @router.websocket("/ws/chat/{user_email}")
 async def websocket_endpoint(
     websocket: WebSocket, 
     user_email: str, 
-    db: Session = Depends(get_db)
+    since: Optional[int] = Query(None, description="Replay messages with a greater id"),
+    device_id: Optional[str] = Query(None, description="Device whose acknowledged cursor to resume from"),
 ):
-    # Verify user exists
-    user = db.query(User).filter(User.email == user_email).first()
+    # Sessions are opened per unit of work below, never for the socket's lifetime
+    with SessionLocal() as db:
+        # Verify user exists
+        user = db.query(User).filter(User.email == user_email).first()
+        replay_from = since
+        if user and replay_from is None and device_id:
+            replay_from = get_cursor(db, user_email, device_id)
     if not user:
         await websocket.close(code=1008)  # Policy violation
         return
     
-    await manager.connect(websocket, user_email)
+    if not await manager.connect(websocket, user_email):
+        return
     
     try:
+        if replay_from is not None:
+            await replay_missed_messages(websocket, user_email, replay_from)
+
         while True:
             data = await websocket.receive_text()
+            manager.touch(websocket)
             message_data = json.loads(data)
             
+            if message_data.get("type") == "pong":
+                continue
+            
+            # Acknowledgement: {"type": "ack", "message_id": <id>}
+            if message_data.get("type") == "ack":
+                if not device_id or not isinstance(message_data.get("message_id"), int):
+                    await websocket.send_text(json.dumps({
+                        "error": "Acknowledgements require a device_id and an integer message_id"
+                    }))
+                    continue
+                with SessionLocal() as db:
+                    advance_cursor(db, user_email, device_id, message_data["message_id"])
+                    db.commit()
+                continue
+            
             # Validate message data
             if "receiver_email" not in message_data or "text" not in message_data:
                 await websocket.send_text(json.dumps({
@@ -40,35 +125,38 @@ async def websocket_endpoint(
             receiver_email = message_data["receiver_email"]
             text = message_data["text"]
             
-            # Verify receiver exists
-            receiver = db.query(User).filter(User.email == receiver_email).first()
-            if not receiver:
+            with SessionLocal() as db:
+                # Verify receiver exists
+                receiver = db.query(User).filter(User.email == receiver_email).first()
+                message_response = None
+                if receiver:
+                    # Save message to database
+                    new_message = Message(
+                        sender_email=user_email,
+                        receiver_email=receiver_email,
+                        text=text,
+                        timestamp=datetime.now()
+                    )
+                    db.add(new_message)
+                    db.flush()
+                    record_message(db, new_message)
+                    # Marked before commit, so the change feed can never
+                    # see the message first and push it a second time
+                    pushed_locally.set(new_message.id, True)
+                    db.commit()
+                    db.refresh(new_message)
+                    
+                    # Format message for sending
+                    message_response = message_to_dict(new_message)
+            
+            if message_response is None:
                 await websocket.send_text(json.dumps({
                     "error": f"User with email {receiver_email} not found"
                 }))
                 continue
             
-            # Save message to database
-            new_message = Message(
-                sender_email=user_email,
-                receiver_email=receiver_email,
-                text=text,
-                timestamp=datetime.now()
-            )
-            db.add(new_message)
-            db.commit()
-            db.refresh(new_message)
-            
-            # Format message for sending
-            message_response = {
-                "id": new_message.id,
-                "sender_email": new_message.sender_email,
-                "receiver_email": new_message.receiver_email,
-                "text": new_message.text,
-                "timestamp": new_message.timestamp.isoformat()
-            }
-            
-            # Send message to recipient if they're connected
+            # Send message to recipient if they're connected here; the
+            # change feed delivers it to their sockets on other workers
             await manager.send_personal_message(message_response, receiver_email)
             
             # Send confirmation back to sender
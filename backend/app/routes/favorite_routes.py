@@ -1,16 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 
-from app.core.database import get_db
+from app.core.database import dialect_insert, get_db
+from app.core.db_routing import get_read_db
 from app.models.favorite_model import Favorite
 from app.models.car_model import Car
 from app.models.user_model import User
-from app.schemas.favorite_schema import FavoriteCreate, FavoriteOut
+from app.schemas.favorite_schema import (
+    FavoriteCreate, FavoriteOut, FavoriteBatchRequest, FavoriteBatchResponse, FavoriteStatusResponse
+)
+from app.core.outbox import record_change
+from app.core.popularity import record_favorite, record_favorites
 
 router = APIRouter(prefix="/favorites", tags=["Favorites"])
 
+MAX_BATCH_SIZE = 200
+
 
 class FavoriteCreateRequest(BaseModel):
     car_id: int
@@ -18,7 +27,7 @@ class FavoriteCreateRequest(BaseModel):
 @router.get("/", response_model=List[dict])
 def get_favorites(
     userEmail: str = Query(..., description="Email of the user"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     
     user = db.query(User).filter(User.email == userEmail).first()
@@ -27,18 +36,11 @@ def get_favorites(
                             detail="User not found")
 
    
-    favorites = db.query(Favorite).filter(Favorite.user_id == user.id).all()
-    
-   
-    result = []
-    for fav in favorites:
-        car = db.query(Car).filter(Car.id == fav.car_id).first()
-        if car:
-           
-            car_dict = {c.name: getattr(car, c.name) for c in car.__table__.columns}
-            result.append(car_dict)
+    cars = db.query(Car).join(Favorite, Favorite.car_id == Car.id).filter(
+        Favorite.user_id == user.id
+    ).order_by(Favorite.id).all()
     
-    return result
+    return [{c.name: getattr(car, c.name) for c in car.__table__.columns} for car in cars]
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
 def add_favorite(
@@ -72,6 +74,16 @@ def add_favorite(
 
     new_fav = Favorite(user_id=user.id, car_id=fav_data.car_id)
     db.add(new_fav)
+    try:
+        db.flush()
+    except IntegrityError:
+        # Lost a race with a concurrent add of the same favorite
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Car is already in favourites."
+        )
+    record_favorite(db, fav_data.car_id)
     db.commit()
     db.refresh(new_fav)
     
@@ -107,5 +119,85 @@ def remove_favorite(
         )
 
     db.delete(favorite)
+    record_favorite(db, car_id, added=False)
+    db.commit()
+    return {"detail": "Car removed from favourites"}
+
+@router.get("/status", response_model=FavoriteStatusResponse)
+def get_favorite_status(
+    userEmail: str = Query(..., description="Email of the user"),
+    car_ids: str = Query(..., description="Comma-separated car ids"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Which of the given cars the user has favorited, in one indexed query
+    """
+    try:
+        ids = list(dict.fromkeys(int(i) for i in car_ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="car_ids must be comma-separated integers")
+    if len(ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {MAX_BATCH_SIZE} car ids per request")
+
+    favorited = {
+        car_id for (car_id,) in db.query(Favorite.car_id).join(
+            User, User.id == Favorite.user_id
+        ).filter(User.email == userEmail, Favorite.car_id.in_(ids))
+    } if ids else set()
+
+    return FavoriteStatusResponse(favorited={car_id: car_id in favorited for car_id in ids})
+
+@router.post("/batch", response_model=FavoriteBatchResponse)
+def batch_favorites(
+    batch: FavoriteBatchRequest,
+    userEmail: str = Query(..., description="Email of the user"),
+    db: Session = Depends(get_db)
+):
+    """
+    Add and remove many favorites in one transaction. Ids that are already
+    in the requested state or refer to missing cars are reported as skipped.
+    """
+    add_ids = list(dict.fromkeys(batch.add))
+    remove_ids = [i for i in dict.fromkeys(batch.remove) if i not in set(add_ids)]
+    if len(add_ids) + len(remove_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {MAX_BATCH_SIZE} car ids per request")
+
+    user = db.query(User).filter(User.email == userEmail).first()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="User not found")
+
+    known_cars = [
+        car_id for (car_id,) in db.query(Car.id).filter(Car.id.in_(add_ids))
+    ] if add_ids else []
+
+    # RETURNING reports what each statement actually changed, so concurrent
+    # requests for the same favorites neither fail nor count twice
+    inserted, deleted = set(), set()
+    if known_cars:
+        stmt = dialect_insert(db, Favorite).values([
+            {"user_id": user.id, "car_id": car_id} for car_id in known_cars
+        ]).on_conflict_do_nothing(index_elements=["user_id", "car_id"])
+        inserted = {car_id for (car_id,) in db.execute(stmt.returning(Favorite.car_id))}
+    if remove_ids:
+        deleted = {car_id for (car_id,) in db.execute(
+            delete(Favorite).where(Favorite.user_id == user.id, Favorite.car_id.in_(remove_ids))
+            .returning(Favorite.car_id)
+        )}
+
+    added = [i for i in add_ids if i in inserted]
+    removed = [i for i in remove_ids if i in deleted]
+    skipped = [i for i in add_ids + remove_ids if i not in inserted and i not in deleted]
+
+    if added:
+        record_change(db, "favorite", "bulk_insert", user_id=user.id, car_ids=added)
+        record_favorites(db, added)
+    if removed:
+        record_change(db, "favorite", "bulk_delete", user_id=user.id, car_ids=removed)
+        record_favorites(db, removed, added=False)
     db.commit()
-    return {"detail": "Car removed from favourites"}
\ No newline at end of file
+
+    return FavoriteBatchResponse(added=added, removed=removed, skipped=skipped)
@@ -0,0 +1,156 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from datetime import datetime
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.db_routing import get_read_db
+from app.core.pricing import RULE_KINDS, booking_days, get_pricing, invalidate_pricing
+from app.models.car_model import Car
+from app.models.pricing_rule_model import PricingRule
+from app.models.user_model import User
+from app.schemas.pricing_schema import PricingRuleCreate, PricingRuleResponse, PriceQuote
+from app.utils.security import get_current_user
+
+router = APIRouter(prefix="/pricing", tags=["pricing"])
+
+
+def validate_rule(rule: PricingRuleCreate):
+    if rule.kind not in RULE_KINDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"kind must be one of: {', '.join(RULE_KINDS)}"
+        )
+    if rule.kind in ("season", "weekend") and not (rule.multiplier and rule.multiplier > 0):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="multiplier must be positive"
+        )
+    if rule.kind == "season" and not (rule.start_date and rule.end_date and rule.start_date <= rule.end_date):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Season rules need start_date on or before end_date"
+        )
+    if rule.kind == "duration" and not (
+        rule.min_days and rule.min_days >= 1
+        and rule.discount_percentage is not None and 0 <= rule.discount_percentage < 100
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Duration rules need min_days >= 1 and a discount_percentage from 0 to 100"
+        )
+
+
+def affected_car_ids(db: Session, rule: PricingRule) -> List[int]:
+    if rule.car_id is not None:
+        return [rule.car_id]
+    return [car_id for (car_id,) in db.query(Car.id).filter(Car.owner_email == rule.owner_email)]
+
+
+@router.get("/rules", response_model=List[PricingRuleResponse])
+async def get_pricing_rules(
+    car_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Pricing rules of the current user, optionally only those of one car"""
+    query = db.query(PricingRule).filter(PricingRule.owner_email == current_user.email)
+    if car_id is not None:
+        query = query.filter(PricingRule.car_id == car_id)
+    return query.order_by(PricingRule.id).all()
+
+
+@router.post("/rules", response_model=PricingRuleResponse, status_code=status.HTTP_201_CREATED)
+async def create_pricing_rule(
+    rule: PricingRuleCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Add a rule for all of the current user's cars, or for one car"""
+    validate_rule(rule)
+    if rule.car_id is not None:
+        car = db.query(Car).filter(Car.id == rule.car_id).first()
+        if not car:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Car not found"
+            )
+        if car.owner_email != current_user.email:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to price this car"
+            )
+
+    new_rule = PricingRule(owner_email=current_user.email, **rule.dict())
+    db.add(new_rule)
+    db.commit()
+    db.refresh(new_rule)
+    invalidate_pricing(affected_car_ids(db, new_rule))
+
+    return new_rule
+
+
+@router.delete("/rules/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_pricing_rule(
+    rule_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    rule = db.query(PricingRule).filter(PricingRule.id == rule_id).first()
+    if not rule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pricing rule not found"
+        )
+    if rule.owner_email != current_user.email:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to delete this rule"
+        )
+
+    car_ids = affected_car_ids(db, rule)
+    db.delete(rule)
+    db.commit()
+    invalidate_pricing(car_ids)
+
+    return None
+
+
+@router.get("/quote", response_model=PriceQuote)
+async def get_price_quote(
+    car_id: int,
+    start_date: str,
+    end_date: str,
+    db: Session = Depends(get_read_db)
+):
+    """Price of a stay under the car's current rules"""
+    car = db.query(Car).filter(Car.id == car_id).first()
+    if not car:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Car not found"
+        )
+    try:
+        start = datetime.fromisoformat(start_date)
+        end = datetime.fromisoformat(end_date)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date format. Use ISO format (YYYY-MM-DD)"
+        )
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="End date must be after start date"
+        )
+
+    days = booking_days(start, end)
+    if days > settings.PRICING_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Bookings are limited to {settings.PRICING_MAX_DAYS} days"
+        )
+
+    quote = get_pricing(db, car).quote(start.date(), days)
+    return PriceQuote(car_id=car.id, price_per_day=car.price_per_day, **quote._asdict())
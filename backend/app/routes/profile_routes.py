@@ -1,14 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from sqlalchemy.orm import Session
-import shutil
-import os
-import time
-from fastapi.staticfiles import StaticFiles
 
 from app.core.database import get_db
 from app.models.user_model import User
 from app.schemas.user_schema import UpdateProfileRequest
-from app.utils.security import decode_access_token
+from app.schemas.upload_schema import UploadRequest, UploadTicket, UploadComplete
+from app.core.storage import storage
+from app.utils.security import decode_access_token, get_current_user
+from app.utils.uploads import new_object_key, issue_upload, finish_upload, replace_image
+from app.core.user_search import user_changed
 from fastapi.security import OAuth2PasswordBearer
 
 router = APIRouter()
@@ -17,10 +17,8 @@ router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 
-UPLOAD_DIR = "uploaded_images"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-
+def profile_image_prefix(user: User) -> str:
+    return f"uploaded_images/user_{user.id}"
 
 
 @router.get("/profile")
@@ -88,6 +86,7 @@ def update_profile(
         raise HTTPException(status_code=404, detail="User not found.")
 
     
+    old_username = user.username
     if profile_data.username is not None:
         user.username = profile_data.username
     if profile_data.bio is not None:
@@ -97,6 +96,8 @@ def update_profile(
 
     db.commit()
     db.refresh(user)
+    if user.username != old_username:
+        user_changed(old_username, user.email, user.username, user.email)
 
     return {
         "username": user.username,
@@ -130,18 +131,40 @@ def upload_profile_image(
         raise HTTPException(status_code=404, detail="User not found.")
 
     
-    filename = f"{int(time.time())}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    key = new_object_key(profile_image_prefix(user), file.content_type)
+    storage.save(key, file.file, file.content_type)
 
-    
-    user.profile_image = f"uploaded_images/{filename}"
+    user.profile_image = replace_image(user.profile_image, key)
     db.commit()
     db.refresh(user)
 
     return {
         "message": "File uploaded successfully",
         "profile_image": user.profile_image,
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/profile/image-upload", response_model=UploadTicket)
+def start_profile_image_upload(request: UploadRequest, user: User = Depends(get_current_user)):
+    """
+    Presigned URL for uploading the profile image straight to storage;
+    call the complete endpoint with the returned key afterwards.
+    """
+    return issue_upload(profile_image_prefix(user), request)
+
+
+@router.post("/profile/image-upload/complete")
+def complete_profile_image_upload(
+    upload: UploadComplete,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    key = finish_upload(profile_image_prefix(user), upload.key)
+
+    user.profile_image = replace_image(user.profile_image, key)
+    db.commit()
+
+    return {
+        "message": "File uploaded successfully",
+        "profile_image": user.profile_image,
+    }
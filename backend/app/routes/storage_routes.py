@@ -0,0 +1,46 @@
+import os
+
+import aiofiles
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from app.core.config import settings
+from app.core.storage import LocalStorage, normalize_key, storage
+from app.utils.uploads import ALLOWED_IMAGE_TYPES, PENDING_PREFIX
+
+router = APIRouter()
+
+
+@router.put("/storage/{key:path}", status_code=204)
+async def put_object(key: str, expires: int, signature: str, request: Request):
+    """
+    Receives presigned uploads when the local storage backend is in use.
+    S3-backed deployments never route upload bytes through here.
+    """
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    key = normalize_key(key)
+    content_type = request.headers.get("content-type", "")
+    if not key or not storage.verify_upload(key, expires, signature, content_type):
+        raise HTTPException(status_code=403, detail="Invalid or expired upload URL")
+    # Only pending image keys whose extension matches the signed type; the
+    # extension decides the Content-Type the object is later served with
+    extension = ALLOWED_IMAGE_TYPES.get(content_type)
+    if not key.startswith(PENDING_PREFIX + "/") or extension is None or not key.endswith(extension):
+        raise HTTPException(status_code=400, detail="Upload key does not match the signed image type")
+
+    temp_path = storage.open_for_write(key)
+    written = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as buffer:
+            async for chunk in request.stream():
+                written += len(chunk)
+                if written > settings.STORAGE_MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Upload too large")
+                await buffer.write(chunk)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    storage.commit_write(key)
+
+    return Response(status_code=204)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 
 class BookingBase(BaseModel):
     car_id: int
@@ -41,4 +41,12 @@ class CarAvailabilityCheck(BaseModel):
 
 class UnavailablePeriod(BaseModel):
     start_date: str
-    end_date: str
\ No newline at end of file
+    end_date: str
+
+class CarCalendar(BaseModel):
+    car_id: int
+    start: date
+    days: int
+    # Base64 bitmap, bit i (LSB first within each byte) set when day start+i is free
+    available: str
+    prices: Optional[List[float]] = None
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class CarCreate(BaseModel):
     name: Optional[str] = None
@@ -19,3 +19,31 @@ class CarResponse(BaseModel):
     description: Optional[str]
     image_url: Optional[str]
     created_at: datetime
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+class CarNearbyResponse(CarResponse):
+    distance_km: float
+
+class FacetBucket(BaseModel):
+    value: str
+    count: int
+
+class PriceFacetBucket(BaseModel):
+    min: Optional[float]
+    max: Optional[float]
+    count: int
+
+class CarFacetsResponse(BaseModel):
+    total: int
+    car_type: List[FacetBucket]
+    location: List[FacetBucket]
+    price: List[PriceFacetBucket]
+    results: List[CarResponse]
+
+class CarIdsRequest(BaseModel):
+    ids: List[int]
+
+class CarBatchResponse(BaseModel):
+    cars: List[CarResponse]
+    missing: List[int]
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Dict, List
 
 class FavoriteCreate(BaseModel):
     car_id: int
@@ -12,3 +13,15 @@ class FavoriteOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+class FavoriteBatchRequest(BaseModel):
+    add: List[int] = []
+    remove: List[int] = []
+
+class FavoriteBatchResponse(BaseModel):
+    added: List[int]
+    removed: List[int]
+    skipped: List[int]
+
+class FavoriteStatusResponse(BaseModel):
+    favorited: Dict[int, bool]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class UserSearchResponse(BaseModel):
@@ -24,4 +24,27 @@ class MessageResponse(MessageBase):
     timestamp: datetime
     
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class MessageSearchHit(BaseModel):
+    message: MessageResponse
+    rank: float
+    previous_id: Optional[int]
+    next_id: Optional[int]
+
+class ConversationResponse(BaseModel):
+    id: int
+    partner_email: str
+    partner_username: Optional[str]
+    last_message_id: Optional[int]
+    last_message_text: Optional[str]
+    last_message_at: datetime
+    last_sender_email: Optional[str]
+    unread_count: int
+
+
+class PresenceRequest(BaseModel):
+    emails: List[str]
+
+class PresenceResponse(BaseModel):
+    presence: Dict[str, bool]
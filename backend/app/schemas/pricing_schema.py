@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import date, datetime
+
+class PricingRuleCreate(BaseModel):
+    kind: str = Field(..., description="season, weekend or duration")
+    car_id: Optional[int] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    multiplier: Optional[float] = None
+    min_days: Optional[int] = None
+    discount_percentage: Optional[float] = None
+
+class PricingRuleResponse(PricingRuleCreate):
+    id: int
+    owner_email: str
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class PriceQuote(BaseModel):
+    car_id: int
+    days: int
+    price_per_day: float
+    subtotal: float
+    discount_percentage: float
+    total_price: float
+    daily_rates: List[float]
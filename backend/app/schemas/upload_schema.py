@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Dict
+from datetime import datetime
+
+class UploadRequest(BaseModel):
+    filename: str
+    content_type: str
+
+class UploadTicket(BaseModel):
+    key: str
+    url: str
+    method: str = "PUT"
+    headers: Dict[str, str]
+    expires_at: datetime
+
+class UploadComplete(BaseModel):
+    key: str
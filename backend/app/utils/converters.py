@@ -1,4 +1,5 @@
 from app.models.car_model import Car
+from app.models.message_model import Message
 from app.schemas.car_schema import CarResponse
 
 def car_to_response(car: Car) -> CarResponse:
@@ -11,5 +12,17 @@ def car_to_response(car: Car) -> CarResponse:
         car_type=car.car_type,
         description=car.description,
         image_url=car.image_url,
-        created_at=car.created_at
+        created_at=car.created_at,
+        latitude=car.latitude,
+        longitude=car.longitude
     )
+
+
+def message_to_dict(message: Message) -> dict:
+    return {
+        "id": message.id,
+        "sender_email": message.sender_email,
+        "receiver_email": message.receiver_email,
+        "text": message.text,
+        "timestamp": message.timestamp.isoformat()
+    }
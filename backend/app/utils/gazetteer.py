@@ -0,0 +1,111 @@
+"""
+Offline city coordinates used to geocode the free-text `Car.location`.
+Keys are normalized names; aliases cover common spellings and Cyrillic forms.
+"""
+import re
+from typing import Optional, Tuple
+
+CITIES = {
+    "almaty": (43.2389, 76.8897),
+    "astana": (51.1694, 71.4491),
+    "shymkent": (42.3417, 69.5901),
+    "karaganda": (49.8047, 73.1094),
+    "aktobe": (50.2839, 57.1670),
+    "taraz": (42.9000, 71.3667),
+    "pavlodar": (52.2873, 76.9674),
+    "ust-kamenogorsk": (49.9483, 82.6279),
+    "semey": (50.4111, 80.2275),
+    "atyrau": (47.1167, 51.8833),
+    "kostanay": (53.2144, 63.6246),
+    "kyzylorda": (44.8528, 65.5092),
+    "oral": (51.2333, 51.3667),
+    "petropavl": (54.8833, 69.1500),
+    "aktau": (43.6500, 51.1667),
+    "temirtau": (50.0549, 72.9646),
+    "turkistan": (43.2973, 68.2518),
+    "kokshetau": (53.2833, 69.4000),
+    "taldykorgan": (45.0156, 78.3739),
+    "ekibastuz": (51.7236, 75.3228),
+    "zhezkazgan": (47.7833, 67.7000),
+    "balkhash": (46.8481, 74.9950),
+    "kaskelen": (43.2000, 76.6200),
+    "konaev": (43.8667, 77.0667),
+    "bishkek": (42.8746, 74.5698),
+    "tashkent": (41.2995, 69.2401),
+}
+
+ALIASES = {
+    "алматы": "almaty",
+    "alma-ata": "almaty",
+    "алма-ата": "almaty",
+    "астана": "astana",
+    "nur-sultan": "astana",
+    "нур-султан": "astana",
+    "шымкент": "shymkent",
+    "караганда": "karaganda",
+    "karagandy": "karaganda",
+    "қарағанды": "karaganda",
+    "актобе": "aktobe",
+    "aqtobe": "aktobe",
+    "тараз": "taraz",
+    "павлодар": "pavlodar",
+    "oskemen": "ust-kamenogorsk",
+    "усть-каменогорск": "ust-kamenogorsk",
+    "өскемен": "ust-kamenogorsk",
+    "семей": "semey",
+    "semipalatinsk": "semey",
+    "атырау": "atyrau",
+    "костанай": "kostanay",
+    "qostanay": "kostanay",
+    "кызылорда": "kyzylorda",
+    "qyzylorda": "kyzylorda",
+    "уральск": "oral",
+    "uralsk": "oral",
+    "орал": "oral",
+    "петропавловск": "petropavl",
+    "petropavlovsk": "petropavl",
+    "актау": "aktau",
+    "aqtau": "aktau",
+    "темиртау": "temirtau",
+    "туркестан": "turkistan",
+    "turkestan": "turkistan",
+    "кокшетау": "kokshetau",
+    "талдыкорган": "taldykorgan",
+    "экибастуз": "ekibastuz",
+    "жезказган": "zhezkazgan",
+    "балхаш": "balkhash",
+    "каскелен": "kaskelen",
+    "конаев": "konaev",
+    "kapchagay": "konaev",
+    "капчагай": "konaev",
+    "бишкек": "bishkek",
+    "ташкент": "tashkent",
+}
+
+_SEPARATORS = re.compile(r"[,;/()]")
+
+
+def normalize_city(name: str) -> str:
+    name = re.sub(r"\s+", " ", name.strip().lower())
+    for prefix in ("city of ", "г. ", "г.", "город "):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    return name.replace(" ", "-")
+
+
+def canonical_city(location: Optional[str]) -> Optional[str]:
+    """Gazetteer key of the first recognizable city in a location string."""
+    if not location:
+        return None
+    for part in [location] + _SEPARATORS.split(location):
+        key = normalize_city(part)
+        key = ALIASES.get(key, key)
+        if key in CITIES:
+            return key
+    return None
+
+
+def lookup(location: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Coordinates for the first recognizable city in a location string."""
+    key = canonical_city(location)
+    return CITIES[key] if key else None
@@ -0,0 +1,94 @@
+import math
+from typing import List, Tuple
+
+from app.models.car_model import Car
+from app.utils import gazetteer
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0088
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = 9) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def cell_size_degrees(precision: int) -> Tuple[float, float]:
+    """(lat, lon) extent of a geohash cell of the given length."""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = math.floor(precision * 5 / 2)
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> List[str]:
+    """
+    Geohash prefixes whose union contains the circle: the longest precision
+    whose cells are at least as large as the radius, centre cell plus neighbours.
+    """
+    lat_radius = radius_km / 110.574
+    lon_radius = radius_km / (111.320 * max(math.cos(math.radians(latitude)), 0.01))
+    precision = 1
+    for candidate in range(9, 0, -1):
+        lat_size, lon_size = cell_size_degrees(candidate)
+        if lat_size >= lat_radius and lon_size >= lon_radius:
+            precision = candidate
+            break
+
+    lat_size, lon_size = cell_size_degrees(precision)
+    cells = set()
+    for dlat in (-lat_size, 0.0, lat_size):
+        for dlon in (-lon_size, 0.0, lon_size):
+            lat = min(max(latitude + dlat, -90.0), 90.0)
+            lon = (longitude + dlon + 180.0) % 360.0 - 180.0
+            cells.add(geohash_encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def apply_coordinates(car: Car) -> bool:
+    """Geocode `car.location`; returns False if the city is unknown."""
+    coordinates = gazetteer.lookup(car.location)
+    if coordinates is None:
+        car.latitude = car.longitude = car.geohash = None
+        return False
+    car.latitude, car.longitude = coordinates
+    car.geohash = geohash_encode(*coordinates)
+    return True
+
+
+def backfill_car_coordinates(db, batch_size: int = 1000) -> int:
+    """Geocode cars created before coordinates existed."""
+    located, last_id = 0, 0
+    while True:
+        cars = db.query(Car).filter(
+            Car.id > last_id, Car.geohash.is_(None)
+        ).order_by(Car.id).limit(batch_size).all()
+        if not cars:
+            break
+        for car in cars:
+            located += apply_coordinates(car)
+        last_id = cars[-1].id
+        db.commit()
+    return located
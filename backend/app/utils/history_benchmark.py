@@ -0,0 +1,116 @@
+"""
+Conversation history latency at production scale, with and without the
+message archive. Seed 50M messages into a scratch database, then time
+history pages before and after archiving:
+
+    python -m app.utils.seed_data --database-url postgresql://localhost/scratch \
+        --cars 0 --favorites 0 --bookings 0 --messages 50000000
+    python -m app.utils.history_benchmark --database-url postgresql://localhost/scratch
+    python -m app.utils.history_benchmark --database-url postgresql://localhost/scratch --archive
+
+Seeded messages span two years, so with the default
+MESSAGE_ARCHIVE_AFTER_DAYS about three quarters of them are archived.
+Conversations are sampled in proportion to their message count, and
+each is paged back from its newest message through the same code as
+GET /chat/messages. Latencies are reported for the first page, the
+older pages served from the hot table, and those reaching the archive.
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session
+
+from app.core.message_archive import archive_messages
+from app.models.message_archive_model import MessageArchiveSegment
+from app.models.message_model import Message
+from app.models.user_model import User
+from app.routes.chat_routes import get_messages
+
+
+def _sample_pairs(db: Session, rng: random.Random, count: int) -> List[Tuple[str, str]]:
+    """Random messages pick the pairs, so busy conversations come up more often."""
+    pairs = []
+    low, high = db.query(func.min(Message.id), func.max(Message.id)).one()
+    segment_low, segment_high = db.query(
+        func.min(MessageArchiveSegment.id), func.max(MessageArchiveSegment.id)
+    ).one()
+    while len(pairs) < count and (low is not None or segment_low is not None):
+        if low is not None and (segment_low is None or rng.random() < 0.5):
+            message = db.query(Message).filter(Message.id >= rng.randint(low, high)).order_by(Message.id).first()
+            pairs.append((message.sender_email, message.receiver_email))
+        else:
+            segment = db.query(MessageArchiveSegment).filter(
+                MessageArchiveSegment.id >= rng.randint(segment_low, segment_high)
+            ).order_by(MessageArchiveSegment.id).first()
+            pairs.append(tuple(segment.conversation_key.split("|")))
+    return pairs
+
+
+def _percentiles(samples: List[float]) -> str:
+    if not samples:
+        return "no pages"
+    cuts = statistics.quantiles(samples, n=100, method="inclusive") if len(samples) > 1 else samples * 99
+    return (f"{len(samples)} pages, p50 {cuts[49]:.1f} ms, p95 {cuts[94]:.1f} ms, "
+            f"p99 {cuts[98]:.1f} ms, max {max(samples):.1f} ms")
+
+
+def run_benchmark(db: Session, pairs: List[Tuple[str, str]], page_size: int, pages: int) -> Dict[str, List[float]]:
+    timings = {"first": [], "hot": [], "archive": []}
+    for sender_email, receiver_email in pairs:
+        username = db.query(User.username).filter(User.email == receiver_email).scalar()
+        if username is None:
+            continue
+        before_id = None
+        for page_number in range(pages):
+            started = time.perf_counter()
+            page = get_messages(sender_email, username, limit=page_size, before_id=before_id, db=db)
+            elapsed = (time.perf_counter() - started) * 1000
+            if not page:
+                break
+            # Archived messages come back as response models, hot ones as rows
+            kind = "first" if page_number == 0 else "hot" if isinstance(page[0], Message) else "archive"
+            timings[kind].append(elapsed)
+            before_id = page[0].id
+            db.expunge_all()
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time conversation history pages on a seeded database.")
+    parser.add_argument("--database-url", required=True, help="seeded scratch database; never DATABASE_URL")
+    parser.add_argument("--archive", action="store_true", help="archive old messages before timing")
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=20, help="pages to walk back per conversation")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url)
+    db = Session(engine)
+    try:
+        if args.archive:
+            started = time.monotonic()
+            counts = archive_messages(db)
+            print(f"archived {counts['archived']} messages into {counts['segments']} segments "
+                  f"in {time.monotonic() - started:.0f} s")
+        hot = db.query(func.count(Message.id)).scalar()
+        archived = db.query(func.coalesce(func.sum(MessageArchiveSegment.message_count), 0)).scalar()
+        print(f"{hot} hot messages, {archived} archived")
+
+        pairs = _sample_pairs(db, random.Random(args.seed), args.conversations)
+        timings = run_benchmark(db, pairs, args.page_size, args.pages)
+    finally:
+        db.rollback()
+        db.close()
+        engine.dispose()
+
+    for kind in ("first", "hot", "archive"):
+        print(f"{kind:>8}: {_percentiles(timings[kind])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Brings an existing database up to the current models. The app only runs
+create_all at startup, which creates missing tables; columns, indexes and
+constraints added to tables that already exist are applied here, once,
+by an operator before the new code is deployed:
+
+    python -m app.utils.migrate --database-url postgresql://localhost/qazaqrental
+
+Every step is idempotent, so an interrupted run can simply be repeated.
+On PostgreSQL indexes are built CONCURRENTLY so writes carry on during
+the build; one that fails part way is left INVALID, and the next run
+drops and rebuilds it. Adding uq_favorites_user_car deletes duplicate
+favorites first, keeping the oldest of each (user, car) pair. Cars with
+no coordinates are geocoded from their city.
+"""
+import argparse
+import logging
+
+from sqlalchemy import Float, String, create_engine, inspect, text
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex
+
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+from app.core.base import Base
+from app.core.config import settings
+from app.utils.geo import backfill_car_coordinates
+
+logger = logging.getLogger(__name__)
+
+# (table, column, type) added after the table first shipped; all nullable
+ADDED_COLUMNS = [
+    ("cars", "latitude", Float()),
+    ("cars", "longitude", Float()),
+    ("cars", "geohash", String(12)),
+]
+
+
+def _add_columns(conn):
+    inspector = inspect(conn)
+    for table, column, column_type in ADDED_COLUMNS:
+        if not inspector.has_table(table):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        if column not in existing:
+            conn.execute(text(
+                f"ALTER TABLE {table} ADD COLUMN {column} {column_type.compile(dialect=conn.dialect)}"
+            ))
+            logger.info("Added column %s.%s", table, column)
+
+
+def _dedupe_favorites(conn) -> bool:
+    """Returns False if uq_favorites_user_car already exists."""
+    inspector = inspect(conn)
+    if not inspector.has_table("favorites"):
+        return False
+    names = {c["name"] for c in inspector.get_unique_constraints("favorites")}
+    names |= {i["name"] for i in inspector.get_indexes("favorites") if i.get("unique")}
+    columns = [sorted(c["column_names"]) for c in inspector.get_unique_constraints("favorites")]
+    if "uq_favorites_user_car" in names or ["car_id", "user_id"] in columns:
+        return False
+    removed = conn.execute(text(
+        "DELETE FROM favorites WHERE id NOT IN "
+        "(SELECT keep_id FROM (SELECT min(id) AS keep_id FROM favorites GROUP BY user_id, car_id) AS keep)"
+    )).rowcount
+    logger.info("Removed %d duplicate favorites", removed)
+    return True
+
+
+def _drop_invalid_indexes(conn):
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE NOT i.indisvalid AND n.nspname = current_schema()"
+    )).scalars().all()
+    for name in names:
+        conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+        logger.info("Dropped invalid index %s", name)
+
+
+def _add_indexes(conn, favorites_constraint: bool):
+    concurrently = "CONCURRENTLY " if conn.dialect.name == "postgresql" else ""
+    if favorites_constraint:
+        conn.execute(text(
+            f"CREATE UNIQUE INDEX {concurrently}IF NOT EXISTS uq_favorites_user_car ON favorites (user_id, car_id)"
+        ))
+    # IF NOT EXISTS rather than reflection, which skips expression indexes on SQLite
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.dialect_options["postgresql"]["concurrently"] = True
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def migrate(engine):
+    Base.metadata.create_all(bind=engine)
+    # CONCURRENTLY cannot run inside a transaction
+    autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+    if engine.dialect.name == "postgresql":
+        with autocommit.connect() as conn:
+            _drop_invalid_indexes(conn)
+    with engine.begin() as conn:
+        _add_columns(conn)
+        favorites_constraint = _dedupe_favorites(conn)
+    with autocommit.connect() as conn:
+        _add_indexes(conn, favorites_constraint)
+    # Cars created since coordinates shipped are geocoded on write
+    with Session(engine) as db:
+        logger.info("Geocoded %d cars", backfill_car_coordinates(db))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply schema changes to an existing database.")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL, help="defaults to DATABASE_URL")
+    args = parser.parse_args(argv)
+    if not args.database_url:
+        parser.error("--database-url is required when DATABASE_URL is unset")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    engine = create_engine(args.database_url)
+    try:
+        migrate(engine)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+EXPLAIN checks for the hot read queries, to catch a change that brings
+back a full table scan. Run against a database seeded with
+app.utils.seed_data so the planner sees production-like statistics:
+
+    python -m app.utils.query_plans --database-url postgresql://localhost/scratch
+
+tests/test_query_plans.py runs the same checks under pytest. A check
+fails when its plan scans a guarded table in full, does not use the
+indexes the query was written for, or, on PostgreSQL (EXPLAIN ANALYZE),
+examines more rows than its budget. SQLite reports no row counts, so
+only index use is checked there. Checks with a known_issue describe a
+scan no index can avoid yet; they are reported but expected to fail.
+The exit status is non-zero when any other check fails.
+"""
+import argparse
+import json
+import re
+import sys
+from datetime import datetime, timedelta
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.core.availability import overlapping_bookings
+from app.core.conversations import conversation_messages
+from app.core.user_search import normalize_query, prefix_query
+from app.models.booking_model import Booking
+from app.models.car_model import Car
+from app.models.favorite_model import Favorite
+from app.models.message_model import Message
+from app.models.user_model import User
+from app.routes.car_routes import apply_car_filters
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement, analyze: bool = False):
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    if compiler.dialect.name == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, FORMAT JSON) " if element.analyze else "EXPLAIN (FORMAT JSON) "
+    else:
+        prefix = "EXPLAIN QUERY PLAN "
+    return prefix + compiler.process(element.statement, **kw)
+
+
+class Sample(NamedTuple):
+    """Real keys from the database for the checked queries to look up."""
+    car_id: int
+    car_ids: List[int]
+    max_price: float
+    location: str
+    car_type: str
+    user_id: int
+    email_a: str
+    email_b: str
+    user_prefix: str
+
+
+class Check(NamedTuple):
+    name: str
+    build: Callable[[Session, Sample], object]
+    guarded: Tuple[str, ...]
+    indexes: Tuple[str, ...]
+    max_rows: int
+    known_issue: Optional[str] = None
+
+
+class Result(NamedTuple):
+    check: Check
+    plan: List[str]
+    full_scans: List[str]
+    rows_examined: Optional[int]
+
+    @property
+    def missing_indexes(self) -> List[str]:
+        plan = "\n".join(self.plan)
+        return [index for index in self.check.indexes if index not in plan]
+
+    @property
+    def passed(self) -> bool:
+        over_budget = self.rows_examined is not None and self.rows_examined > self.check.max_rows
+        return not self.full_scans and not self.missing_indexes and not over_budget
+
+
+def _sample(db: Session) -> Sample:
+    car_id = db.query(Booking.car_id).order_by(Booking.id.desc()).limit(1).scalar()
+    car_ids = [i for (i,) in db.query(Car.id).order_by(Car.id.desc()).limit(50)]
+    user_id = db.query(Favorite.user_id).order_by(Favorite.id.desc()).limit(1).scalar()
+    last_message = db.query(func.max(Message.id)).scalar()
+    username = db.query(User.username).order_by(User.id.desc()).limit(1).scalar()
+    car = db.query(Car.location, Car.car_type).order_by(Car.id.desc()).first()
+    if None in (car_id, user_id, last_message, username, car):
+        raise SystemExit("Seed the database first: python -m app.utils.seed_data")
+
+    # The busiest recent conversation, which is the one whose history is slow to load
+    pair = db.query(Message.sender_email, Message.receiver_email).filter(
+        Message.id > last_message - 10000
+    ).group_by(Message.sender_email, Message.receiver_email).order_by(func.count().desc()).first()
+    # A budget filter: the cheapest percent of listings, as the app's price slider would ask
+    cars = db.query(func.count(Car.id)).scalar()
+    max_price = db.query(Car.price_per_day).order_by(Car.price_per_day).offset(cars // 100).limit(1).scalar()
+    return Sample(
+        car_id=car_id,
+        car_ids=car_ids,
+        max_price=max_price,
+        # What a user types: the start of a city and of a body type
+        location=car[0][:4].lower(),
+        car_type=car[1][:3].lower(),
+        user_id=user_id,
+        email_a=pair[0],
+        email_b=pair[1],
+        user_prefix=normalize_query(username[:-1]),
+    )
+
+
+CHECKS = [
+    Check(
+        "search_cars: snapshot ids",
+        lambda db, s: db.query(Car).filter(Car.id.in_(s.car_ids)).order_by(Car.id),
+        ("cars",), (), 200,
+    ),
+    Check(
+        "search_cars: max_price",
+        lambda db, s: apply_car_filters(db.query(Car), None, s.max_price, None),
+        ("cars",), ("ix_cars_price_per_day",), 20000,
+    ),
+    Check(
+        "search_cars: location and car_type",
+        lambda db, s: apply_car_filters(db.query(Car), s.location, None, s.car_type),
+        ("cars",), (), 20000,
+        known_issue="ILIKE '%...%' cannot use a b-tree index; CATALOG_SNAPSHOT_PATH serves these searches",
+    ),
+    Check(
+        "get_messages: latest page",
+        lambda db, s: conversation_messages(db, s.email_a, s.email_b).order_by(Message.id.desc()).limit(50),
+        ("messages",), ("ix_messages_pair_id",), 20000,
+    ),
+    Check(
+        "get_messages: whole history",
+        lambda db, s: conversation_messages(db, s.email_a, s.email_b).order_by(Message.timestamp),
+        ("messages",), ("ix_messages_pair_id",), 20000,
+    ),
+    Check(
+        "get_favorites",
+        lambda db, s: db.query(Car).join(Favorite, Favorite.car_id == Car.id).filter(
+            Favorite.user_id == s.user_id
+        ).order_by(Favorite.id),
+        ("cars", "favorites"), (), 1000,
+    ),
+    Check(
+        "booking overlap check",
+        lambda db, s: overlapping_bookings(
+            db, s.car_id, datetime.now() + timedelta(days=1), datetime.now() + timedelta(days=4)
+        ),
+        ("bookings",), ("ix_bookings_car_status_start_date",), 1000,
+    ),
+    Check(
+        "search_users: prefix",
+        lambda db, s: prefix_query(db, s.user_prefix, 10),
+        ("users",), ("ix_users_username_lower", "ix_users_email_lower"), 1000,
+    ),
+]
+
+
+def _postgres_plan(node: dict, depth: int, lines: List[str], full_scans: List[str], guarded) -> int:
+    relation = node.get("Relation Name")
+    lines.append("  " * depth + node["Node Type"] + (f" on {relation}" if relation else "")
+                 + (f" using {node['Index Name']}" if "Index Name" in node else ""))
+    if node["Node Type"] == "Seq Scan" and relation in guarded:
+        full_scans.append(relation)
+    examined = 0
+    if relation is not None:
+        examined = (
+            node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)
+            + node.get("Rows Removed by Index Recheck", 0)
+        ) * node.get("Actual Loops", 1)
+    for child in node.get("Plans", []):
+        examined += _postgres_plan(child, depth + 1, lines, full_scans, guarded)
+    return examined
+
+
+def run_check(db: Session, check: Check, sample: Sample) -> Result:
+    statement = check.build(db, sample)
+    statement = getattr(statement, "statement", statement)
+    lines, full_scans = [], []
+    if db.get_bind().dialect.name == "postgresql":
+        document = db.execute(Explain(statement, analyze=True)).scalar()
+        if isinstance(document, str):
+            document = json.loads(document)
+        rows_examined = _postgres_plan(document[0]["Plan"], 0, lines, full_scans, check.guarded)
+        return Result(check, lines, full_scans, rows_examined)
+
+    for _, _, _, detail in db.execute(Explain(statement)):
+        lines.append(detail)
+        # "SCAN t" or "SCAN t USING COVERING INDEX" walk the whole table or index
+        match = re.match(r"SCAN (\w+)", detail)
+        if match and match.group(1) in check.guarded:
+            full_scans.append(match.group(1))
+    return Result(check, lines, full_scans, None)
+
+
+def run_checks(db: Session) -> List[Result]:
+    sample = _sample(db)
+    return [run_check(db, check, sample) for check in CHECKS]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="EXPLAIN the hot read queries against a seeded database.")
+    parser.add_argument("--database-url", required=True, help="seeded scratch database; never DATABASE_URL")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url)
+    db = Session(engine)
+    try:
+        results = run_checks(db)
+    finally:
+        db.rollback()
+        db.close()
+        engine.dispose()
+
+    for result in results:
+        status = "ok" if result.passed else "known issue" if result.check.known_issue else "FAIL"
+        rows = f", {result.rows_examined} rows examined (budget {result.check.max_rows})" \
+            if result.rows_examined is not None else ""
+        print(f"[{status}] {result.check.name}{rows}")
+        for line in result.plan:
+            print(f"       {line}")
+        for table in result.full_scans:
+            print(f"       full scan of {table}")
+        for index in result.missing_indexes:
+            print(f"       {index} not used")
+        if result.check.known_issue and not result.passed:
+            print(f"       {result.check.known_issue}")
+    return 0 if all(result.passed or result.check.known_issue for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+Synthetic data at production scale for query-plan checks and load tests:
+
+    python -m app.utils.seed_data --database-url postgresql://localhost/scratch \
+        --cars 1000000 --bookings 5000000 --messages 10000000
+
+The target must be named with --database-url; DATABASE_URL is never
+used, so a shell pointed at a real database cannot be seeded by mistake.
+Rows are appended with COPY on PostgreSQL and multi-row INSERTs
+elsewhere. They bypass the ORM, so no outbox events are written and
+inbox (conversations) rows are not built.
+"""
+import argparse
+import csv
+import io
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Sequence
+
+from sqlalchemy import create_engine, func
+
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+from app.core.base import Base
+from app.models.booking_model import Booking
+from app.models.car_model import Car
+from app.models.favorite_model import Favorite
+from app.models.message_model import Message
+from app.models.user_model import User
+from app.utils.gazetteer import CITIES
+from app.utils.geo import geohash_encode
+from app.utils.migrate import migrate
+from app.utils.security import hash_password
+
+FIRST_NAMES = ["aidar", "aigerim", "alibek", "amina", "arman", "asel", "bauyrzhan", "dana", "daniyar", "dinara",
+               "erlan", "gulnara", "kairat", "madina", "marat", "nurlan", "saule", "timur", "yerzhan", "zhanna"]
+LAST_NAMES = ["abenov", "akhmetov", "baimukhanov", "dzhaksybekov", "ibraimov", "kassymov", "nurpeisov",
+              "omarov", "sadykov", "seitkali", "tokayev", "utegenov", "zhakupov"]
+MAKES = {"toyota": ["camry", "corolla", "rav4", "land cruiser"], "hyundai": ["accent", "elantra", "tucson", "sonata"],
+         "kia": ["rio", "k5", "sportage"], "chevrolet": ["cobalt", "nexia", "tracker"], "lada": ["granta", "vesta", "niva"],
+         "volkswagen": ["polo", "tiguan"], "lexus": ["rx", "lx"], "tesla": ["model 3", "model y"]}
+CAR_TYPES = ["sedan", "suv", "hatchback", "crossover", "minivan", "pickup", "coupe", "electric"]
+PAYMENT_METHODS = ["card", "cash", "kaspi"]
+PHRASES = ["Is the car still available?", "Can I pick it up tomorrow morning?", "What is the deposit?",
+           "Yes, it is available for those dates.", "Please send your driver's license.", "Thanks, see you then!",
+           "Is there a child seat?", "The car has a full tank.", "Can we meet at the airport?",
+           "How many kilometres are included per day?", "I will be about 20 minutes late.", "Sure, no problem."]
+
+# Big cities get most of the listings
+CITY_NAMES = list(CITIES)
+CITY_WEIGHTS = [40 if city in ("almaty", "astana") else 12 if city == "shymkent" else 3 for city in CITY_NAMES]
+
+
+def _batches(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write(engine, table, columns: Sequence[str], rows: Iterable[tuple], batch_size: int) -> int:
+    written, started = 0, time.monotonic()
+    names = ", ".join(columns)
+    for batch in _batches(rows, batch_size):
+        with engine.begin() as conn:
+            if engine.dialect.name == "postgresql":
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                with conn.connection.cursor() as cursor:
+                    cursor.copy_expert(f"COPY {table.name} ({names}) FROM STDIN WITH (FORMAT csv)", buffer)
+            else:
+                placeholders = ", ".join("?" for _ in columns)
+                conn.exec_driver_sql(f"INSERT INTO {table.name} ({names}) VALUES ({placeholders})", batch)
+        written += len(batch)
+        print(f"  {table.name}: {written} rows ({written / (time.monotonic() - started):.0f}/s)", end="\r")
+    print()
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), (SELECT max(id) FROM {table.name}))"
+            )
+    return written
+
+
+def _next_id(engine, model) -> int:
+    with engine.connect() as conn:
+        return (conn.execute(func.max(model.id).select()).scalar() or 0) + 1
+
+
+def _timestamp(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def seed_users(engine, rng: random.Random, count: int, batch_size: int) -> List[str]:
+    first_id = _next_id(engine, User)
+    hashed = hash_password("password")
+    usernames = [
+        f"{rng.choice(FIRST_NAMES)}.{rng.choice(LAST_NAMES)}{user_id}"
+        for user_id in range(first_id, first_id + count)
+    ]
+    rows = (
+        (first_id + i, f"{username}@example.com", username, hashed, "user")
+        for i, username in enumerate(usernames)
+    )
+    _write(engine, User.__table__, ("id", "email", "username", "hashed_password", "role"), rows, batch_size)
+    return [f"{username}@example.com" for username in usernames]
+
+
+def _car_rows(rng: random.Random, first_id: int, count: int, owners: List[str]) -> Iterator[tuple]:
+    now = datetime.utcnow()
+    for car_id in range(first_id, first_id + count):
+        make = rng.choice(list(MAKES))
+        city = rng.choices(CITY_NAMES, CITY_WEIGHTS)[0]
+        latitude, longitude = CITIES[city]
+        latitude += rng.uniform(-0.1, 0.1)
+        longitude += rng.uniform(-0.1, 0.1)
+        price = round(min(max(rng.lognormvariate(9.9, 0.5), 5000), 150000) / 500) * 500
+        yield (
+            car_id, rng.choice(owners), f"{make} {rng.choice(MAKES[make])}", price, city.capitalize(),
+            rng.choice(CAR_TYPES), f"{rng.randint(2008, 2024)}, {rng.choice(['automatic', 'manual'])}",
+            latitude, longitude, geohash_encode(latitude, longitude),
+            _timestamp(now - timedelta(days=rng.uniform(0, 1000))),
+        )
+
+
+def seed_cars(engine, rng: random.Random, count: int, owners: List[str], batch_size: int) -> range:
+    first_id = _next_id(engine, Car)
+    columns = ("id", "owner_email", "name", "price_per_day", "location", "car_type", "description",
+               "latitude", "longitude", "geohash", "created_at")
+    _write(engine, Car.__table__, columns, _car_rows(rng, first_id, count, owners), batch_size)
+    return range(first_id, first_id + count)
+
+
+def seed_favorites(engine, rng: random.Random, count: int, user_ids: range, car_ids: range, batch_size: int):
+    count = min(count, len(user_ids) * len(car_ids))
+
+    def rows():
+        seen = set()  # user_id * stride + car_id keeps (user_id, car_id) unique
+        stride = car_ids.stop
+        favorite_id = _next_id(engine, Favorite)
+        created_at = _timestamp(datetime.utcnow())
+        while len(seen) < count:
+            user_id, car_id = rng.choice(user_ids), rng.choice(car_ids)
+            if user_id * stride + car_id in seen:
+                continue
+            seen.add(user_id * stride + car_id)
+            yield favorite_id, user_id, car_id, created_at
+            favorite_id += 1
+
+    _write(engine, Favorite.__table__, ("id", "user_id", "car_id", "created_at"), rows(), batch_size)
+
+
+def _booking_rows(rng: random.Random, first_id: int, count: int, user_ids: range, car_ids: range, prices: dict) -> Iterator[tuple]:
+    """Back-to-back, non-overlapping bookings per car, most in the past and some up to six months ahead."""
+    now = datetime.utcnow()
+    booking_id = first_id
+    emitted = 0
+    for index, car_id in enumerate(car_ids):
+        target = (count - emitted) / (len(car_ids) - index)
+        bookings = count - emitted if index == len(car_ids) - 1 else rng.randint(int(target / 2), int(target * 1.5) + 1)
+        cursor = now - timedelta(days=bookings * 25 - rng.uniform(0, 180))
+        for _ in range(min(bookings, count - emitted)):
+            start = (cursor + timedelta(days=rng.expovariate(1 / 20))).replace(minute=0, second=0, microsecond=0)
+            days = rng.choice([1, 1, 2, 3, 3, 5, 7, 10, 14])
+            end = start + timedelta(days=days)
+            cursor = end
+            if end < now:
+                status = rng.choices(["completed", "cancelled", "expired"], [85, 10, 5])[0]
+            else:
+                status = rng.choices(["confirmed", "pending", "cancelled"], [70, 20, 10])[0]
+            price = prices[car_id]
+            discount = 15.0 if days >= 7 else 0.0
+            yield (
+                booking_id, car_id, rng.choice(user_ids), _timestamp(start), _timestamp(end), days, price,
+                discount, round(price * days * (1 - discount / 100), 2), rng.choice(PAYMENT_METHODS), status,
+                _timestamp(start - timedelta(days=rng.uniform(1, 30))), _timestamp(start),
+            )
+            booking_id += 1
+            emitted += 1
+
+
+def seed_bookings(engine, rng: random.Random, count: int, user_ids: range, car_ids: range, batch_size: int):
+    with engine.connect() as conn:
+        prices = dict(conn.execute(
+            Car.__table__.select().with_only_columns(Car.id, Car.price_per_day)
+            .where(Car.id >= car_ids.start, Car.id < car_ids.stop)
+        ).all())
+    columns = ("id", "car_id", "user_id", "start_date", "end_date", "total_days", "price_per_day",
+               "discount_percentage", "total_price", "payment_method", "status", "created_at", "updated_at")
+    rows = _booking_rows(rng, _next_id(engine, Booking), count, user_ids, car_ids, prices)
+    _write(engine, Booking.__table__, columns, rows, batch_size)
+
+
+def _message_rows(rng: random.Random, first_id: int, count: int, emails: List[str]) -> Iterator[tuple]:
+    """
+    Conversations are heavy-tailed: most pairs exchange a few messages, a
+    few exchange thousands. Ids follow time, as they do in production.
+    """
+    pairs = [tuple(rng.sample(emails, 2)) for _ in range(max(1, count // 25))]
+    started = datetime.utcnow() - timedelta(days=730)
+    step = timedelta(days=730) / count
+    for i in range(count):
+        if rng.random() < 0.02:
+            pair = pairs[min(int((rng.paretovariate(1.5) - 1) * 20), len(pairs) - 1)]
+        else:
+            pair = pairs[rng.randrange(len(pairs))]
+        sender, receiver = pair if rng.random() < 0.5 else pair[::-1]
+        yield first_id + i, sender, receiver, rng.choice(PHRASES), _timestamp(started + step * i)
+
+
+def seed_messages(engine, rng: random.Random, count: int, emails: List[str], batch_size: int):
+    columns = ("id", "sender_email", "receiver_email", "text", "timestamp")
+    rows = _message_rows(rng, _next_id(engine, Message), count, emails)
+    _write(engine, Message.__table__, columns, rows, batch_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a scratch database with synthetic rentals data.")
+    parser.add_argument("--database-url", required=True, help="database to append to; never DATABASE_URL")
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--cars", type=int, default=1000000)
+    parser.add_argument("--favorites", type=int, default=2000000)
+    parser.add_argument("--bookings", type=int, default=5000000)
+    parser.add_argument("--messages", type=int, default=10000000)
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    engine = create_engine(args.database_url)
+    migrate(engine)
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode = WAL")
+
+    first_user = _next_id(engine, User)
+    emails = seed_users(engine, rng, args.users, args.batch_size)
+    user_ids = range(first_user, first_user + args.users)
+    car_ids = seed_cars(engine, rng, args.cars, emails, args.batch_size)
+    if args.favorites:
+        seed_favorites(engine, rng, args.favorites, user_ids, car_ids, args.batch_size)
+    if args.bookings:
+        seed_bookings(engine, rng, args.bookings, user_ids, car_ids, args.batch_size)
+    if args.messages:
+        seed_messages(engine, rng, args.messages, emails, args.batch_size)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.storage import key_for_url, normalize_key, storage
+from app.schemas.upload_schema import UploadRequest, UploadTicket
+
+ALLOWED_IMAGE_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+
+
+# Presigned uploads land here, outside every served directory, until
+# finish_upload has checked them (expire it with a bucket lifecycle rule)
+PENDING_PREFIX = "pending"
+
+
+def new_object_key(prefix: str, content_type: str) -> str:
+    """
+    Random key under prefix. The extension decides how the object is
+    served, so it comes from the checked image type, never the filename.
+    """
+    extension = ALLOWED_IMAGE_TYPES.get((content_type or "").split(";")[0].strip().lower())
+    if extension is None:
+        raise HTTPException(status_code=400, detail="Unsupported image type")
+    return f"{prefix}/{uuid.uuid4().hex}{extension}"
+
+
+def issue_upload(prefix: str, request: UploadRequest) -> UploadTicket:
+    """Presigned URL the client PUTs the image bytes to directly."""
+    key = new_object_key(f"{PENDING_PREFIX}/{prefix}", request.content_type)
+    expires_in = settings.STORAGE_UPLOAD_URL_TTL
+    return UploadTicket(
+        key=key,
+        url=storage.presign_upload(key, request.content_type, expires_in),
+        headers={"Content-Type": request.content_type},
+        expires_at=datetime.utcnow() + timedelta(seconds=expires_in),
+    )
+
+
+def finish_upload(prefix: str, key: str) -> str:
+    """
+    Check that a client-uploaded object is a pending upload for prefix and
+    an acceptable image, then move it to its served key and return that.
+    """
+    key = normalize_key(key)
+    if not key or not key.startswith(f"{PENDING_PREFIX}/{prefix}/"):
+        raise HTTPException(status_code=400, detail="Invalid upload key")
+
+    info = storage.stat(key)
+    if info is None:
+        raise HTTPException(status_code=400, detail="Upload not found")
+    extension = ALLOWED_IMAGE_TYPES.get(info.content_type)
+    if info.size > settings.STORAGE_MAX_UPLOAD_BYTES or extension is None or not key.endswith(extension):
+        storage.delete(key)
+        raise HTTPException(status_code=400, detail="Uploaded file is not an acceptable image")
+
+    final_key = key[len(PENDING_PREFIX) + 1:]
+    storage.move(key, final_key)
+    return final_key
+
+
+def replace_image(old_url, new_key: str) -> str:
+    """URL of the new object; the previous one is removed if it was ours."""
+    old_key = key_for_url(old_url)
+    if old_key and old_key != new_key:
+        storage.delete(old_key)
+    return storage.url_for(new_key)
@@ -2,27 +2,118 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
-from app.core.config import settings
+from app.core.config import settings, BASE_DIR
 import os
-from app.core.database import Base, engine
-from app.routes import auth_routes, profile_routes, chat_routes, car_routes, chat_websocket
+from app.core.database import Base, engine, SessionLocal
+from app.core.profiler import QueryProfilerMiddleware
+from app.core.db_routing import ReadYourWritesMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.idempotency import IdempotencyMiddleware, idempotency_scheduler
+from app.core.user_search import setup_user_search
+from app.core.message_search import setup_message_search
+import asyncio
+from starlette.concurrency import run_in_threadpool
+from app.routes import auth_routes, profile_routes, chat_routes, car_routes, chat_websocket, storage_routes
 from app.routes.favorite_routes import router as favorite_router
+from app.routes.booking_routes import router as booking_router
+from app.routes.pricing_routes import router as pricing_router
+from app.core.popularity import popularity_index, popularity_scheduler
+from app.core.catalog_snapshot import catalog_snapshot
+from app.core.booking_lifecycle import booking_scheduler
+from app.core.message_archive import archive_scheduler
+from app.core.outbox import outbox, outbox_scheduler
+from app.core.metrics import metrics
 
 load_dotenv()
+# New tables only; changes to existing ones are applied by app.utils.migrate
 Base.metadata.create_all(bind=engine)
 
 app = FastAPI(root_path="/api")
 
+# Innermost, so replayed responses still get fresh CORS headers
+app.add_middleware(IdempotencyMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-DB-Query-Count", "X-DB-Time-Ms", "X-DB-N-Plus-One",
+        "X-DB-Checkouts", "X-DB-Checkout-Wait-Ms", "X-DB-Hold-Ms", "X-Missing-Car-Ids",
+        "Idempotent-Replayed",
+    ],
 )
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(QueryProfilerMiddleware)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
 
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# The event loop only keeps weak references to tasks, so these hold them
+# until shutdown cancels them
+background_tasks = set()
+
+
+def start_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+def prepare_database():
+    """Blocking DDL; run off the event loop."""
+    db = SessionLocal()
+    try:
+        setup_user_search(engine, db)
+        setup_message_search(engine)
+    finally:
+        db.close()
+
+
+def release_presence():
+    db = SessionLocal()
+    try:
+        chat_websocket.presence.shutdown(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def startup():
+    await run_in_threadpool(prepare_database)
+
+    start_background(chat_websocket.manager.heartbeat())
+    start_background(chat_websocket.presence.run())
+    start_background(popularity_index.run())
+    start_background(outbox.run())
+    if catalog_snapshot.enabled:
+        start_background(catalog_snapshot.run())
+    if settings.SCHEDULER_ENABLED:
+        start_background(booking_scheduler.run())
+        start_background(idempotency_scheduler.run())
+        start_background(outbox_scheduler.run())
+        start_background(popularity_scheduler.run())
+        if settings.MESSAGE_ARCHIVE_ENABLED:
+            start_background(archive_scheduler.run())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    tasks = list(background_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await run_in_threadpool(release_presence)
+
+
+@app.get("/metrics", tags=["metrics"])
+def get_metrics():
+    return metrics.snapshot()
+
+
+for directory in ("uploads", "car_uploads", "uploaded_images"):
+    os.makedirs(os.path.join(BASE_DIR, directory), exist_ok=True)
 
 app.mount("/uploads", StaticFiles(directory=os.path.join(BASE_DIR, "uploads")), name="uploads")
 app.mount("/car_uploads", StaticFiles(directory=os.path.join(BASE_DIR, "car_uploads")), name="car_uploads")
@@ -35,3 +126,6 @@ app.include_router(chat_routes.router, prefix="/chat", tags=["chat"])
 app.include_router(car_routes.router, prefix="/car", tags=["car"])
 app.include_router(chat_websocket.router)
 app.include_router(favorite_router)
+app.include_router(booking_router)
+app.include_router(pricing_router)
+app.include_router(storage_routes.router, tags=["storage"])
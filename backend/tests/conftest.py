@@ -0,0 +1,48 @@
+"""
+Tests never touch the database in DATABASE_URL or .env: the app runs
+against a SQLite file in a scratch directory. The query plan
+tests use QUERY_PLANS_DATABASE_URL when it is set, e.g. a scratch
+PostgreSQL seeded at production scale with app.utils.seed_data, and
+otherwise seed a small SQLite database of their own.
+"""
+import os
+import tempfile
+
+import pytest
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix="rentals-tests-")
+# Set before any app module builds its engine; load_dotenv keeps these
+os.environ["DATABASE_URL"] = f"sqlite:///{SCRATCH_DIR}/app.db"
+os.environ["SCHEDULER_ENABLED"] = "false"
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.utils import seed_data  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    # Entering the client runs the startup and shutdown hooks
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def plan_db():
+    url = os.environ.get("QUERY_PLANS_DATABASE_URL")
+    if not url:
+        url = f"sqlite:///{SCRATCH_DIR}/plans.db"
+        seed_data.main([
+            "--database-url", url, "--users", "2000", "--cars", "20000", "--favorites", "20000",
+            "--bookings", "60000", "--messages", "100000", "--batch-size", "10000",
+        ])
+    engine = create_engine(url)
+    db = Session(engine)
+    yield db
+    db.rollback()
+    db.close()
+    engine.dispose()
@@ -0,0 +1,77 @@
+import uuid
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core import db_routing
+from app.core.base import Base
+from app.core.database import engine, get_db
+from app.core.db_routing import STICKY_COOKIE, ReadYourWritesMiddleware, _client_key, get_read_db
+from app.models.outbox_model import OutboxCursor
+
+app = FastAPI()
+app.add_middleware(ReadYourWritesMiddleware)
+
+
+@app.get("/read")
+def read(db: Session = Depends(get_read_db)):
+    return {"database": db.get_bind().url.database, "replica": bool(db.info.get("replica"))}
+
+
+@app.post("/write")
+def write(db: Session = Depends(get_db)):
+    db.add(OutboxCursor(name=f"routing-{uuid.uuid4().hex}", last_id=0))
+    db.commit()
+    return {}
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch, client):
+    # A second SQLite file stands in for the replica
+    engine = create_engine(f"sqlite:///{tmp_path}/replica.db")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(db_routing, "ReplicaSessionLocal", sessionmaker(bind=engine))
+    yield engine.url.database
+    engine.dispose()
+
+
+def reads_from(test_client, **params):
+    return test_client.get("/read", params=params).json()["database"]
+
+
+def test_reads_go_to_the_replica(replica):
+    assert reads_from(TestClient(app), email="reader@example.com") == replica
+
+
+def test_primary_without_a_replica(client):
+    assert TestClient(app).get("/read").json() == {"database": engine.url.database, "replica": False}
+
+
+def test_writer_sticks_to_the_primary_through_the_cookie(replica):
+    writer = TestClient(app)
+    response = writer.post("/write")
+    assert STICKY_COOKIE in response.cookies
+    assert reads_from(writer) == engine.url.database
+
+
+def test_writer_sticks_to_the_primary_by_client_key(replica):
+    TestClient(app).post("/write", params={"email": "writer@example.com"})
+    # Another worker's cookie never arrived; the email still identifies the client
+    assert reads_from(TestClient(app), email="writer@example.com") == engine.url.database
+    assert reads_from(TestClient(app), email="someone-else@example.com") == replica
+
+
+def test_anonymous_clients_do_not_share_stickiness(replica):
+    # Everyone behind the proxy arrives from its address
+    proxied = {"type": "http", "client": ("10.0.0.1", 40000), "headers": [], "query_string": b""}
+    assert _client_key(proxied) is None
+    TestClient(app).post("/write")
+    assert reads_from(TestClient(app)) == replica
+
+
+def test_expired_cookie_reads_the_replica(replica):
+    reader = TestClient(app, cookies={STICKY_COOKIE: "1"})
+    assert reads_from(reader) == replica
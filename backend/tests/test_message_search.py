@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import pytest
+
+from app.models.message_model import Message
+
+
+@pytest.fixture(scope="module")
+def messages(client):
+    from app.core.database import SessionLocal
+
+    db = SessionLocal()
+    rows = [
+        Message(sender_email="search-a@example.com", receiver_email="search-b@example.com",
+                text="Is the Camry free on Friday?", timestamp=datetime.now()),
+        Message(sender_email="search-b@example.com", receiver_email="search-a@example.com",
+                text="Yes, the Camry is free.", timestamp=datetime.now()),
+    ]
+    db.add_all(rows)
+    db.commit()
+    ids = [row.id for row in rows]
+    db.close()
+    return ids
+
+
+def search(client, q):
+    return client.get("/chat/search-messages/search-a@example.com", params={"q": q})
+
+
+def test_finds_own_messages(client, messages):
+    response = search(client, "camry")
+    assert response.status_code == 200
+    assert sorted(hit["message"]["id"] for hit in response.json()) == sorted(messages)
+
+
+@pytest.mark.parametrize("q", [" ", "   ", "\t"])
+def test_blank_query_returns_nothing(client, messages, q):
+    response = search(client, q)
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+@pytest.mark.parametrize("q", ['"', "camry OR", "NEAR(", "*", "free -camry"])
+def test_query_syntax_is_not_interpreted(client, messages, q):
+    assert search(client, q).status_code == 200
@@ -0,0 +1,133 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import outbox as outbox_module
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.outbox import ChangeEvent, FeedPosition, LocalBroker, OutboxDispatcher
+from app.models.car_model import Car
+from app.models.outbox_model import OutboxCursor, OutboxEvent
+
+
+def change(event_id: int) -> ChangeEvent:
+    return ChangeEvent(event_id, "car", event_id, "update", {}, datetime(2026, 1, 1))
+
+
+def ids(changes):
+    return [c.id for c in changes]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(outbox_module, "time", SimpleNamespace(monotonic=lambda: now.value))
+    monkeypatch.setattr(settings, "OUTBOX_GAP_TIMEOUT", 10.0)
+    return now
+
+
+@pytest.fixture
+def db(client):
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def events_after(db, after_id):
+    return db.query(OutboxEvent).filter(OutboxEvent.id > after_id).order_by(OutboxEvent.id).all()
+
+
+def test_contiguous_events_are_taken(clock):
+    position = FeedPosition(0, "test")
+    assert ids(position.take([change(1), change(2), change(3)])) == [1, 2, 3]
+    assert position.last_id == 3
+
+
+def test_gap_is_waited_on_then_filled(clock):
+    position = FeedPosition(0, "test")
+    assert ids(position.take([change(1), change(2), change(4)])) == [1, 2]
+    clock.value += 5
+    assert ids(position.take([change(4)])) == []
+    # The slow transaction commits id 3 within the timeout
+    assert ids(position.take([change(3), change(4)])) == [3, 4]
+
+
+def test_gap_is_skipped_after_timeout(clock):
+    position = FeedPosition(0, "test")
+    assert ids(position.take([change(2)])) == []
+    clock.value += 10
+    assert ids(position.take([change(2)])) == [2]
+
+
+def test_gaps_in_one_batch_age_together(clock):
+    position = FeedPosition(0, "test")
+    assert ids(position.take([change(2), change(4), change(6)])) == []
+    clock.value += 10
+    # Three gaps, one timeout: each was timed from when it was first seen
+    assert ids(position.take([change(2), change(4), change(6)])) == [2, 4, 6]
+
+
+def test_later_gap_gets_its_own_timeout(clock):
+    position = FeedPosition(0, "test")
+    assert ids(position.take([change(2)])) == []
+    clock.value += 8
+    assert ids(position.take([change(2), change(4)])) == []
+    clock.value += 2
+    assert ids(position.take([change(2), change(4)])) == [2]
+    clock.value += 8
+    assert ids(position.take([change(4)])) == [4]
+
+
+def test_local_broker_keeps_recent_events_and_appends_to_file(tmp_path):
+    path = tmp_path / "broker.jsonl"
+    broker = LocalBroker(str(path), keep=2)
+    broker.publish([change(1), change(2)])
+    broker.publish([change(3)])
+
+    assert ids(broker.events) == [2, 3]
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["id"] for line in lines] == [1, 2, 3]
+    assert lines[0]["created_at"] == "2026-01-01T00:00:00"
+
+
+def test_flush_writes_outbox_rows_in_the_same_transaction(db):
+    start = db.query(OutboxEvent.id).order_by(OutboxEvent.id.desc()).limit(1).scalar() or 0
+    car = Car(owner_email="outbox@example.com", price_per_day=10000, location="Almaty", car_type="sedan")
+    db.add(car)
+    db.commit()
+    car.price_per_day = 12000
+    db.commit()
+    # Setting a loaded attribute to its current value modifies nothing
+    car.price_per_day = car.price_per_day
+    db.commit()
+
+    rows = events_after(db, start)
+    assert [(row.entity, row.entity_id, row.op) for row in rows] == [("car", car.id, "insert"), ("car", car.id, "update")]
+    assert json.loads(rows[0].payload) == {"owner_email": "outbox@example.com"}
+
+    car.price_per_day = 15000
+    db.flush()
+    db.rollback()
+    assert len(events_after(db, start)) == 2
+
+    db.delete(car)
+    db.commit()
+    assert [row.op for row in events_after(db, start)] == ["insert", "update", "delete"]
+
+
+def test_publish_to_broker_advances_the_durable_cursor(db, monkeypatch):
+    monkeypatch.setattr(settings, "OUTBOX_GAP_TIMEOUT", 0.0)
+    db.add(Car(owner_email="broker@example.com", price_per_day=10000, location="Astana", car_type="suv"))
+    db.commit()
+    last_id = db.query(OutboxEvent.id).order_by(OutboxEvent.id.desc()).limit(1).scalar()
+
+    dispatcher = OutboxDispatcher()
+    dispatcher.broker = LocalBroker()
+    dispatcher.publish_to_broker(db)
+
+    assert dispatcher.broker.events[-1].id == last_id
+    assert db.query(OutboxCursor.last_id).filter(OutboxCursor.name == "broker").scalar() == last_id
+    assert dispatcher.publish_to_broker(db) == {"published": 0}
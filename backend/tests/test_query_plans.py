@@ -0,0 +1,23 @@
+import pytest
+
+from app.utils.query_plans import CHECKS, _sample, run_check
+
+
+@pytest.fixture(scope="module")
+def sample(plan_db):
+    return _sample(plan_db)
+
+
+@pytest.mark.parametrize("check", [
+    pytest.param(check, id=check.name, marks=[
+        pytest.mark.xfail(reason=check.known_issue, strict=True)
+    ] if check.known_issue else [])
+    for check in CHECKS
+])
+def test_query_plan(plan_db, sample, check):
+    result = run_check(plan_db, check, sample)
+    plan = "\n".join(result.plan)
+    assert not result.full_scans, f"full scan of {result.full_scans}:\n{plan}"
+    assert not result.missing_indexes, f"{result.missing_indexes} not used:\n{plan}"
+    if result.rows_examined is not None:
+        assert result.rows_examined <= check.max_rows, f"{result.rows_examined} rows examined:\n{plan}"
@@ -0,0 +1,93 @@
+"""
+A scaled-down soak of ConnectionManager: thousands of in-memory sockets
+against the caps, the heartbeat and the idle reaper. WS_SOAK_CLIENTS
+raises the client count, e.g. to the 10k a production worker is sized for.
+"""
+import asyncio
+import json
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.core.websocket_manager import CLOSE_GOING_AWAY, CLOSE_TRY_AGAIN_LATER, ConnectionManager
+
+CLIENTS = int(os.environ.get("WS_SOAK_CLIENTS", "2000"))
+
+
+class FakeSocket:
+    def __init__(self, broken: bool = False):
+        self.broken = broken
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.broken:
+            raise ConnectionResetError("half-open")
+        self.sent.append(json.loads(text))
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(settings, "WS_MAX_CONNECTIONS", CLIENTS)
+    monkeypatch.setattr(settings, "WS_MAX_CONNECTIONS_PER_USER", 5)
+    monkeypatch.setattr(settings, "WS_HEARTBEAT_INTERVAL", 0.05)
+    monkeypatch.setattr(settings, "WS_IDLE_TIMEOUT", 0.3)
+    return ConnectionManager()
+
+
+def test_process_cap_turns_away_extra_clients(manager):
+    async def scenario():
+        sockets = [FakeSocket() for _ in range(CLIENTS + CLIENTS // 10)]
+        accepted = [await manager.connect(socket, f"user{i}@example.com") for i, socket in enumerate(sockets)]
+        return sockets, accepted
+
+    sockets, accepted = asyncio.run(scenario())
+    assert sum(accepted) == CLIENTS
+    assert manager.connection_count == CLIENTS
+    assert all(socket.close_code == CLOSE_TRY_AGAIN_LATER for socket in sockets[CLIENTS:])
+
+
+def test_per_user_cap_evicts_oldest(manager):
+    async def scenario():
+        sockets = [FakeSocket() for _ in range(8)]
+        for socket in sockets:
+            assert await manager.connect(socket, "busy@example.com")
+        return sockets
+
+    sockets = asyncio.run(scenario())
+    assert [socket.close_code for socket in sockets[:3]] == [CLOSE_GOING_AWAY] * 3
+    assert manager.active_connections["busy@example.com"] == sockets[3:]
+    assert manager.connection_count == 5
+
+
+def test_heartbeat_pings_live_clients_and_reaps_idle_and_broken_ones(manager):
+    async def scenario():
+        live = [FakeSocket() for _ in range(CLIENTS // 2)]
+        idle = [FakeSocket() for _ in range(CLIENTS // 2 - 10)]
+        broken = [FakeSocket(broken=True) for _ in range(10)]
+        for i, socket in enumerate(live + idle + broken):
+            await manager.connect(socket, f"user{i % (CLIENTS // 4)}@example.com")
+
+        heartbeat = asyncio.create_task(manager.heartbeat())
+        try:
+            # Live clients answer every ping; idle ones never do
+            for _ in range(12):
+                await asyncio.sleep(0.05)
+                for socket in live:
+                    manager.touch(socket)
+        finally:
+            heartbeat.cancel()
+        return live, idle, broken
+
+    live, idle, broken = asyncio.run(scenario())
+    assert manager.connection_count == len(live)
+    assert all(socket.close_code is None and {"type": "ping"} in socket.sent for socket in live)
+    assert all(socket.close_code == CLOSE_GOING_AWAY for socket in idle)
+    assert not any(socket in manager.last_seen for socket in broken)